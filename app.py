@@ -2,6 +2,9 @@ import streamlit as st
 import pandas as pd
 from supabase import create_client
 import os
+import dashboard_cache
+from data_cache import DeltaTable
+import view_analytics
 
 # 1. ページ設定
 st.set_page_config(page_title="UVERworld Analysis", layout="wide")
@@ -21,27 +24,70 @@ if not url or not key:
 
 supabase = create_client(url, key)
 
-# 3. データの取得関数
-@st.cache_data(ttl=600)
-def load_data(table_name):
+# 3. データの取得関数（全セッション共通のキャッシュから返し、古くなった分は裏で取り直す）
+def fetch_table(table_name):
+    res = supabase.table(table_name).select("*").execute()
+    return pd.DataFrame(res.data)
+
+# 追記専用テーブルは差分だけを取得してキャッシュに積み上げる
+# (テーブル名: (取得する列, 最新値を判定するキー))
+DELTA_TABLES = {
+    "youtube_stats": (["video_id", "title", "views", "published_at"], "video_id"),
+    "sns_stats": (["platform", "follower_count"], "platform"),
+}
+
+def fetch_latest(table):
+    """差分を取り込んだうえで、キーごとの最新行を返す"""
+    table.refresh(force=True)
+    return table.latest
+
+def fetch_analytics(cache, table, memo):
+    """
+    再生数履歴の集計結果。履歴（差分キャッシュ）かイベント一覧が変わったときだけ計算し直し、
+    それ以外は前回の結果を使う。
+    """
+    table.refresh(force=True)
+    events = cache.get("calendar_events")
+    key = (table.watermark, len(table.frame), len(events))
+    if memo.get("key") != key:
+        memo["result"] = view_analytics.analyze(table.frame, events)
+        memo["key"] = key
+    return memo["result"]
+
+@st.cache_resource
+def get_cache():
+    """
+    全セッション共通のキャッシュ。取得関数はバックグラウンドのスレッドからも呼ばれるため、
+    st.* を使わないものだけを登録する。
+    """
+    tables = {name: DeltaTable(supabase, name, columns, key, max_age=dashboard_cache.TTL)
+              for name, (columns, key) in DELTA_TABLES.items()}
+    memo = {}
+    cache = dashboard_cache.SharedCache()
+    cache.register("calendar_events", lambda: fetch_table("calendar_events"))
+    cache.register("youtube_latest", lambda: fetch_latest(tables["youtube_stats"]))
+    cache.register("sns_latest", lambda: fetch_latest(tables["sns_stats"]))
+    cache.register("analytics", lambda: fetch_analytics(cache, tables["youtube_stats"], memo))
+    return cache.start()
+
+def load(name, default):
+    """キャッシュから取得する。初回の取得に失敗したときはエラーを表示して default を返す"""
     try:
-        res = supabase.table(table_name).select("*").execute()
-        return pd.DataFrame(res.data)
+        return get_cache().get(name)
     except Exception as e:
-        st.error(f"データ取得エラー ({table_name}): {e}")
-        return pd.DataFrame()
+        st.error(f"データ取得エラー ({name}): {e}")
+        return default
 
-# 4. タブ切り替え（3つに増やしました）
-tab1, tab2, tab3 = st.tabs(["📺 MV Ranking", "🗓 Schedule", "📱 SNS Followers"])
+# 4. 表示切り替え（選んだ画面のデータだけを読み込む）
+PAGES = ["📺 MV Ranking", "🗓 Schedule", "📱 SNS Followers", "📈 Growth"]
+page = st.radio("表示", PAGES, horizontal=True, label_visibility="collapsed")
 
-# --- タブ1: YouTube MVランキング ---
-with tab1:
+# --- 画面1: YouTube MVランキング ---
+if page == PAGES[0]:
     st.header("YouTube MV再生数ランキング")
-    yt_df = load_data("youtube_stats")
+    yt_latest = load("youtube_latest", pd.DataFrame())
     
-    if not yt_df.empty:
-        # 重複を除去して最新の再生数を取得
-        yt_latest = yt_df.sort_values('created_at', ascending=False).drop_duplicates('video_id')
+    if not yt_latest.empty:
         yt_latest = yt_latest.sort_values('views', ascending=False)
         
         st.subheader("Top 10 Views")
@@ -57,10 +103,10 @@ with tab1:
     else:
         st.info("YouTubeのデータがまだありません。")
 
-# --- タブ2: スケジュール ---
-with tab2:
+# --- 画面2: スケジュール ---
+elif page == PAGES[1]:
     st.header("公式スケジュール")
-    sched_df = load_data("calendar_events") # テーブル名を修正
+    sched_df = load("calendar_events", pd.DataFrame()).copy()
     
     if not sched_df.empty:
         # 日付順に並び替え（今日以降のものを優先表示）
@@ -77,13 +123,12 @@ with tab2:
     else:
         st.info("スケジュールのデータがまだありません。")
 
-# --- タブ3: SNSフォロワー数 ---
-with tab3:
+# --- 画面3: SNSフォロワー数 ---
+elif page == PAGES[2]:
     st.header("SNSフォロワー統計")
-    sns_df = load_data("sns_stats")
+    sns_latest = load("sns_latest", pd.DataFrame())
     
-    if not sns_df.empty:
-        sns_latest = sns_df.sort_values('created_at', ascending=False).drop_duplicates('platform')
+    if not sns_latest.empty:
         
         cols = st.columns(len(sns_latest))
         for i, row in enumerate(sns_latest.itertuples()):
@@ -93,4 +138,56 @@ with tab3:
         st.subheader("プラットフォーム別フォロワー数")
         st.bar_chart(sns_latest.set_index('platform')['follower_count'])
     else:
-        st.info("SNSのデータがまだありません。")
\ No newline at end of file
+        st.info("SNSのデータがまだありません。")
+
+# --- 画面4: 再生数の伸び・節目予測・急増 ---
+elif page == PAGES[3]:
+    st.header("再生数の伸びと節目到達予測")
+    result = load("analytics", None) or view_analytics.analyze(pd.DataFrame())
+    summary = result.summary
+
+    if not summary.empty:
+        m = result.matrix
+        st.caption(f"{len(m.video_ids)}動画 × {len(m.days)}日 ({m.days[0]} 〜 {m.days[-1]})")
+
+        st.subheader(f"伸びている動画（直近{view_analytics.VELOCITY_WINDOW}日の1日平均）")
+        st.dataframe(
+            summary[['title', 'views', 'delta_1d', 'velocity', 'next_milestone', 'eta_date']].rename(columns={
+                'title': '曲名', 'views': '再生数', 'delta_1d': '前日比', 'velocity': '1日平均',
+                'next_milestone': '次の節目', 'eta_date': '到達予測日',
+            }),
+            use_container_width=True
+        )
+
+        st.subheader("再生数の推移")
+        titles = dict(zip(summary['video_id'], summary['title']))
+        selected = st.multiselect("動画", list(titles), default=list(summary['video_id'].head(5)),
+                                  format_func=titles.get)
+        # 履歴が7日以下だと最小値と最大値が同じになり slider が作れないため、全期間を表示する
+        days = st.slider("表示日数", 7, len(m.days), min(90, len(m.days))) if len(m.days) > 7 else None
+        if selected:
+            st.line_chart(m.frame(selected, last_days=days))
+
+        st.subheader("⚡ 急増した日")
+        anomalies = result.anomalies
+        if not anomalies.empty:
+            st.dataframe(
+                anomalies[['date', 'title', 'delta', 'event']].rename(columns={
+                    'date': '日付', 'title': '曲名', 'delta': '増加数', 'event': '前後のイベント',
+                }),
+                use_container_width=True
+            )
+        else:
+            st.info("急増した日はありません。")
+    else:
+        st.info("YouTubeのデータがまだありません。")
+
+# 5. キャッシュの状態
+entries, stats = get_cache().status()
+with st.sidebar:
+    st.subheader("🗄️ キャッシュ")
+    st.caption(f"ヒット {stats.get('hits', 0)} / ミス {stats.get('misses', 0)} / "
+               f"裏で更新 {stats.get('background', 0)} / エラー {stats.get('errors', 0)}")
+    for name, entry in entries.items():
+        age = "未取得" if entry["age"] is None else f"{entry['age']:.0f}秒前"
+        st.caption(f"{name}: {age}" + (f" ⚠️ {entry['error']}" if entry["error"] else ""))
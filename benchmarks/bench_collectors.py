@@ -0,0 +1,306 @@
+"""
+収集スクリプトのオフラインベンチマーク
+
+外部サイトは記録済みレスポンス (replay_http)、Supabase はローカルの PostgREST 互換サーバー
+(fake_postgrest) に置き換え、ネットワークなしで以下を実測する。
+    youtube   uver_to_supabase.fetch_and_save      （動画数 = カタログ (SONG_LIST) × 倍率）
+    schedule  sync_all_data.scrape_uver_schedule   （スケジュール件数 = 保存ページ × 倍率）
+    survey    import_survey.import_survey          （回答数 = 20260202.csv 相当 × 倍率）
+    sns       sns_to_supabase.run('official')      （実行回数 = 倍率）
+各ケースについて処理時間・件数/秒・DB と外部 HTTP の往復回数・ピークメモリ (tracemalloc) を出す。
+
+使い方（リポジトリ直下から）:
+    python -m benchmarks.bench_collectors                      # 1倍と100倍
+    python -m benchmarks.bench_collectors --db-latency 20 --http-latency 80 --only youtube survey
+    python -m benchmarks.bench_collectors --json result.json
+    python -m benchmarks.bench_collectors --baseline result.json   # 悪化していれば終了コード 1
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_import_survey import write_synthetic_csv  # noqa: E402
+from benchmarks.bench_schedule_parser import synthetic_archive  # noqa: E402
+from benchmarks.fake_postgrest import FakePostgrest  # noqa: E402
+from benchmarks.replay_http import FIXTURE_DIR, ReplayAdapter  # noqa: E402
+
+# 20260202.csv の回答数（1倍のアンケート件数）
+SURVEY_ROWS = 233
+SURVEY_EVENT = {"id": 1, "event_date": "2026-02-02", "title": "UVERworld LIVE at 日本武道館", "category": "LIVE"}
+BENCHMARKS = ["youtube", "schedule", "survey", "sns"]
+# 短いケースの計測ぶれを悪化と判定しないための下限 [秒]
+MIN_REGRESSION_SEC = 0.1
+
+
+def _configure(fake_url, tmp):
+    """
+    収集スクリプトの接続先をローカルのフェイクに向ける。
+    モジュールは設定値を import 時に読むので、環境変数を設定してから import する。
+    """
+    os.environ.update({"SUPABASE_URL": fake_url, "SUPABASE_KEY": "bench-key", "YOUTUBE_API_KEY": "bench-key"})
+    import http_cache
+    import http_client
+    import import_survey
+    # 記録済みレスポンスを返すだけなので、スクレイピング先への間隔制御は外す
+    http_client.HOST_LIMITS = {}
+    # 毎回同じ応答になるため、キャッシュがあると2回目以降は通信せずに返り HTTP の計測にならない
+    http_cache.ENABLED = False
+    import write_buffer
+    write_buffer.JOURNAL_FILE = os.path.join(tmp, "write_journal.jsonl")
+    import_survey.SUPABASE_URL, import_survey.SUPABASE_KEY = fake_url, "bench-key"
+
+# ==========================================
+# ケースごとの準備（戻り値: (実行する関数, 件数)）
+# ==========================================
+
+def setup_youtube(scale, fake, replay, client, tmp):
+    import uver_to_supabase
+
+    songs = dict(uver_to_supabase.SONG_LIST)
+    for i in range(len(uver_to_supabase.SONG_LIST) * (scale - 1)):
+        songs[f"bench{i:07d}"] = f"『BENCH {i}』"
+    # 公開日まで揃ったカタログがあるものとして、statistics のみの取得を計測する
+    fake.seed("video_catalog", [
+        {"video_id": vid, "title": title, "published_at": "2020-01-01", "tracked": True, "source": "playlist"}
+        for vid, title in songs.items()
+    ])
+    # 前日・7日前の日次集計があるものとして差分計算まで通す
+    today = datetime.now().date()
+    fake.seed("youtube_daily", [
+        {"video_id": vid, "stat_date": (today - timedelta(days=d)).isoformat(), "views": 1000}
+        for vid in songs for d in (1, 7)
+    ])
+
+    return (lambda: uver_to_supabase.fetch_and_save(client)), len(songs)
+
+
+def setup_schedule(scale, fake, replay, client, tmp):
+    import sync_all_data
+    from schedule_parser import parse_schedule
+
+    with open(os.path.join(FIXTURE_DIR, "schedule_list.html"), encoding="utf-8") as f:
+        html = f.read()
+    n_items = len(parse_schedule(html))
+    if scale > 1:
+        html = synthetic_archive(n_items * scale)
+        replay.set_body("www.uverworld.jp", "/schedule/list/", html)
+    events = parse_schedule(html)
+    # 半分は登録済みとして差分判定を通す
+    fake.seed("calendar_events", [ev.to_row() for ev in events[::2]])
+    return (lambda: sync_all_data.scrape_uver_schedule(client)), len(events)
+
+
+def _apply_survey_diff(fake, params):
+    """sql/008 の apply_survey_diff と同じく、id 指定の削除と行の追加をまとめて適用する（呼び出し元がロック済み）"""
+    delete_ids = set(params["p_delete_ids"] or [])
+    rows = fake.tables["survey_responses"]
+    kept = [row for row in rows if row["id"] not in delete_ids]
+    deleted = len(rows) - len(kept)
+    kept += [fake._with_defaults("survey_responses", dict(row)) for row in params["p_insert"] or []]
+    fake.tables["survey_responses"] = kept
+    return {"deleted": deleted, "inserted": len(params["p_insert"] or [])}
+
+
+def _add_youtube_quota(fake, params):
+    """sql/009 の add_youtube_quota と同じく、その日の使用量に加算する（呼び出し元がロック済み）"""
+    rows = fake.tables["youtube_quota_usage"]
+    row = next((r for r in rows if r["quota_date"] == params["p_quota_date"]), None)
+    if row is None:
+        row = fake._with_defaults("youtube_quota_usage", {"quota_date": params["p_quota_date"], "units": 0})
+        rows.append(row)
+    row["units"] += params["p_units"]
+    return row["units"]
+
+
+def setup_survey(scale, fake, replay, client, tmp):
+    import import_survey
+
+    rows = SURVEY_ROWS * scale
+    path = os.path.join(tmp, f"survey_{scale}.csv")
+    write_synthetic_csv(path, rows, "cp932")
+    fake.seed("calendar_events", [SURVEY_EVENT])
+    fake.register_rpc("apply_survey_diff", _apply_survey_diff)
+    return (lambda: import_survey.import_survey(path, event_id=SURVEY_EVENT["id"], venue_type="HALL",
+                                                chunksize=100_000)), rows
+
+
+def setup_sns(scale, fake, replay, client, tmp):
+    import sns_to_supabase
+
+    def run():
+        return sum(sns_to_supabase.run("official", client) for _ in range(scale))
+    return run, scale
+
+
+SETUPS = {"youtube": setup_youtube, "schedule": setup_schedule, "survey": setup_survey, "sns": setup_sns}
+# 実行後に件数分の行があるはずのテーブル（正しく動いたかの確認）。数値は件数によらない行数
+# sns は同じ日に何度実行しても (platform, 取得日) の1行に上書きされる
+EXPECTED_ROWS = {
+    "youtube": {"youtube_stats": None, "youtube_latest": None},
+    "survey": {"survey_responses": None},
+    "sns": {"sns_stats": 1},
+}
+
+# ==========================================
+# 計測
+# ==========================================
+
+def _run_once(name, scale, fake, replay, client, tmp, trace_memory):
+    fake.reset()
+    replay = ReplayAdapter(replay.latency).install()
+    run, items = SETUPS[name](scale, fake, replay, client, tmp)
+    fake.reset_counters()
+
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        run()
+    elapsed = time.perf_counter() - start
+    peak = 0
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    ok = all(len(fake.tables[table]) == (items if expected is None else expected)
+             for table, expected in EXPECTED_ROWS.get(name, {}).items())
+    return {
+        "seconds": elapsed,
+        "items": items,
+        "db_round_trips": sum(fake.round_trips.values()),
+        "http_round_trips": sum(replay.round_trips.values()),
+        "db_bytes": fake.bytes_in + fake.bytes_out,
+        "peak_mb": peak / 1e6,
+        "ok": ok,
+        "db_calls": {f"{m} {t}": n for (m, t), n in sorted(fake.round_trips.items())},
+    }
+
+
+def check_upsert_updates(fake, client, tmp):
+    """
+    同じ日の再取得（upsert で id はそのまま、created_at と値が新しくなる）が
+    DeltaTable とローカルストアのエクスポートに反映されるかを確認する。問題をリストで返す。
+    """
+    import local_store
+    from data_cache import DeltaTable
+
+    fake.reset()
+    start = datetime.now().astimezone().replace(hour=9, minute=0, second=0, microsecond=0)
+    rows = lambda at, views: [{"video_id": f"v{i}", "title": f"song {i}", "views": views, "published_at": "2020-01-01",
+                               "snapshot_date": start.date().isoformat(), "created_at": at.isoformat()}
+                              for i in range(3)]
+    upsert = lambda at, views: client.table("youtube_stats").upsert(
+        rows(at, views), on_conflict="video_id,snapshot_date").execute()
+
+    problems = []
+    root = os.path.join(tmp, "store_check")
+    table = DeltaTable(client, "youtube_stats", ["video_id", "views"], "video_id")
+    upsert(start, 100)
+    table.refresh(force=True)
+    local_store.export_all(client, root, ["youtube_stats"])
+    upsert(start + timedelta(hours=1), 200)
+    if table.refresh(force=True) != 3:
+        problems.append("DeltaTable: upsert で更新された行を取得していない")
+    if sorted(table.latest["views"]) != [200] * 3 or len(table.frame) != 3:
+        problems.append(f"DeltaTable: 最新値が更新されていない ({sorted(table.latest['views'])})")
+    local_store.export_all(client, root, ["youtube_stats"])
+    stored = local_store.read_table("youtube_stats", root=root)
+    if sorted(stored["views"]) != [200] * 3:
+        problems.append(f"local_store: 更新前の行が残っている ({sorted(stored['views'])})")
+    return problems
+
+
+def run_benchmarks(names, scales, db_latency, http_latency):
+    from supabase import create_client
+
+    results = []
+    with FakePostgrest(latency=db_latency) as fake, tempfile.TemporaryDirectory() as tmp:
+        _configure(fake.url, tmp)
+        client = create_client(fake.url, "bench-key")
+        fake.register_rpc("add_youtube_quota", _add_youtube_quota)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            problems = check_upsert_updates(fake, client, tmp)
+        for problem in problems:
+            print(f"❌ {problem}")
+        print(f"{'❌' if problems else '✅'} 同じ日の再取得（upsert）の反映")
+        replay = ReplayAdapter(http_latency)
+        for name in names:
+            for scale in scales:
+                # 時間は tracemalloc なしで計測し、メモリは別の実行で計測する
+                timing = _run_once(name, scale, fake, replay, client, tmp, trace_memory=False)
+                memory = _run_once(name, scale, fake, replay, client, tmp, trace_memory=True)
+                result = {"name": name, "scale": scale, **timing, "peak_mb": memory["peak_mb"]}
+                results.append(result)
+                _print_row(result)
+    return results, problems
+
+
+def _print_header():
+    print(f"{'case':<10}{'scale':>6}{'items':>9}{'sec':>9}{'items/s':>11}{'db rt':>8}{'http rt':>9}{'peak MB':>9}  ok")
+
+
+def _print_row(r):
+    print(f"{r['name']:<10}{r['scale']:>5}x{r['items']:>9,}{r['seconds']:>9.3f}{r['items'] / r['seconds']:>11,.0f}"
+          f"{r['db_round_trips']:>8}{r['http_round_trips']:>9}{r['peak_mb']:>9.1f}  {'✅' if r['ok'] else '❌'}")
+
+
+def compare(results, baseline, tolerance, min_delta=MIN_REGRESSION_SEC):
+    """基準結果より遅い・往復回数が多いケースを返す（往復回数は1回でも増えれば悪化）"""
+    base = {(b["name"], b["scale"]): b for b in baseline}
+    regressions = []
+    for r in results:
+        b = base.get((r["name"], r["scale"]))
+        if b is None:
+            continue
+        if r["seconds"] - b["seconds"] > max(b["seconds"] * tolerance, min_delta):
+            regressions.append(f"{r['name']} {r['scale']}x: {b['seconds']:.3f}s → {r['seconds']:.3f}s")
+        for key in ("db_round_trips", "http_round_trips"):
+            if r[key] > b[key]:
+                regressions.append(f"{r['name']} {r['scale']}x: {key} {b[key]} → {r[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="収集スクリプトのオフラインベンチマーク")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--scales", nargs="+", type=int, default=[1, 100], help="データ量の倍率")
+    parser.add_argument("--db-latency", type=float, default=5.0, help="DB 1往復あたりの遅延 [ms]")
+    parser.add_argument("--http-latency", type=float, default=30.0, help="外部 HTTP 1往復あたりの遅延 [ms]")
+    parser.add_argument("--json", help="結果を JSON で保存する")
+    parser.add_argument("--baseline", help="比較する過去の結果 (JSON)")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="処理時間の許容悪化率")
+    args = parser.parse_args()
+
+    print(f"🧪 DB遅延 {args.db_latency}ms / HTTP遅延 {args.http_latency}ms")
+    _print_header()
+    results, problems = run_benchmarks(args.only, args.scales, args.db_latency / 1000, args.http_latency / 1000)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=1)
+        print(f"💾 {args.json} に保存しました")
+
+    failed = [f"{r['name']} {r['scale']}x" for r in results if not r["ok"]]
+    if failed:
+        print(f"❌ 保存件数が不足: {', '.join(failed)}")
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"⚠️ 悪化: {line}")
+        if not regressions:
+            print("✅ 基準からの悪化なし")
+    sys.exit(1 if failed or regressions or problems else 0)
+
+
+if __name__ == "__main__":
+    main()
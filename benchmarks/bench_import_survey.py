@@ -0,0 +1,122 @@
+"""
+アンケート取り込みのベンチマーク
+
+20260202.csv と同じ列構成の合成データを作り、旧実装（iterrows + re.findall）と
+import_survey.normalize_survey の rows/sec を比較し、出力が一致することを確認する。
+Supabase への送信は行わない。
+
+使い方（リポジトリ直下から）:
+    python -m benchmarks.bench_import_survey
+    python -m benchmarks.bench_import_survey --rows 2000000 --chunksize 200000 --skip-legacy
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from import_survey import normalize_survey, read_survey_csv  # noqa: E402
+
+LIVE = ("UVERworld LIVE at 日本武道館", "HALL", "2026", "2026-02-02")
+
+SONGS = ["THE SONG", "Roots", "LONE WOLF", "AWAYOKUBA-斬る", "美影意志", "マダラ蝶", "LIFE",
+         "病院希求日記、DISCORD", "扉、Lump of affection", " 7th Trigger ", "ai ta心", "心とココロ"]
+VISITS = ["1回", "1", "2回", "2", "1回目", "3", "１回", "6回", "３回", "初めて", ""]
+PREFS = ["神奈川県", "東京都", "埼玉県", "千葉県", "茨城県", "静岡県", "大阪府", ""]
+AGES = [str(n) for n in range(15, 70)] + ["３０", "40歳", ""]
+GENDERS = ["男性", "女性", "回答しない", ""]
+
+
+def legacy_normalize(df, live_name, venue_type, event_year, event_date):
+    """import_survey の旧整形ループ（比較用）"""
+    def extract_number(text):
+        if pd.isna(text): return "1"
+        nums = re.findall(r'\d+', str(text))
+        return nums[0] if nums else "1"
+
+    records = []
+    for _, row in df.iterrows():
+        raw_song = str(row['曲名']) if pd.notna(row['曲名']) else "未回答"
+        attendance_num = extract_number(row['項目2'])
+        visits_str = f"{attendance_num}回"
+
+        if pd.notna(row['年齢']):
+            nums = re.findall(r'\d+', str(row['年齢']))
+            if nums:
+                age_val = int(nums[0])
+                age_display = f"{(age_val // 10) * 10}代" if age_val < 60 else "60代以上"
+            else:
+                age_display = "未回答"
+        else:
+            age_display = "未回答"
+
+        records.append({
+            "live_name":    live_name,
+            "venue_type":   venue_type,
+            "event_year":   event_year,
+            "request_song": raw_song.strip(),
+            "visits":       visits_str,
+            "prefecture":   str(row['都道府県名']) if pd.notna(row['都道府県名']) else "未回答",
+            "age":          age_display,
+            "gender":       str(row['性別']) if pd.notna(row['性別']) else "未回答",
+            "created_at":   f"{event_date}T09:00:00Z"
+        })
+    return records
+
+
+def write_synthetic_csv(path, n_rows, encoding, seed=0):
+    """20260202.csv と同じ列構成の合成 CSV を書き出す（空欄は欠損値になる）"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding=encoding, newline="") as f:
+        f.write("曲名,項目2,都道府県名,年齢,性別\n")
+        for _ in range(n_rows):
+            song = rng.choice(SONGS)
+            f.write(f'"{song}",{rng.choice(VISITS)},{rng.choice(PREFS)},{rng.choice(AGES)},{rng.choice(GENDERS)}\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="import_survey benchmark")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--encoding", default="cp932", help="合成 CSV の文字コード")
+    parser.add_argument("--skip-legacy", action="store_true", help="旧実装の計測を省略（大規模データ用）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "survey.csv")
+        write_synthetic_csv(path, args.rows, args.encoding)
+        print(f"📄 合成データ: {args.rows:,}行 ({os.path.getsize(path) / 1e6:.1f} MB, {args.encoding})")
+
+        start = time.perf_counter()
+        frames = [normalize_survey(chunk, *LIVE) for chunk in read_survey_csv(path, chunksize=args.chunksize)]
+        new_df = pd.concat(frames, ignore_index=True)
+        new_sec = time.perf_counter() - start
+        print(f"   新実装 (読込+整形) : {new_sec:8.2f} s  ({args.rows / new_sec:,.0f} rows/sec)")
+
+        if args.skip_legacy:
+            return
+
+        start = time.perf_counter()
+        try:
+            raw = pd.read_csv(path, encoding='utf-8')
+        except UnicodeDecodeError:
+            raw = pd.read_csv(path, encoding='shift_jis')
+        legacy_records = legacy_normalize(raw, *LIVE)
+        legacy_sec = time.perf_counter() - start
+        print(f"   旧実装 (読込+整形) : {legacy_sec:8.2f} s  ({args.rows / legacy_sec:,.0f} rows/sec)")
+        print(f"   高速化             : x{legacy_sec / new_sec:.1f}")
+
+        # request_songs（曲名の正規化結果）は新実装のみの列なので比較から除く
+        matched = new_df.drop(columns=['request_songs']).to_dict('records') == legacy_records
+        print(f"   出力一致           : {'✅' if matched else '❌'}")
+        sys.exit(0 if matched else 1)
+
+
+if __name__ == "__main__":
+    main()
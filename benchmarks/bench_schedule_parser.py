@@ -0,0 +1,164 @@
+"""
+スケジュールパーサーのベンチマーク
+
+保存済みのスケジュールページと、大量の項目を持つ合成アーカイブページに対して
+旧パーサー（html.parser + 正規表現のクラス検索）と schedule_parser を比較し、
+items/sec と出力の一致を確認する。
+
+使い方（リポジトリ直下から）:
+    python -m benchmarks.bench_schedule_parser
+    python -m benchmarks.bench_schedule_parser --archive-items 50000 saved_page.html
+    python -m benchmarks.bench_schedule_parser --record   # 公式サイトの現行ページを保存
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schedule_parser import parse_schedule  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+SCHEDULE_URL = "https://www.uverworld.jp/schedule/list/"
+
+
+def legacy_parse(html):
+    """sync_all_data.scrape_uver_schedule の旧解析ロジック（比較用）"""
+    soup = BeautifulSoup(html, 'html.parser')
+    items = soup.find_all(['li', 'dl'], class_=re.compile(r'schedule|list|item'))
+    if not items:
+        items = soup.find_all('li')
+
+    events = []
+    for item in items:
+        text_full = item.get_text(" ", strip=True)
+        date_match = re.search(r'(\d{4})\.(\d{2})\.(\d{2})', text_full)
+        if not date_match:
+            continue
+        event_date = f"{date_match.group(1)}-{date_match.group(2)}-{date_match.group(3)}"
+
+        link_el = item.find('a')
+        raw_title = link_el.get_text(" ", strip=True) if link_el else text_full
+
+        category = "OTHER"
+        cat_text = "OTHER"
+        cat_match = re.search(r'(TOUR|LIVE|EVENT|RELEASE|TV|RADIO|MAGAZINE|GOODS|TICKET)', raw_title.upper())
+        if cat_match:
+            cat_text = cat_match.group(1)
+            if cat_text in ["TOUR", "LIVE", "EVENT"]: category = "LIVE"
+            elif cat_text == "RELEASE": category = "RELEASE"
+            elif cat_text in ["TV", "RADIO", "MAGAZINE"]: category = "TV"
+
+        clean_title = raw_title.replace(date_match.group(0), "")
+        clean_title = re.sub(r'\[.*?\]', '', clean_title)
+        if cat_text in clean_title.upper():
+            clean_title = re.sub(re.escape(cat_text), '', clean_title, flags=re.IGNORECASE)
+        clean_title = " ".join(clean_title.split()).strip()
+        if not clean_title: clean_title = f"{cat_text} (詳細不明)"
+
+        events.append((event_date, category, clean_title, cat_text))
+    return events
+
+
+CATEGORIES = ["LIVE", "TOUR", "EVENT", "RELEASE", "TV", "RADIO", "MAGAZINE", "GOODS", "TICKET", ""]
+VENUES = ["日本武道館", "大阪城ホール", "横浜アリーナ", "Zepp Haneda", "京セラドーム大阪", "東京ドーム", "滋賀 U☆STONE"]
+WEEKDAYS = ["MON", "TUE", "WED", "THU", "FRI", "SAT", "SUN"]
+
+
+def synthetic_archive(n_items, seed=0):
+    """過去分を全て並べたアーカイブページを想定した合成 HTML"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_items):
+        year = 2005 + i % 22
+        date = f"{year}.{rng.randint(1, 12):02d}.{rng.randint(1, 28):02d} [{rng.choice(WEEKDAYS)}]"
+        cat = rng.choice(CATEGORIES)
+        title = f"UVERworld {cat or 'INFO'} {year} at {rng.choice(VENUES)} #{i}"
+        if rng.random() < 0.1:
+            body = f'<p class="date">{date}</p><p class="title">{title}</p>'
+        else:
+            body = (f'<a href="/schedule/detail/{i}"><p class="date">{date}</p>'
+                    f'<span class="category">{cat}</span><p class="title">{title}</p></a>')
+        rows.append(f'<li class="schedule-item">{body}</li>')
+        if i % 50 == 0:
+            rows.append('<li class="pager-item"><a href="?page=2">NEXT</a></li>')
+    return ('<html><head><meta charset="UTF-8"></head><body>'
+            '<ul class="nav-list"><li class="nav-item"><a href="/">TOP</a></li></ul>'
+            f'<ul class="schedule-list">{"".join(rows)}</ul></body></html>')
+
+
+def _time(func, html, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(html)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_case(name, html, repeat):
+    legacy_sec, legacy_out = _time(legacy_parse, html, repeat)
+    new_sec, new_events = _time(parse_schedule, html, repeat)
+    new_out = [tuple(ev) for ev in new_events]
+
+    matched = legacy_out == new_out
+    n = len(new_out)
+    print(f"\n📄 {name}: {n}件")
+    print(f"   旧パーサー : {legacy_sec * 1000:9.1f} ms  ({n / legacy_sec:,.0f} items/sec)")
+    print(f"   新パーサー : {new_sec * 1000:9.1f} ms  ({n / new_sec:,.0f} items/sec)")
+    print(f"   高速化     : x{legacy_sec / new_sec:.1f}")
+    print(f"   出力一致   : {'✅' if matched else '❌'}")
+    if not matched:
+        for old, new in zip(legacy_out, new_out):
+            if old != new:
+                print(f"   最初の差分: {old} != {new}")
+                break
+        if len(legacy_out) != n:
+            print(f"   件数の差分: 旧 {len(legacy_out)} / 新 {n}")
+    return matched
+
+
+def record(path):
+    """公式サイトのスケジュールページを fixtures に保存する"""
+    import requests
+    res = requests.get(SCHEDULE_URL, timeout=15, headers={'User-Agent': 'Mozilla/5.0'})
+    res.encoding = res.apparent_encoding
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(res.text)
+    print(f"💾 保存しました: {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="schedule_parser benchmark")
+    parser.add_argument("pages", nargs="*", help="保存済みの HTML ファイル（省略時は fixtures を使用）")
+    parser.add_argument("--archive-items", type=int, default=20000, help="合成アーカイブページの項目数")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--record", action="store_true", help="現行ページを fixtures/schedule_live.html に保存")
+    args = parser.parse_args()
+
+    if args.record:
+        record(os.path.join(FIXTURE_DIR, "schedule_live.html"))
+
+    pages = args.pages or sorted(
+        os.path.join(FIXTURE_DIR, f) for f in os.listdir(FIXTURE_DIR) if f.startswith("schedule") and f.endswith(".html")
+    )
+
+    ok = True
+    for path in pages:
+        with open(path, encoding="utf-8") as f:
+            ok &= run_case(os.path.basename(path), f.read(), args.repeat)
+    if args.archive_items:
+        ok &= run_case("synthetic archive", synthetic_archive(args.archive_items), args.repeat)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+曲名正規化のベンチマーク
+
+song_normalizer の回答 → 正式名の変換を合成データで計測し、
+既知の回答（表記ゆれ・別の曲と取り違えやすい短い曲名）が期待どおりに変換されることを確認する。
+Supabase への送信は行わない。
+
+使い方（リポジトリ直下から）:
+    python -m benchmarks.bench_song_normalizer
+    python -m benchmarks.bench_song_normalizer --answers 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from song_normalizer import SongNormalizer, catalog_titles  # noqa: E402
+
+# 回答 → 期待する変換結果（一致しない曲は整形後の文字列がそのまま残る）
+EXPECTED = {
+    # 表記ゆれ・別表記は正式名に揃える
+    "病院希求日記": ("病的希求日記",),
+    "Lump of afection": ("Lump of affection",),
+    "UNKNOWN ORCHESTLA": ("UNKNOWN ORCHESTRA",),
+    "CORE PRID": ("CORE PRIDE",),
+    "1億分の1の小説、ハイ問題作": ("一億分の一の小説", "ハイ!問題作"),
+    "99/100騙しの哲(フル)": ("99/100騙しの哲",),
+    "BABY BORN & GO": ("BABY BORN ＆ GO",),
+    # 丸数字での列挙は区切りとして扱い、番号を曲名の一部にしない
+    "①扉②DISCORD": ("扉", "DISCORD"),
+    # 短い曲名は1文字違いでも別の曲なので、カタログの曲に寄せない
+    "LIVE": ("LIVE",),
+    "PRIDE": ("PRIDE",),
+    "GOLDEN": ("GOLDEN",),
+    "CORE": ("CORE",),
+    "Rushy": ("Rushy",),
+    "SHINE ON": ("SHINE ON",),
+    "LIFE": ("LIFE",),
+    "Rush": ("Rush",),
+}
+
+
+def check(normalizer):
+    """EXPECTED と違う変換結果を (回答, 期待, 結果) のリストで返す"""
+    return [(answer, expected, normalizer.normalize(answer))
+            for answer, expected in EXPECTED.items() if normalizer.normalize(answer) != expected]
+
+
+def synthetic_answers(n, seed=0):
+    """カタログの曲名に表記ゆれ・補足・複数曲を混ぜた回答"""
+    rng = random.Random(seed)
+    titles = catalog_titles()
+    answers = []
+    for _ in range(n):
+        picks = [rng.choice(titles) for _ in range(rng.choice([1, 1, 1, 2, 3]))]
+        if rng.random() < 0.3:
+            picks = [p.lower() if rng.random() < 0.5 else p[:-1] for p in picks]
+        answer = "、".join(picks)
+        if rng.random() < 0.1:
+            answer += "(フル)"
+        answers.append(answer)
+    return answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="曲名正規化の計測と変換結果の確認")
+    parser.add_argument('--answers', type=int, default=200_000, help='合成する回答数')
+    parser.add_argument('--unique', type=int, default=20_000, help='回答のうち異なる文字列の数')
+    args = parser.parse_args()
+
+    mismatches = check(SongNormalizer())
+    for answer, expected, result in mismatches:
+        print(f"❌ {answer!r}: 期待 {expected} / 結果 {result}")
+    print(f"{'✅' if not mismatches else '❌'} 変換結果の確認: {len(EXPECTED) - len(mismatches)}/{len(EXPECTED)}")
+
+    pool = synthetic_answers(args.unique)
+    rng = random.Random(1)
+    answers = [rng.choice(pool) for _ in range(args.answers)]
+    normalizer = SongNormalizer()
+    start = time.perf_counter()
+    for answer in answers:
+        normalizer.normalize(answer)
+    elapsed = time.perf_counter() - start
+    print(f"⏱️ {args.answers:,}件 ({args.unique:,}種類): {elapsed:.3f}秒 ({args.answers / elapsed:,.0f}件/秒)")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+ベンチマーク用のローカル PostgREST 互換サーバー（インメモリ）
+
+supabase-py が発行するリクエストのうち、このリポジトリで使っている範囲だけを実装する。
+    GET    /rest/v1/<table>?select=&<col>=<op>.<value>&order=&offset=&limit=
+    POST   /rest/v1/<table>[?on_conflict=]   insert / upsert (Prefer: resolution=merge|ignore-duplicates)
+    PATCH  /rest/v1/<table>?<filters>        update
+    DELETE /rest/v1/<table>?<filters>        delete
+    POST   /rest/v1/rpc/<name>               register_rpc で登録した関数
+フィルタ演算子: eq, neq, gt, gte, lt, lte, like, ilike, in, is
+
+使い方:
+    with FakePostgrest(latency=0.02) as fake:
+        supabase = create_client(fake.url, "bench-key")
+        ...
+        print(fake.round_trips)
+"""
+import json
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+RESERVED_PARAMS = {"select", "order", "offset", "limit", "on_conflict", "columns"}
+
+
+def _coerce(value):
+    """数値として比較できるものは数値にする（日付などは ISO 文字列のまま比較）"""
+    if value is None:
+        return value
+    if isinstance(value, bool):
+        # PostgREST のクエリでは true / false と書く
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _compare(a, b):
+    a, b = _coerce(a), _coerce(b)
+    if type(a) is not type(b):
+        a, b = str(a), str(b)
+    return (a > b) - (a < b)
+
+
+def _parse_in(value):
+    """in.(a,"b,c") → ["a", "b,c"]"""
+    return [m.group(1) if m.group(1) is not None else m.group(2)
+            for m in re.finditer(r'"((?:[^"\\]|\\.)*)"|([^,]+)', value.strip("()"))]
+
+
+def _like(pattern, flags=0):
+    return re.compile("^" + ".*".join(re.escape(p) for p in pattern.split("%")) + "$", flags | re.DOTALL)
+
+
+def _compile(column, expr):
+    """フィルタ 1つを行 dict → bool の関数にする（リクエストごとに1回だけ解析する）"""
+    op, _, value = expr.partition(".")
+    negate = op == "not"
+    if negate:
+        op, _, value = value.partition(".")
+
+    if op in ("eq", "neq", "in"):
+        values = {_coerce(v) for v in (_parse_in(value) if op == "in" else [value])}
+        hit = op != "neq"
+        test = lambda cell: (_coerce(cell) in values) == hit
+    elif op in ("gt", "gte", "lt", "lte"):
+        check = {"gt": lambda c: c > 0, "gte": lambda c: c >= 0, "lt": lambda c: c < 0, "lte": lambda c: c <= 0}[op]
+        test = lambda cell: check(_compare(cell, value))
+    elif op in ("like", "ilike"):
+        pattern = _like(value, re.IGNORECASE if op == "ilike" else 0)
+        test = lambda cell: bool(pattern.match(str(cell)))
+    elif op == "is":
+        expected = {"true": True, "false": False, "null": None}.get(value)
+        return lambda row: (row.get(column) is expected) != negate
+    else:
+        raise ValueError(f"unsupported operator: {op}")
+
+    def predicate(row):
+        cell = row.get(column)
+        return cell is not None and test(cell) != negate
+    return predicate
+
+
+def _filter(rows, filters):
+    predicates = [_compile(c, e) for c, e in filters]
+    return [r for r in rows if all(p(r) for p in predicates)]
+
+
+class FakePostgrest:
+    """
+    テーブルは {名前: [行 dict]} で保持する。id / created_at が無い行には自動で付与する。
+    latency 秒のスリープを各リクエストに入れ、メソッド・テーブルごとの往復回数を数える。
+    """
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.tables = defaultdict(list)
+        self.round_trips = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._rpcs = {}
+        self._next_id = defaultdict(int)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # --- データ操作 ---
+
+    def seed(self, table, rows):
+        with self._lock:
+            for row in rows:
+                self.tables[table].append(self._with_defaults(table, dict(row)))
+
+    def reset(self):
+        """全テーブルとカウンターを空にする"""
+        with self._lock:
+            self.tables.clear()
+            self._next_id.clear()
+        self.reset_counters()
+
+    def reset_counters(self):
+        with self._lock:
+            self.round_trips.clear()
+            self.bytes_in = self.bytes_out = 0
+
+    def register_rpc(self, name, func):
+        """func(fake, params) の戻り値を JSON で返す"""
+        self._rpcs[name] = func
+
+    def _with_defaults(self, table, row):
+        if "id" not in row:
+            self._next_id[table] += 1
+            row["id"] = self._next_id[table]
+        else:
+            self._next_id[table] = max(self._next_id[table], int(row["id"]))
+        row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+        return row
+
+    def _select(self, table, params):
+        rows = _filter(self.tables[table], params["filters"])
+        for spec in reversed(params["order"]):
+            column, _, direction = spec.partition(".")
+            desc = direction.startswith("desc")
+            rows.sort(key=lambda r: (r.get(column) is None, _coerce(r.get(column)) if r.get(column) is not None else 0),
+                      reverse=desc)
+        offset = params["offset"]
+        limit = params["limit"]
+        rows = rows[offset:offset + limit if limit is not None else None]
+        columns = params["select"]
+        if columns and columns != ["*"]:
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+        return [dict(r) for r in rows]
+
+    def _insert(self, table, body, on_conflict, resolution):
+        rows = body if isinstance(body, list) else [body]
+        keys = on_conflict.split(",") if on_conflict else None
+        result = []
+        existing = {}
+        if keys:
+            existing = {tuple(str(r.get(k)) for k in keys): r for r in self.tables[table]}
+        for row in rows:
+            if keys:
+                key = tuple(str(row.get(k)) for k in keys)
+                if key in existing:
+                    if resolution == "merge-duplicates":
+                        existing[key].update(row)
+                        result.append(dict(existing[key]))
+                    continue
+            new = self._with_defaults(table, dict(row))
+            self.tables[table].append(new)
+            if keys:
+                existing[key] = new
+            result.append(dict(new))
+        return result
+
+    def _delete(self, table, filters):
+        deleted = _filter(self.tables[table], filters)
+        ids = {id(r) for r in deleted}
+        self.tables[table] = [r for r in self.tables[table] if id(r) not in ids]
+        return deleted
+
+    def _update(self, table, filters, body):
+        updated = _filter(self.tables[table], filters)
+        for r in updated:
+            r.update(body)
+        return [dict(r) for r in updated]
+
+    # --- HTTP ---
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # ヘッダーと本文が別パケットになるため、Nagle による遅延が計測に混ざらないようにする
+            disable_nagle_algorithm = True
+
+            def _parse(self):
+                parts = urlsplit(self.path)
+                params = {"select": None, "order": [], "offset": 0, "limit": None,
+                          "on_conflict": None, "filters": []}
+                for key, value in parse_qsl(parts.query, keep_blank_values=True):
+                    if key == "select":
+                        params["select"] = [c.strip() for c in value.split(",")]
+                    elif key == "order":
+                        params["order"] = value.split(",")
+                    elif key in ("offset", "limit"):
+                        params[key] = int(value)
+                    elif key == "on_conflict":
+                        params["on_conflict"] = value
+                    elif key not in RESERVED_PARAMS:
+                        params["filters"].append((key, value))
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else None
+                prefer = self.headers.get("Prefer", "")
+                resolution = re.search(r"resolution=([\w-]+)", prefer)
+                path = parts.path[len("/rest/v1/"):] if parts.path.startswith("/rest/v1/") else parts.path
+                return path, params, body, resolution.group(1) if resolution else None, len(raw)
+
+            def _handle(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                path, params, body, resolution, size = self._parse()
+                with fake._lock:
+                    fake.round_trips[(self.command, path)] += 1
+                    fake.bytes_in += size
+                    try:
+                        if path.startswith("rpc/"):
+                            func = fake._rpcs.get(path[4:])
+                            if func is None:
+                                return self._send(404, {"message": f"function {path[4:]} not found"})
+                            result = func(fake, body or {})
+                        elif self.command == "GET":
+                            result = fake._select(path, params)
+                        elif self.command == "POST":
+                            result = fake._insert(path, body, params["on_conflict"], resolution)
+                        elif self.command == "DELETE":
+                            result = fake._delete(path, params["filters"])
+                        elif self.command == "PATCH":
+                            result = fake._update(path, params["filters"], body or {})
+                        else:
+                            return self._send(405, {"message": "method not allowed"})
+                    except Exception as e:
+                        return self._send(400, {"message": str(e)})
+                self._send(201 if self.command == "POST" and not path.startswith("rpc/") else 200, result)
+
+            def _send(self, status, body):
+                data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+                fake.bytes_out += len(data)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = do_DELETE = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
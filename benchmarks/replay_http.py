@@ -0,0 +1,105 @@
+"""
+記録済みレスポンスを返す requests 用アダプター（ベンチマーク用）
+
+http_client の共有セッションに mount すると、外部サイトへ接続せずに
+fixtures/http/ の JSON・HTML を返す。latency 秒の遅延を各リクエストに入れられる。
+
+    replay = ReplayAdapter(latency=0.05)
+    replay.install()                       # http_client.get_session() の https:// を差し替え
+    replay.set_body("www.uverworld.jp", "/schedule/list/", html)   # 応答の上書き
+"""
+import copy
+import json
+import os
+import threading
+import time
+import zlib
+from collections import Counter
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import BaseAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+HTTP_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "http")
+FIXTURE_DIR = os.path.dirname(HTTP_FIXTURE_DIR)
+
+
+def _read(name, base=HTTP_FIXTURE_DIR):
+    with open(os.path.join(base, name), "rb") as f:
+        return f.read()
+
+
+class ReplayAdapter(BaseAdapter):
+    """(ホスト, パス) ごとに記録済みの本文を返す。videos API は要求された ID 分の item を複製して返す"""
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.round_trips = Counter()
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+        self._video_template = json.loads(_read("youtube_videos.json"))["items"][0]
+        self._routes = {
+            ("www.googleapis.com", "/youtube/v3/videos"): self._videos,
+            ("www.googleapis.com", "/youtube/v3/channels"): _read("youtube_channels.json"),
+            ("www.uverworld.jp", "/schedule/list/"): _read("schedule_list.html", FIXTURE_DIR),
+            ("countik.com", "/user/@uver_takuya8"): _read("countik_user.html"),
+            ("www.picit.ai", "/instagram/user/uverworld_official"): _read("picit_user.html"),
+            ("cdn.syndication.twimg.com", "/widgets/followbutton/info.json"): _read("twimg_followbutton.json"),
+        }
+
+    def install(self, session=None):
+        if session is None:
+            import http_client
+            session = http_client.get_session()
+        session.mount("https://", self)
+        return self
+
+    def set_body(self, host, path, body):
+        self._routes[(host, path)] = body.encode("utf-8") if isinstance(body, str) else body
+
+    def reset_counters(self):
+        with self._lock:
+            self.round_trips.clear()
+            self.bytes_out = 0
+
+    def _videos(self, query):
+        """id=a,b,c の各 ID について記録済み item を複製する（再生数は ID ごとに変える）"""
+        ids = [i for i in ",".join(query.get("id", [])).split(",") if i]
+        items = []
+        for video_id in ids:
+            item = copy.deepcopy(self._video_template)
+            item["id"] = video_id
+            item["statistics"]["viewCount"] = str(1_000_000 + zlib.crc32(video_id.encode()) % 50_000_000)
+            items.append(item)
+        body = {"kind": "youtube#videoListResponse", "items": items,
+                "pageInfo": {"totalResults": len(items), "resultsPerPage": len(items)}}
+        return json.dumps(body).encode("utf-8")
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(request.url)
+        route = self._routes.get((parts.netloc, parts.path))
+        if route is None:
+            status, body = 404, b"not recorded"
+        else:
+            status, body = 200, route(parse_qs(parts.query)) if callable(route) else route
+
+        with self._lock:
+            self.round_trips[(parts.netloc, parts.path)] += 1
+            self.bytes_out += len(body)
+
+        res = Response()
+        res.status_code = status
+        res._content = body
+        res.encoding = "utf-8"
+        res.headers = CaseInsensitiveDict({"Content-Type": "application/json" if body[:1] in b"[{" else "text/html"})
+        res.url = request.url
+        res.request = request
+        res.connection = self
+        return res
+
+    def close(self):
+        pass
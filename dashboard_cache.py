@@ -0,0 +1,147 @@
+import os
+import time
+import threading
+from collections import Counter
+
+import instrumentation
+
+# --- 設定 ---
+# データの有効期間 [秒]。これを過ぎた値も返すが、裏で取り直す
+TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "600"))
+# 有効期間のこの割合を過ぎたら、期限切れになる前にバックグラウンドで取り直す
+REFRESH_AHEAD = 0.8
+# バックグラウンド更新の確認間隔 [秒]
+CHECK_SECONDS = 15
+# この秒数だれも見ていないデータはバックグラウンド更新を止める（次に見られたときに取り直す）
+IDLE_SECONDS = 60 * 60
+
+
+class _Entry:
+    def __init__(self, loader, ttl):
+        self.loader = loader
+        self.ttl = ttl
+        self.value = None
+        self.loaded_at = None
+        self.last_read = 0.0
+        self.error = None
+        # 同じデータの取得を同時に1つだけにする
+        self.lock = threading.Lock()
+
+
+class SharedCache:
+    """
+    プロセス全体（全セッション共通）のキャッシュ。stale-while-revalidate で動く。
+    初回だけは取得を待つが、以降は手元の値をすぐ返し、古くなった値はバックグラウンドで取り直す。
+    登録したデータは最初に読まれるまで取得しない（開かれないタブの分は読み込まない）。
+    """
+
+    def __init__(self, ttl=TTL, refresh_ahead=REFRESH_AHEAD, check_seconds=CHECK_SECONDS, idle_seconds=IDLE_SECONDS):
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.check_seconds = check_seconds
+        self.idle_seconds = idle_seconds
+        self.stats = Counter()
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def register(self, name, loader, ttl=None):
+        """loader() の戻り値を name で保持する（取得は最初の get まで行わない）"""
+        self._entries[name] = _Entry(loader, ttl or self.ttl)
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _load(self, name, entry):
+        """entry.lock を持った状態で呼ぶ"""
+        started = time.time()
+        try:
+            entry.value = entry.loader()
+        except Exception as e:
+            entry.error = f"{type(e).__name__}: {e}"
+            self._count("errors")
+            instrumentation.record_error(f"dashboard_cache.{name}", e)
+            raise
+        entry.loaded_at = time.time()
+        entry.error = None
+        self._count("loads")
+        instrumentation.emit("dashboard_cache", name=name, seconds=round(entry.loaded_at - started, 4))
+
+    def _reload(self, name, entry):
+        """バックグラウンドでの取り直し。失敗しても古い値を返し続ける"""
+        try:
+            self._load(name, entry)
+        except Exception:
+            pass
+        finally:
+            entry.lock.release()
+
+    def _reload_async(self, name, entry):
+        if entry.lock.acquire(blocking=False):
+            threading.Thread(target=self._reload, args=(name, entry), daemon=True).start()
+
+    def get(self, name):
+        """
+        保持している値をすぐ返す（ヒット）。まだ無ければ取得を待つ（ミス）。
+        期限切れの値も返したうえで、バックグラウンドで取り直す。初回の取得に失敗したら例外を送出する。
+        """
+        entry = self._entries[name]
+        entry.last_read = time.time()
+        if entry.loaded_at is None:
+            with entry.lock:
+                # 先に待っていた別のセッションが取得済みならそれを使う
+                if entry.loaded_at is None:
+                    self._count("misses")
+                    self._load(name, entry)
+                    return entry.value
+        self._count("hits")
+        if self.age(name) >= entry.ttl:
+            self._reload_async(name, entry)
+        return entry.value
+
+    def age(self, name):
+        """最後に取得してからの秒数（未取得なら None）"""
+        loaded_at = self._entries[name].loaded_at
+        return None if loaded_at is None else time.time() - loaded_at
+
+    # --- バックグラウンド更新 ---
+
+    def refresh_due(self):
+        """期限が近く、最近読まれているデータを取り直す。取り直した件数を返す"""
+        now = time.time()
+        refreshed = 0
+        for name, entry in list(self._entries.items()):
+            if entry.loaded_at is None or now - entry.last_read > self.idle_seconds:
+                continue
+            if now - entry.loaded_at < entry.ttl * self.refresh_ahead:
+                continue
+            if entry.lock.acquire(blocking=False):
+                self._count("background")
+                self._reload(name, entry)
+                refreshed += 1
+        return refreshed
+
+    def _run(self):
+        while not self._stop.wait(self.check_seconds):
+            self.refresh_due()
+
+    def start(self):
+        """バックグラウンド更新のスレッドを起動する（2回目以降は何もしない）"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="dashboard-cache", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        """画面表示用に、データごとの経過秒数・エラーと、ヒット・ミスなどの回数を返す"""
+        entries = {name: {"age": self.age(name), "ttl": entry.ttl, "error": entry.error}
+                   for name, entry in self._entries.items()}
+        with self._lock:
+            return entries, dict(self.stats)
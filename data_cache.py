@@ -0,0 +1,107 @@
+import threading
+import time
+
+# PostgREST の1リクエストあたりの取得件数
+PAGE_SIZE = 1000
+
+
+def fetch_all(build_query, page_size=PAGE_SIZE):
+    """build_query() が返すクエリを range でページングし、全行を返す（並び順は呼び出し側で指定）"""
+    rows = []
+    offset = 0
+    while True:
+        page = build_query().range(offset, offset + page_size - 1).execute().data
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        offset += page_size
+
+
+class DeltaTable:
+    """
+    追記専用テーブル（youtube_stats / sns_stats）のキャッシュ。
+    取得済みの最大 created_at を覚えておき、それ以降の行だけをページングで取得して
+    手元の DataFrame にマージする。キーごとの最新行も同時に更新する。
+    pandas はこのクラスを使うときだけ読み込む（fetch_all だけを使うコレクターは pandas 不要）。
+    """
+
+    def __init__(self, client, table, columns, key, max_age=600, page_size=PAGE_SIZE):
+        import pandas as pd
+
+        self.client = client
+        self.table = table
+        # 差分判定と重複除去に id / created_at は必須
+        self.columns = list(dict.fromkeys(["id", "created_at"] + list(columns)))
+        self.key = key
+        self.max_age = max_age
+        self.page_size = page_size
+
+        self.frame = pd.DataFrame(columns=self.columns)
+        self.latest = pd.DataFrame(columns=self.columns)
+        self.watermark = None        # 取得済みの最大 created_at (Timestamp)
+        self.refreshed_at = 0.0
+        self._ids_at_watermark = set()
+        self._lock = threading.Lock()
+
+    def _fetch_since(self, watermark):
+        """watermark 以降の行を created_at 順にページングして取得"""
+        import pandas as pd
+
+        def build_query():
+            query = self.client.table(self.table).select(",".join(self.columns))
+            if watermark is not None:
+                # 同一時刻に追加された行の取りこぼしを防ぐため gte で取得し、後で (id, created_at) で除外する
+                query = query.gte("created_at", watermark.isoformat())
+            return query.order("created_at").order("id")
+
+        return pd.DataFrame(fetch_all(build_query, self.page_size), columns=self.columns)
+
+    def checkpoint(self):
+        """取得位置を JSON で保存できる形で返す"""
+        return {
+            "watermark": self.watermark.isoformat() if self.watermark is not None else None,
+            "ids_at_watermark": sorted(int(i) for i in self._ids_at_watermark),
+        }
+
+    def resume(self, checkpoint):
+        """checkpoint() で保存した取得位置から再開する"""
+        import pandas as pd
+
+        if checkpoint and checkpoint.get("watermark"):
+            self.watermark = pd.Timestamp(checkpoint["watermark"])
+            self._ids_at_watermark = set(checkpoint.get("ids_at_watermark", []))
+
+    def refresh(self, force=False):
+        """前回から max_age 秒以上経っていれば差分を取得する。新規行数を返す"""
+        import pandas as pd
+
+        with self._lock:
+            if not force and time.time() - self.refreshed_at < self.max_age:
+                return 0
+
+            new = self._fetch_since(self.watermark)
+            if len(new):
+                new["created_at"] = pd.to_datetime(new["created_at"], utc=True, format="ISO8601")
+                # 取得済みなのは watermark ちょうどの版だけ。upsert で更新された行は同じ id でも
+                # created_at が新しくなるので除外しない
+                seen = (new["created_at"] == self.watermark) & new["id"].isin(self._ids_at_watermark)
+                new = new[~seen]
+            self.refreshed_at = time.time()
+            if new.empty:
+                return 0
+
+            # 同じ日の再取得は upsert で既存行（同じ id）が更新されるため、古い版を除く
+            self.frame = new if self.frame.empty else pd.concat([self.frame[~self.frame["id"].isin(new["id"])], new],
+                                                                ignore_index=True)
+            # 最新行の索引は「前回の最新 + 新規分」だけで更新できる
+            merged = new if self.latest.empty else pd.concat([self.latest, new], ignore_index=True)
+            self.latest = merged.sort_values("created_at").drop_duplicates(self.key, keep="last") \
+                .reset_index(drop=True)
+
+            watermark = new["created_at"].max()
+            ids = set(new.loc[new["created_at"] == watermark, "id"])
+            if watermark == self.watermark:
+                ids |= self._ids_at_watermark
+            self.watermark = watermark
+            self._ids_at_watermark = ids
+            return len(new)
@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from urllib.parse import urlencode, urlparse
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import instrumentation
+
+# --- 設定 ---
+CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "http_cache"))
+MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# HTTP_CACHE=0 でキャッシュを使わない（常に取得し、changed は常に True）
+ENABLED = os.getenv("HTTP_CACHE", "1") != "0"
+
+# 取得元ごとの TTL [秒]。TTL 内は通信せずにキャッシュを返し、過ぎたら条件付きリクエストで確認する
+SOURCE_TTLS = {
+    "www.uverworld.jp": 3600,
+    "countik.com": 3600,
+    "www.picit.ai": 3600,
+    "cdn.syndication.twimg.com": 600,
+    "www.googleapis.com": 600,
+}
+DEFAULT_TTL = 0
+# キャッシュキー・保存内容に含めないパラメータ（API キーなど）
+EXCLUDED_PARAMS = {"key"}
+# 応答から保存するヘッダー
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+_lock = threading.Lock()
+
+# ==========================================
+# キャッシュファイル
+# ==========================================
+# <key>.json にメタ情報、<key>.body に本文を保存する
+
+def cache_key(url, params=None):
+    """URL と（API キーを除いた）パラメータから決まるキー"""
+    items = sorted((k, str(v)) for k, v in (params or {}).items() if k not in EXCLUDED_PARAMS)
+    return hashlib.sha256(f"{url}?{urlencode(items)}".encode("utf-8")).hexdigest()[:32]
+
+def _paths(key, cache_dir):
+    return os.path.join(cache_dir, f"{key}.json"), os.path.join(cache_dir, f"{key}.body")
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def load_meta(key, cache_dir=CACHE_DIR):
+    meta_path, body_path = _paths(key, cache_dir)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return meta if os.path.exists(body_path) else None
+
+def save_meta(key, meta, cache_dir=CACHE_DIR):
+    _write_atomic(_paths(key, cache_dir)[0], json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+def _store(key, url, params, res, now, previous, cache_dir):
+    body = res.content
+    os.makedirs(cache_dir, exist_ok=True)
+    _write_atomic(_paths(key, cache_dir)[1], body)
+    meta = {
+        "url": url,
+        "params": {k: v for k, v in (params or {}).items() if k not in EXCLUDED_PARAMS},
+        "headers": {h: res.headers[h] for h in STORED_HEADERS if h in res.headers},
+        "content_hash": hashlib.sha256(body).hexdigest(),
+        "processed_hash": (previous or {}).get("processed_hash"),
+        "size": len(body),
+        "fetched_at": now,
+        "last_access": now,
+    }
+    save_meta(key, meta, cache_dir)
+    return meta
+
+def evict(max_bytes=MAX_BYTES, cache_dir=CACHE_DIR):
+    """合計サイズが max_bytes を超えていれば、最後に使われたのが古いものから削除する"""
+    entries = []
+    for name in os.listdir(cache_dir) if os.path.isdir(cache_dir) else []:
+        if name.endswith(".json"):
+            meta = load_meta(name[:-5], cache_dir)
+            if meta is not None:
+                entries.append((meta["last_access"], name[:-5], meta["size"]))
+    total = sum(size for _, _, size in entries)
+    removed = 0
+    for _, key, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        for path in _paths(key, cache_dir):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+        removed += 1
+    return removed
+
+# ==========================================
+# キャッシュ付き GET
+# ==========================================
+
+def _to_response(meta, body, url):
+    res = Response()
+    res.status_code = 200
+    res._content = body
+    res.headers = CaseInsensitiveDict(meta["headers"])
+    res.encoding = get_encoding_from_headers(res.headers)
+    res.url = url
+    return res
+
+def _annotate(res, key, meta, source, cache_dir):
+    """呼び出し側で使う属性を付ける: from_cache / changed（前回処理した内容から変わったか）"""
+    res.cache_key = key
+    res.cache_dir = cache_dir
+    res.content_hash = meta["content_hash"]
+    res.from_cache = source != "miss"
+    res.changed = meta["content_hash"] != meta.get("processed_hash")
+    return res
+
+def get(fetch, url, params=None, headers=None, ttl=None, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+    """
+    fetch(url, params, headers) で取得する GET をキャッシュ経由にする。
+    - TTL 内: 通信せずにキャッシュを返す
+    - TTL 切れ: ETag / Last-Modified で条件付きリクエストし、304 ならキャッシュを返す
+    - 200: 本文を保存する（エラー応答は保存せずそのまま返す）
+    """
+    host = urlparse(url).netloc
+    ttl = SOURCE_TTLS.get(host, DEFAULT_TTL) if ttl is None else ttl
+    key = cache_key(url, params)
+    now = time.time()
+    meta = load_meta(key, cache_dir)
+
+    if meta is not None and now - meta["fetched_at"] < ttl:
+        with open(_paths(key, cache_dir)[1], "rb") as f:
+            body = f.read()
+        meta["last_access"] = now
+        save_meta(key, meta, cache_dir)
+        instrumentation.emit("http_cache", host=host, result="fresh")
+        return _annotate(_to_response(meta, body, url), key, meta, "fresh", cache_dir)
+
+    conditional = dict(headers or {})
+    if meta is not None:
+        if "ETag" in meta["headers"]:
+            conditional["If-None-Match"] = meta["headers"]["ETag"]
+        if "Last-Modified" in meta["headers"]:
+            conditional["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+
+    res = fetch(url, params=params, headers=conditional)
+
+    if res.status_code == 304 and meta is not None:
+        with open(_paths(key, cache_dir)[1], "rb") as f:
+            body = f.read()
+        meta["fetched_at"] = meta["last_access"] = now
+        save_meta(key, meta, cache_dir)
+        instrumentation.emit("http_cache", host=host, result="not_modified")
+        return _annotate(_to_response(meta, body, url), key, meta, "not_modified", cache_dir)
+
+    if res.status_code != 200:
+        res.from_cache, res.changed, res.cache_key = False, True, None
+        return res
+
+    with _lock:
+        meta = _store(key, url, params, res, now, meta, cache_dir)
+        evict(max_bytes, cache_dir)
+    instrumentation.emit("http_cache", host=host, result="miss")
+    return _annotate(res, key, meta, "miss", cache_dir)
+
+def mark_processed(res):
+    """
+    応答の内容を最後まで処理（解析・保存）できたことを記録する。
+    次回同じ内容なら changed=False になり、呼び出し側は解析と DB 更新を省ける。
+    """
+    key = getattr(res, "cache_key", None)
+    if key is None:
+        return
+    with _lock:
+        meta = load_meta(key, res.cache_dir)
+        if meta is not None and meta["content_hash"] == res.content_hash:
+            meta["processed_hash"] = res.content_hash
+            save_meta(key, meta, res.cache_dir)
@@ -0,0 +1,145 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import http_cache
+import instrumentation
+import youtube_quota
+
+# --- 設定 ---
+# 全体の並列数とホストごとの同時接続数（環境変数で上書き可能）
+MAX_WORKERS = int(os.getenv("HTTP_MAX_WORKERS", "16"))
+MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "4"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.5"))
+DEFAULT_TIMEOUT = 20
+
+# ホスト別の上書き設定 (同時接続数, 最小リクエスト間隔[秒])
+# スクレイピング先には負荷をかけないよう直列・間隔ありで接続する
+HOST_LIMITS = {
+    "www.uverworld.jp": (1, 1.0),
+    "countik.com": (1, 1.0),
+    "www.picit.ai": (1, 1.0),
+    "cdn.syndication.twimg.com": (1, 0.5),
+}
+
+# リトライ対象のステータスコード
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+_session = None
+_session_lock = threading.Lock()
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+class HostLimiter:
+    """ホスト単位で同時接続数とリクエスト間隔を制御する"""
+
+    def __init__(self, max_concurrency, min_interval=0.0):
+        self._sem = threading.BoundedSemaphore(max_concurrency)
+        self._min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def __enter__(self):
+        self._sem.acquire()
+        if self._min_interval:
+            with self._lock:
+                wait = self._next_at - time.monotonic()
+                self._next_at = max(self._next_at, time.monotonic()) + self._min_interval
+            if wait > 0:
+                time.sleep(wait)
+        return self
+
+    def __exit__(self, *exc):
+        self._sem.release()
+        return False
+
+
+def get_session():
+    """keep-alive を使い回す共有セッションを返す"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _limiter(host):
+    with _limiters_lock:
+        if host not in _limiters:
+            concurrency, interval = HOST_LIMITS.get(host, (MAX_PER_HOST, 0.0))
+            _limiters[host] = HostLimiter(concurrency, interval)
+        return _limiters[host]
+
+
+def _backoff(attempt, res=None):
+    """Retry-After があればそれに従い、なければ指数バックオフ"""
+    if res is not None:
+        retry_after = res.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return float(retry_after)
+    return BACKOFF_BASE * (2 ** attempt)
+
+
+def get(url, params=None, headers=None, timeout=DEFAULT_TIMEOUT, cache=False):
+    """
+    共有プール経由の GET（ホスト別制限・リトライ付き）
+    cache=True ならディスクキャッシュ (http_cache) を通し、TTL 内は通信せず、TTL 後は条件付きリクエストで確認する。
+    戻り値には from_cache / changed（前回 mark_processed した内容から変わったか）が付く。
+    """
+    if cache and http_cache.ENABLED:
+        fetch = lambda u, params=None, headers=None: _request(u, params, headers, timeout)
+        return http_cache.get(fetch, url, params=params, headers=headers)
+    res = _request(url, params, headers, timeout)
+    res.from_cache, res.changed = False, True
+    return res
+
+
+def _request(url, params, headers, timeout):
+    session = get_session()
+    host = urlparse(url).netloc
+    limiter = _limiter(host)
+
+    for attempt in range(MAX_RETRIES + 1):
+        res, error = None, None
+        with limiter:
+            start = time.perf_counter()
+            try:
+                res = session.get(url, params=params, headers=headers, timeout=timeout)
+                youtube_quota.count(url)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            instrumentation.record_http(
+                host, time.perf_counter() - start,
+                len(res.content) if res is not None else 0,
+                res.status_code if res is not None else None,
+            )
+
+        if res is not None and res.status_code not in RETRY_STATUS:
+            return res
+        if attempt == MAX_RETRIES:
+            if res is not None:
+                return res
+            raise error
+        time.sleep(_backoff(attempt, res))
+
+
+def run_parallel(calls, max_workers=None):
+    """引数なし関数のリストを並列実行し、入力順で結果を返す"""
+    calls = list(calls)
+    if not calls:
+        return []
+    workers = min(max_workers or MAX_WORKERS, len(calls))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(instrumentation.profile_call, call) for call in calls]
+        return [f.result() for f in futures]
@@ -1,34 +1,206 @@
+import argparse
+import codecs
+import hashlib
+import json
 import pandas as pd
-import re
+import numpy as np
 from supabase import create_client
+import instrumentation
+import survey_aggregate
+from data_cache import fetch_all
+from song_normalizer import get_normalizer
 
 # --- 設定 ---
 SUPABASE_URL = "https://uuzytsezpxqtxxtvybhj.supabase.co"
 SUPABASE_KEY = "sb_publishable_rOF6ggCSluOwQURMzWISAw_n473FelL"
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-def import_survey(csv_path):
-    # 1. calendar_eventsテーブルからライブ情報を取得
+VENUE_TYPES = ["LIVE HOUSE", "HALL", "ARENA", "FES", "OTHER"]
+# 回答1行の同一性を判定する列（row_hash の対象。SurveyTable.tsx・sql/008 と同じ順序）
+# 欠損値の埋め方（normalize_survey）も SurveyTable.tsx の toResponse と揃えること
+HASH_COLUMNS = ["venue_type", "request_song", "visits", "prefecture", "age", "gender"]
+# 文字コード判定に使う先頭バイト数
+ENCODING_SAMPLE_BYTES = 64 * 1024
+SURVEY_COLUMNS = ['曲名', '項目2', '都道府県名', '年齢', '性別']
+
+_supabase = None
+
+def get_client():
+    """Supabase クライアントを初回利用時に作成する"""
+    global _supabase
+    if _supabase is None:
+        _supabase = instrumentation.instrument_client(create_client(SUPABASE_URL, SUPABASE_KEY))
+    return _supabase
+
+# ==========================================
+# CSV 読み込み
+# ==========================================
+
+def detect_encoding(csv_path, sample_bytes=ENCODING_SAMPLE_BYTES):
+    """先頭だけを読んで UTF-8 / Shift_JIS(cp932) を判定する"""
+    with open(csv_path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
     try:
-        # 件数を15から100に増やし、古い日程も見落とさないようにします
-        res = supabase.table("calendar_events") \
-            .select("id, event_date, title") \
-            .eq("category", "LIVE") \
-            .order("event_date", desc=True) \
-            .limit(100) \
-            .execute()
-        
-        events = res.data
+        # サンプル末尾で文字が途切れていても失敗しないよう逐次デコーダーを使う
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'cp932'
+
+def read_survey_csv(csv_path, encoding=None, chunksize=None):
+    """CSV を chunksize 行ずつ DataFrame で返すイテレータ（None なら一括）"""
+    encoding = encoding or detect_encoding(csv_path)
+    reader = pd.read_csv(csv_path, encoding=encoding, dtype=str, usecols=SURVEY_COLUMNS, chunksize=chunksize)
+    if chunksize is None:
+        yield reader
+    else:
+        yield from reader
+
+# ==========================================
+# 整形（ベクトル化）
+# ==========================================
+
+def _age_display(age_col):
+    """年齢の列を「20代」「60代以上」「未回答」に変換する"""
+    nums = age_col.str.extract(r'(\d+)', expand=False)
+    # 全角数字も int() で解釈できるよう、ユニーク値だけ Python 側で変換する
+    codes, uniques = pd.factorize(nums)
+    values = np.array([int(v) for v in uniques], dtype=np.int64)
+    ages = np.where(codes >= 0, values[codes] if len(values) else 0, -1)
+
+    decade = (ages // 10) * 10
+    display = np.where(ages >= 60, "60代以上", pd.Series(decade).astype(str).to_numpy() + "代")
+    display = np.where(ages < 0, "未回答", display)
+    return pd.Series(display, index=age_col.index)
+
+def normalize_survey(df, live_name, venue_type, event_year, event_date):
+    """アンケート CSV の DataFrame を survey_responses の行形式に整形する"""
+    # 空行と途中に入った見出し行は除く（SurveyTable.tsx の取り込みと同じ）
+    df = df.dropna(how="all")
+    df = df[~df['曲名'].fillna("").str.contains("項目", regex=False)]
+    visits = df['項目2'].str.extract(r'(\d+)', expand=False).fillna("1") + "回"
+    request_song = df['曲名'].fillna("未回答").str.strip()
+
+    return pd.DataFrame({
+        "live_name":    live_name,
+        "venue_type":   venue_type,
+        "event_year":   event_year,
+        "request_song": request_song,
+        # 回答を曲名カタログの正式名に揃えたリスト（ランキングはこちらで集計する）
+        "request_songs": get_normalizer().normalize_series(request_song),
+        "visits":       visits,
+        "prefecture":   df['都道府県名'].fillna("未回答"),
+        "age":          _age_display(df['年齢']),
+        "gender":       df['性別'].fillna("未回答"),
+        "created_at":   f"{event_date}T09:00:00Z",
+    }, index=df.index)
+
+def row_hashes(records_df):
+    """HASH_COLUMNS を U+001F で連結した文字列の SHA-256"""
+    joined = records_df[HASH_COLUMNS[0]].fillna("").astype(str)
+    for column in HASH_COLUMNS[1:]:
+        joined = joined + "\x1f" + records_df[column].fillna("").astype(str)
+    return pd.Series([hashlib.sha256(v.encode("utf-8")).hexdigest() for v in joined], index=records_df.index)
+
+# ==========================================
+# 差分の計算と適用
+# ==========================================
+
+def _diff_keys(frame):
+    """
+    差分判定のキー: row_hash と曲名の正規化結果（request_songs）。
+    row_hash はダッシュボードの取り込みと共通の回答内容だけのハッシュなので、曲名カタログや正規化の
+    ルールが変わった場合は request_songs の違いで検出し、同じ CSV の再取り込みで正規化し直す。
+    """
+    songs = frame["request_songs"].map(lambda v: json.dumps(list(v) if v is not None else None, ensure_ascii=False))
+    return frame["row_hash"].fillna("") + "\x1f" + songs
+
+def diff_rows(existing, records_df):
+    """
+    既存行（id, row_hash, request_songs）と新しい行を多重集合として比べ、(削除する id, 追加する行) を返す。
+    同じ内容の回答が複数ある場合は件数の差だけを削除・追加する。
+    """
+    old = pd.DataFrame(existing, columns=["id", "row_hash", "request_songs"])
+    old = pd.DataFrame({"id": old["id"], "key": _diff_keys(old)})
+    old["n"] = old.groupby("key").cumcount()
+    new = pd.DataFrame({"key": _diff_keys(records_df)}, index=records_df.index)
+    new["n"] = new.groupby("key").cumcount()
+    merged = new.reset_index().merge(old, on=["key", "n"], how="outer", indicator=True)
+    delete_ids = merged.loc[merged["_merge"] == "right_only", "id"].astype("int64").tolist()
+    insert = records_df.loc[merged.loc[merged["_merge"] == "left_only", "index"].astype("int64")]
+    return delete_ids, insert
+
+def fetch_existing(supabase, live_name, event_year, live_date):
+    """このライブの既存行の (id, row_hash, request_songs)"""
+    return fetch_all(lambda: supabase.table("survey_responses").select("id, row_hash, request_songs")
+                     .eq("live_name", live_name)
+                     .eq("event_year", event_year)
+                     .like("created_at", f"{live_date}%")
+                     .order("id"))
+
+def apply_diff(supabase, live_name, event_year, live_date, records_df):
+    """
+    既存行との差分だけを apply_survey_diff (sql/008) で1トランザクションで適用する。
+    戻り値は (削除件数, 追加件数)。差分が無ければ RPC を呼ばない。
+    """
+    existing = fetch_existing(supabase, live_name, event_year, live_date)
+    delete_ids, insert = diff_rows(existing, records_df)
+    if not delete_ids and insert.empty:
+        return 0, 0
+    result = supabase.rpc("apply_survey_diff", {
+        "p_live_name": live_name,
+        "p_event_year": event_year,
+        "p_live_date": live_date,
+        "p_expected_count": len(existing),
+        "p_delete_ids": delete_ids,
+        "p_insert": insert.to_dict("records"),
+    }).execute().data
+    return result["deleted"], result["inserted"]
+
+# ==========================================
+# ライブ・会場タイプの選択
+# ==========================================
+
+def select_event(event_id=None):
+    """calendar_events からライブを取得（ID 未指定なら対話的に選択）"""
+    query = get_client().table("calendar_events").select("id, event_date, title").eq("category", "LIVE")
+    if event_id is not None:
+        events = query.eq("id", event_id).execute().data
         if not events:
-            print("❌ カレンダーにライブ情報が見つかりません。")
-            return
+            raise ValueError(f"calendar_events に id={event_id} のライブが見つかりません")
+        return events[0]
+
+    # 件数を15から100に増やし、古い日程も見落とさないようにします
+    events = query.order("event_date", desc=True).limit(100).execute().data
+    if not events:
+        raise ValueError("カレンダーにライブ情報が見つかりません")
+
+    print("\n📅 アンケートデータを紐付けるライブを選択してください:")
+    for i, ev in enumerate(events):
+        print(f"[{i:2}] {ev['event_date']} : {ev['title']}")
+    choice = int(input("\n選択する番号を入力してください: "))
+    return events[choice]
 
-        print("\n📅 アンケートデータを紐付けるライブを選択してください:")
-        for i, ev in enumerate(events):
-            print(f"[{i:2}] {ev['event_date']} : {ev['title']}")
-        
-        choice = int(input("\n選択する番号を入力してください: "))
-        target_event = events[choice]
+def select_venue_type(venue_type=None):
+    if venue_type is not None:
+        return venue_type
+    print("\n🏢 会場タイプを選択してください:")
+    for i, t in enumerate(VENUE_TYPES):
+        print(f"[{i}] {t}")
+    v_choice = int(input("番号を入力してください: "))
+    return VENUE_TYPES[v_choice]
+
+# ==========================================
+# メイン処理
+# ==========================================
+
+def import_survey(csv_path, event_id=None, venue_type=None, chunksize=None, encoding=None):
+    supabase = get_client()
+
+    # 1. calendar_eventsテーブルからライブ情報を取得
+    try:
+        target_event = select_event(event_id)
         target_event_title = target_event['title']
         target_date = target_event['event_date']  # YYYY-MM-DD
         target_year = str(target_date.split('-')[0])
@@ -36,84 +208,88 @@ def import_survey(csv_path):
         print(f"\n👉 選択中: {target_date} / {target_event_title}")
 
     except Exception as e:
+        instrumentation.record_error("survey.select_event", e)
         print(f"❌ ライブ情報の取得に失敗しました: {e}")
         return
 
     # 会場タイプの選択
-    print("\n🏢 会場タイプを選択してください:")
-    venue_types = ["LIVE HOUSE", "HALL", "ARENA", "FES", "OTHER"]
-    for i, t in enumerate(venue_types):
-        print(f"[{i}] {t}")
-    v_choice = int(input("番号を入力してください: "))
-    selected_venue_type = venue_types[v_choice]
+    selected_venue_type = select_venue_type(venue_type)
 
-    # 2. CSV読み込み
+    # 2. CSV読み込み・3. 整形（チャンク単位でベクトル化処理）
     print(f"\n📖 CSV '{csv_path}' を読み込み中...")
-    try:
-        df = pd.read_csv(csv_path, encoding='utf-8')
-    except UnicodeDecodeError:
-        df = pd.read_csv(csv_path, encoding='shift_jis')
-    
-    def extract_number(text):
-        if pd.isna(text): return "1"
-        nums = re.findall(r'\d+', str(text))
-        return nums[0] if nums else "1"
-
-    records = []
-    
-    # 3. 1行ずつ整形
-    for _, row in df.iterrows():
-        raw_song = str(row['曲名']) if pd.notna(row['曲名']) else "未回答"
-        attendance_num = extract_number(row['項目2'])
-        visits_str = f"{attendance_num}回"
-        
-        if pd.notna(row['年齢']):
-            nums = re.findall(r'\d+', str(row['年齢']))
-            if nums:
-                age_val = int(nums[0])
-                age_display = f"{(age_val // 10) * 10}代" if age_val < 60 else "60代以上"
-            else:
-                age_display = "未回答"
-        else:
-            age_display = "未回答"
-
-        records.append({
-            "live_name":    target_event_title,
-            "venue_type":   selected_venue_type,
-            "event_year":   target_year,
-            "request_song": raw_song.strip(),
-            "visits":       visits_str,
-            "prefecture":   str(row['都道府県名']) if pd.notna(row['都道府県名']) else "未回答",
-            "age":          age_display,
-            "gender":       str(row['性別']) if pd.notna(row['性別']) else "未回答",
-            "created_at":   f"{target_date}T09:00:00Z"
-        })
-
-    # 4. Supabaseへ一括保存
-    if records:
-        print(f"🚀 {len(records)}件のデータを送信中...")
+    detected = encoding is None
+    encoding = encoding or detect_encoding(csv_path)
+    read_normalize = lambda enc: [
+        normalize_survey(chunk, target_event_title, selected_venue_type, target_year, target_date)
+        for chunk in read_survey_csv(csv_path, encoding=enc, chunksize=chunksize)
+    ]
+    with instrumentation.stage("survey.read_normalize"):
+        try:
+            frames = read_normalize(encoding)
+        except UnicodeDecodeError:
+            # 判定に使う先頭のサンプルより後ろに Shift_JIS の文字がある場合は、最初から cp932 で読み直す
+            if not detected or encoding != 'utf-8':
+                raise
+            print("⚠️ UTF-8 として読めない箇所があったため cp932 で読み直します")
+            frames = read_normalize('cp932')
+    records_df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if len(records_df):
+        records_df["row_hash"] = row_hashes(records_df)
+
+    # 4. 既存データとの差分だけを Supabase に適用（削除と追加は1トランザクション）
+    if len(records_df):
+        print(f"🚀 {len(records_df)}件のデータを既存分と照合中...")
         try:
-            # 【重要】ピンポイント削除ロジック
-            # ライブ名、年度、そして「日付（target_date）」が完全一致するもののみを削除。
+            # ライブ名、年度、そして「日付（target_date）」が完全一致するものだけが対象。
             # 他の日付のデータには一切干渉しません。
-            print(f"🧹 {target_date} 分の既存データを整理しています...")
-            supabase.table("survey_responses").delete() \
-                .eq("live_name", target_event_title) \
-                .eq("event_year", target_year) \
-                .like("created_at", f"{target_date}%") \
-                .execute()
-
-            # 挿入実行
-            chunk_size = 100
-            for i in range(0, len(records), chunk_size):
-                supabase.table("survey_responses").insert(records[i:i+chunk_size]).execute()
-            
-            print(f"✨ 取り込み成功！")
+            with instrumentation.stage("survey.insert", rows=len(records_df)):
+                deleted, inserted = apply_diff(supabase, target_event_title, target_year, target_date, records_df)
+
+            if not deleted and not inserted:
+                print(f"♻️ {target_date} [{target_event_title}] は取り込み済みの内容と同じです（変更なし）")
+                return
+            print(f"✨ 取り込み成功！ (追加 {inserted}件 / 削除 {deleted}件)")
             print(f"📊 {target_date} [{target_event_title}] のデータとして保存されました。")
         except Exception as e:
-            print(f"❌ 保存エラー: {e}")
+            instrumentation.record_error("survey.save", e)
+            print(f"❌ 保存エラー（既存データは変更されていません）: {e}")
+            return
+
+        # 5. このライブ分のクロス集計を更新
+        try:
+            with instrumentation.stage("survey.aggregate"):
+                survey_aggregate.refresh_live(supabase, records_df)
+            print("📈 クロス集計を更新しました")
+        except Exception as e:
+            instrumentation.record_error("survey.aggregate", e)
+            print(f"❌ 集計更新エラー: {e}")
     else:
         print("⚠️ 登録するデータがありませんでした。")
 
+def main():
+    parser = argparse.ArgumentParser(description="アンケート CSV を survey_responses に取り込む")
+    parser.add_argument('csv_path', help='アンケート CSV のパス')
+    parser.add_argument('--event-id', type=int, help='calendar_events の id（省略時は一覧から選択）')
+    parser.add_argument('--venue-type', choices=VENUE_TYPES, help='会場タイプ（省略時は一覧から選択）')
+    parser.add_argument('--chunksize', type=int, default=100_000, help='CSV を分割して読む行数')
+    parser.add_argument('--encoding', help='文字コード（省略時は自動判定）')
+    parser.add_argument('--metrics', help='計測イベントを JSON Lines で追記するファイル')
+    parser.add_argument('--profile', action='store_true', help='cProfile / tracemalloc の結果を表示する')
+    args = parser.parse_args()
+
+    instrumentation.configure(args.metrics)
+    if args.profile:
+        instrumentation.enable_profiling()
+
+    with instrumentation.stage("survey.import"):
+        instrumentation.profile_call(import_survey, args.csv_path, event_id=args.event_id,
+                                     venue_type=args.venue_type, chunksize=args.chunksize, encoding=args.encoding)
+
+    instrumentation.write_summary()
+    if args.metrics or args.profile:
+        instrumentation.print_summary()
+    if args.profile:
+        instrumentation.print_profile()
+
 if __name__ == "__main__":
-    import_survey('ここにファイル名.csv')
\ No newline at end of file
+    main()
@@ -0,0 +1,235 @@
+import os
+import sys
+import json
+import time
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+# --- 設定 ---
+# 設定するとイベントを JSON Lines で追記する（sync.py --metrics でも指定可能）
+METRICS_FILE = os.getenv("METRICS_FILE")
+PROFILE_TOP = 25
+
+_lock = threading.Lock()
+_sink = None
+_stages = defaultdict(lambda: {"count": 0, "seconds": 0.0, "failed": 0})
+_http = defaultdict(lambda: {"requests": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0, "errors": 0})
+_db = defaultdict(lambda: {"calls": 0, "seconds": 0.0, "rows": 0, "errors": 0})
+_errors = defaultdict(int)
+_profiling = False
+_profiles = []
+
+# ==========================================
+# 出力先
+# ==========================================
+
+def configure(metrics_file=None):
+    """JSON Lines の出力先を設定する（None なら環境変数 METRICS_FILE、どちらも無ければ集計のみ）"""
+    global _sink
+    path = metrics_file or METRICS_FILE
+    with _lock:
+        if _sink is not None:
+            _sink.close()
+        _sink = open(path, "a", encoding="utf-8") if path else None
+
+def emit(event_type, **fields):
+    """1イベントを JSON の1行として書き出す"""
+    if _sink is None:
+        return
+    line = json.dumps({"ts": datetime.now(timezone.utc).isoformat(), "type": event_type, **fields},
+                      ensure_ascii=False, default=str)
+    with _lock:
+        _sink.write(line + "\n")
+        _sink.flush()
+
+def reset():
+    """集計をリセットする（常駐ワーカーで実行ごとに区切る場合など）"""
+    with _lock:
+        for table in (_stages, _http, _db, _errors):
+            table.clear()
+        _profiles.clear()
+
+# ==========================================
+# 記録
+# ==========================================
+
+@contextmanager
+def stage(name, **fields):
+    """with で囲んだ処理の所要時間を記録する。例外はそのまま送出する"""
+    start = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except BaseException:
+        ok = False
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        with _lock:
+            s = _stages[name]
+            s["count"] += 1
+            s["seconds"] += seconds
+            s["failed"] += 0 if ok else 1
+        emit("stage", name=name, seconds=round(seconds, 4), ok=ok, **fields)
+
+def record_http(host, seconds, size, status):
+    with _lock:
+        h = _http[host]
+        h["requests"] += 1
+        h["seconds"] += seconds
+        h["max_seconds"] = max(h["max_seconds"], seconds)
+        h["bytes"] += size
+        h["errors"] += 1 if status is None or status >= 400 else 0
+    emit("http", host=host, seconds=round(seconds, 4), bytes=size, status=status)
+
+def record_db(table, method, seconds, rows, status):
+    key = f"{method} {table}"
+    with _lock:
+        d = _db[key]
+        d["calls"] += 1
+        d["seconds"] += seconds
+        d["rows"] += rows
+        d["errors"] += 1 if status >= 400 else 0
+    emit("db", table=table, method=method, seconds=round(seconds, 4), rows=rows, status=status)
+
+def categorize(exc):
+    """例外を http / db / parse / config / io / other に分類する"""
+    # requests の JSONDecodeError なども ValueError なので、応答内容の解析失敗として先に判定する
+    if isinstance(exc, (ValueError, KeyError, IndexError, AttributeError, TypeError)):
+        return "parse"
+    module = type(exc).__module__.split(".")[0]
+    if module in ("requests", "urllib3"):
+        return "http"
+    if module in ("postgrest", "httpx", "supabase", "gotrue"):
+        return "db"
+    if isinstance(exc, SystemExit):
+        return "config"
+    if isinstance(exc, OSError):
+        return "io"
+    return "other"
+
+def record_error(where, exc, category=None):
+    """握りつぶしていた例外を分類して記録する（呼び出し元の処理は継続する）"""
+    category = category or categorize(exc)
+    with _lock:
+        _errors[category] += 1
+    emit("error", where=where, category=category, error=f"{type(exc).__name__}: {exc}")
+    return category
+
+# ==========================================
+# Supabase クライアントへのフック
+# ==========================================
+
+def _on_db_request(request):
+    request.extensions["instrumentation_start"] = time.perf_counter()
+
+def _on_db_response(response):
+    request = response.request
+    seconds = time.perf_counter() - request.extensions.get("instrumentation_start", time.perf_counter())
+    path = urlsplit(str(request.url)).path
+    table = path.split("/rest/v1/", 1)[-1]
+    rows = 0
+    if request.method in ("POST", "PATCH") and request.content:
+        try:
+            body = json.loads(request.content)
+            rows = len(body) if isinstance(body, list) else 1
+        except ValueError:
+            pass
+    record_db(table, request.method, seconds, rows, response.status_code)
+
+def instrument_client(client):
+    """Supabase クライアントの PostgREST 呼び出しを記録する（同じクライアントへの二重登録はしない）"""
+    hooks = client.postgrest.session.event_hooks
+    if _on_db_response not in hooks["response"]:
+        hooks["request"].append(_on_db_request)
+        hooks["response"].append(_on_db_response)
+    return client
+
+# ==========================================
+# 集計結果
+# ==========================================
+
+def summary():
+    with _lock:
+        return {
+            "stages": {k: dict(v) for k, v in _stages.items()},
+            "http": {k: dict(v) for k, v in _http.items()},
+            "db": {k: dict(v) for k, v in _db.items()},
+            "errors": dict(_errors),
+        }
+
+def print_summary(file=None):
+    file = file or sys.stdout
+    data = summary()
+    if data["http"]:
+        print("\n--- 🌐 HTTP (ホスト別) ---", file=file)
+        for host, h in sorted(data["http"].items()):
+            avg = h["seconds"] / h["requests"] * 1000
+            print(f"{host:<32}{h['requests']:>5}回  平均 {avg:7.1f}ms  最大 {h['max_seconds'] * 1000:7.1f}ms"
+                  f"  {h['bytes'] / 1024:9.1f}KB  エラー {h['errors']}", file=file)
+    if data["db"]:
+        print("\n--- 🗄️ Supabase (テーブル別) ---", file=file)
+        for key, d in sorted(data["db"].items()):
+            print(f"{key:<32}{d['calls']:>5}回  {d['seconds']:7.2f}s  {d['rows']:>7}行  エラー {d['errors']}", file=file)
+    if data["errors"]:
+        print("\n--- ❗ エラー (分類別) ---", file=file)
+        for category, count in sorted(data["errors"].items()):
+            print(f"{category:<12}{count:>5}件", file=file)
+
+def write_summary():
+    """集計結果を metrics ファイル（JSON Lines）の最後に1行で書き出す"""
+    emit("summary", **summary())
+
+# ==========================================
+# プロファイル（--profile）
+# ==========================================
+
+def enable_profiling():
+    """以降の profile_call を cProfile で計測し、tracemalloc でメモリ確保箇所を記録する"""
+    global _profiling
+    import tracemalloc
+    _profiling = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(10)
+
+def profile_call(func, *args, **kwargs):
+    """
+    func を実行する。プロファイル有効時は cProfile で計測する。
+    cProfile は呼び出したスレッドしか計測しないため、ジョブ単位（スレッドごと）に計測して後で合算する。
+    """
+    if not _profiling:
+        return func(*args, **kwargs)
+    import cProfile
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profile.disable()
+        with _lock:
+            _profiles.append(profile)
+
+def print_profile(top=PROFILE_TOP, dump_path=None, file=None):
+    """累積時間の上位関数とメモリ確保の上位行を表示する。dump_path には pstats 形式で保存する"""
+    import pstats
+    import tracemalloc
+
+    file = file or sys.stdout
+    with _lock:
+        profiles = list(_profiles)
+    if profiles:
+        stats = pstats.Stats(*profiles, stream=file)
+        print(f"\n--- 🔬 cProfile (累積時間 上位{top}) ---", file=file)
+        stats.sort_stats("cumulative").print_stats(top)
+        if dump_path:
+            stats.dump_stats(dump_path)
+            print(f"💾 {dump_path} に保存しました (python -m pstats で参照)", file=file)
+
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        print(f"\n--- 🧠 tracemalloc (現在 {current / 1e6:.1f}MB / ピーク {peak / 1e6:.1f}MB) ---", file=file)
+        for stat in tracemalloc.take_snapshot().statistics("lineno")[:top // 2]:
+            print(stat, file=file)
@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import argparse
+from datetime import timedelta, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import instrumentation
+from data_cache import DeltaTable, fetch_all
+
+# --- 設定 ---
+SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY") or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+STORE_DIR = os.getenv("LOCAL_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "store"))
+
+JST = timezone(timedelta(hours=9))
+STATE_FILE = "_state.json"
+
+# 追記専用テーブル: created_at の差分だけを取得し、日付(JST)パーティションに新しいファイルを追加する
+# （同じ日の再取得で upsert された行は、そのパーティションを書き直して古い版を除く）
+APPEND_TABLES = {
+    "youtube_stats": pa.schema([
+        ("id", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("video_id", pa.string()),
+        ("title", pa.string()),
+        ("views", pa.int64()),
+        ("published_at", pa.string()),
+    ]),
+    "sns_stats": pa.schema([
+        ("id", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("platform", pa.string()),
+        ("follower_count", pa.int64()),
+    ]),
+}
+# 更新・削除が発生するテーブル: 毎回全件を取得して1ファイルに置き換える
+SNAPSHOT_TABLES = ["calendar_events", "survey_responses"]
+
+DATE_PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+# ==========================================
+# エクスポート（Supabase → Parquet）
+# ==========================================
+
+def _load_state(root):
+    path = os.path.join(root, STATE_FILE)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+def _save_state(root, state):
+    path = os.path.join(root, STATE_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def _write_atomic(table, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+def _partition_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".parquet"))
+
+def export_append_table(supabase, name, root=STORE_DIR, state=None):
+    """前回の続きから新しい行を取得し、日付パーティションごとに新規ファイルとして追加する"""
+    state = state if state is not None else _load_state(root)
+    schema = APPEND_TABLES[name]
+    columns = [f.name for f in schema if f.name not in ("id", "created_at")]
+
+    table = DeltaTable(supabase, name, columns, key="id")
+    table.resume(state.get(name))
+    table.refresh(force=True)
+
+    new = table.frame
+    if new.empty:
+        return 0
+
+    new = new.assign(date=new["created_at"].dt.tz_convert(JST).dt.strftime("%Y-%m-%d"))
+    part_name = f"part-{table.watermark.strftime('%Y%m%dT%H%M%S%f')}.parquet"
+    for date, part in new.groupby("date"):
+        directory = os.path.join(root, name, f"date={date}")
+        part = part[schema.names]
+        old_files = _partition_files(directory)
+        current = ds.dataset(old_files, schema=schema) if old_files else None
+        stale = current is not None and current.count_rows(filter=ds.field("id").isin(part["id"].tolist())) > 0
+        if stale:
+            # upsert で更新された行の古い版があるので、パーティションを1ファイルに書き直す
+            part = pd.concat([current.to_table().to_pandas(), part], ignore_index=True) \
+                .sort_values(["created_at", "id"]).drop_duplicates("id", keep="last")
+        # 更新が無ければ別ファイルとして追記する（既存ファイルは書き換えない）
+        arrow = pa.Table.from_pandas(part, schema=schema, preserve_index=False)
+        _write_atomic(arrow, os.path.join(directory, part_name))
+        if stale:
+            for path in old_files:
+                if os.path.basename(path) != part_name:
+                    os.remove(path)
+
+    state[name] = table.checkpoint()
+    return len(new)
+
+def export_snapshot_table(supabase, name, root=STORE_DIR):
+    """全件を取得して snapshot.parquet を置き換える"""
+    rows = fetch_all(lambda: supabase.table(name).select("*").order("id"))
+    df = pd.DataFrame(rows)
+    _write_atomic(pa.Table.from_pandas(df, preserve_index=False), os.path.join(root, name, "snapshot.parquet"))
+    return len(df)
+
+def export_all(supabase, root=STORE_DIR, tables=None):
+    """
+    ローカルストアを最新化する。{テーブル名: 書き出した行数} を返す。
+    失敗したテーブルがあれば残りのテーブルを書き出してから RuntimeError を送出する（sync.py のジョブを失敗にする）。
+    """
+    state = _load_state(root)
+    counts = {}
+    failed = {}
+    for name in tables or list(APPEND_TABLES) + SNAPSHOT_TABLES:
+        try:
+            if name in APPEND_TABLES:
+                counts[name] = export_append_table(supabase, name, root, state)
+                _save_state(root, state)
+            else:
+                counts[name] = export_snapshot_table(supabase, name, root)
+            print(f"💾 {name}: {counts[name]}件を書き出しました")
+        except Exception as e:
+            instrumentation.record_error(f"local_store.{name}", e)
+            print(f"❌ {name} エクスポートエラー: {e}")
+            failed[name] = e
+    if failed:
+        raise RuntimeError(f"エクスポートに失敗したテーブル: {', '.join(failed)} ({next(iter(failed.values()))!r})")
+    return counts
+
+# ==========================================
+# 読み出し API（Streamlit / ノートブック用）
+# ==========================================
+
+def read_arrow(name, columns=None, start=None, end=None, root=STORE_DIR):
+    """
+    ローカルストアのテーブルを Arrow Table として読む（メモリマップ）。
+    start / end は追記専用テーブルの日付パーティション (YYYY-MM-DD, 両端含む) で絞り込む。
+    """
+    path = os.path.join(root, name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{name} はまだエクスポートされていません ({path})")
+
+    if name not in APPEND_TABLES:
+        return pq.read_table(os.path.join(path, "snapshot.parquet"), columns=columns, memory_map=True)
+
+    filters = []
+    if start:
+        filters.append(("date", ">=", str(start)))
+    if end:
+        filters.append(("date", "<=", str(end)))
+    return pq.read_table(
+        path, columns=columns, filters=filters or None,
+        partitioning=DATE_PARTITIONING, memory_map=True,
+    )
+
+def read_table(name, columns=None, start=None, end=None, root=STORE_DIR):
+    """read_arrow の pandas 版"""
+    return read_arrow(name, columns, start, end, root).to_pandas()
+
+def main():
+    parser = argparse.ArgumentParser(description="Supabase のテーブルをローカルの Parquet に同期する")
+    parser.add_argument('--export', action='store_true', help='差分をエクスポートする')
+    parser.add_argument('--table', action='append', choices=list(APPEND_TABLES) + SNAPSHOT_TABLES,
+                        help='対象テーブル（省略時は全て）')
+    parser.add_argument('--root', default=STORE_DIR, help='保存先ディレクトリ')
+    args = parser.parse_args()
+
+    if not args.export:
+        parser.print_help()
+        return
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("❌ SUPABASE設定ミス")
+        return
+
+    from supabase import create_client
+    print(f"--- 💾 ローカルストアへのエクスポート開始 ({args.root}) ---")
+    try:
+        export_all(create_client(SUPABASE_URL, SUPABASE_KEY), args.root, args.table)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("--- ✨ エクスポート完了 ---")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import os
+import math
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import http_cache
+import instrumentation
+import rollups
+import video_catalog
+import write_buffer
+import youtube_quota
+from data_cache import fetch_all
+from uver_to_supabase import YOUTUBE_BATCH_SIZE, chunked, fetch_video_stats
+
+# --- 設定 ---
+SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY") or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+# YouTube Data API を1日に使ってよいユニット数（youtube / catalog / sns ジョブの呼び出しも含めた合計）。
+# このスケジューラーは他のジョブが使った残りの範囲で取得する（videos.list は ID 50件まで1回 1ユニット）
+DAILY_QUOTA = int(os.getenv("YOUTUBE_POLL_QUOTA", "500"))
+# --loop の実行間隔 [秒]
+TICK_SECONDS = int(os.getenv("YOUTUBE_POLL_TICK", "300"))
+
+STATE_TABLE = "youtube_poll_state"
+
+# 再生ペース [回/時] → 取得間隔 [時間]。上から順に判定し、どれにも当たらなければ MAX_INTERVAL_HOURS
+CADENCE = [
+    (1000, 1),
+    (100, 6),
+]
+# youtube_stats・日次集計は1日1行の時系列なので、伸びていない動画も1日1回は取得する
+# （日次の youtube ジョブは、その日まだ取得していない動画だけを取得する）
+MAX_INTERVAL_HOURS = 24
+# 公開からこの日数の動画はペースに関係なく1時間ごとに取得する
+FRESH_DAYS = 7
+# 再生ペースの指数移動平均の重み（新しい値の比率）
+VELOCITY_ALPHA = 0.5
+
+# ==========================================
+# 取得間隔の計算
+# ==========================================
+
+def interval_hours(views_per_hour, published_at, now):
+    """再生ペースと公開日から次回までの間隔 [時間] を決める"""
+    if published_at and now.date() - _to_date(published_at) < timedelta(days=FRESH_DAYS):
+        return CADENCE[0][1]
+    for threshold, hours in CADENCE:
+        if (views_per_hour or 0) >= threshold:
+            return hours
+    return MAX_INTERVAL_HOURS
+
+def next_state(video_id, views, state, published_at, now):
+    """今回の再生数から新しい状態行を作る"""
+    if state:
+        hours = max((now - _to_datetime(state["last_polled_at"])).total_seconds() / 3600, 1 / 60)
+        current = max(views - state["last_views"], 0) / hours
+        previous = state.get("views_per_hour")
+        velocity = current if previous is None else VELOCITY_ALPHA * current + (1 - VELOCITY_ALPHA) * previous
+    elif published_at:
+        # 初回は公開からの平均ペースで見積もる
+        age = max((now - datetime.combine(_to_date(published_at), datetime.min.time(), timezone.utc))
+                  .total_seconds() / 3600, 1)
+        velocity = views / age
+    else:
+        velocity = None
+    interval = interval_hours(velocity, published_at, now)
+    return {
+        "video_id": video_id,
+        "last_polled_at": now.isoformat(),
+        "last_views": views,
+        "views_per_hour": velocity,
+        "interval_hours": interval,
+        "next_poll_at": (now + timedelta(hours=interval)).isoformat(),
+    }
+
+def due_videos(videos, states, now):
+    """
+    取得予定時刻を過ぎた動画を、優先度の高い順に返す。
+    優先度は「遅れ ÷ 間隔」（一度も取得していない動画が最優先）。
+    """
+    due = []
+    for video_id in videos:
+        state = states.get(video_id)
+        if state is None:
+            due.append((math.inf, video_id))
+            continue
+        overdue = (now - _to_datetime(state["next_poll_at"])).total_seconds() / 3600
+        if overdue >= 0:
+            due.append((overdue / state["interval_hours"], video_id))
+    return [video_id for _, video_id in sorted(due, key=lambda x: -x[0])]
+
+def _to_datetime(value):
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+def _to_date(value):
+    return datetime.fromisoformat(str(value)[:10]).date()
+
+def polled_today(states, now):
+    """今日（JST）すでに取得した video_id（日次の youtube ジョブはこれを除いて取得する）"""
+    today = rollups.stat_date_of(now)
+    return {vid for vid, state in states.items() if rollups.stat_date_of(_to_datetime(state["last_polled_at"])) == today}
+
+# ==========================================
+# クォータ
+# ==========================================
+
+def allowance(used, now, budget=DAILY_QUOTA, tick_seconds=None):
+    """
+    今回使えるユニット数。--loop では残りをリセットまでの実行回数で均等に割り、
+    1日の前半で使い切らないようにする。
+    """
+    remaining = max(budget - used, 0)
+    if not tick_seconds:
+        return remaining
+    local = now.astimezone(youtube_quota.QUOTA_TZ)
+    reset = datetime.combine(local.date() + timedelta(days=1), datetime.min.time(), youtube_quota.QUOTA_TZ)
+    ticks_left = max(math.ceil((reset - local).total_seconds() / tick_seconds), 1)
+    return min(remaining, max(math.ceil(remaining / ticks_left), 1 if remaining else 0))
+
+# ==========================================
+# 実行
+# ==========================================
+
+def load_states(supabase):
+    def build_query():
+        return supabase.table(STATE_TABLE).select("*").order("video_id")
+    return {row["video_id"]: row for row in fetch_all(build_query)}
+
+def plan(supabase, now, tick_seconds=None):
+    """(今回取得する video_id, 動画情報, 状態, 使用済みユニット, 予定を過ぎた件数) を返す"""
+    videos = video_catalog.tracked_videos(supabase)
+    states = load_states(supabase)
+    # 同じプロセスで先に動いたジョブの呼び出しも含めて、記録済みの使用量から残りを決める
+    youtube_quota.flush(supabase)
+    used = youtube_quota.used(supabase, now)
+    due = due_videos(videos, states, now)
+    # 予定時刻を過ぎた動画を 50件ずつの呼び出しに詰め、使えるユニット数の分だけ取得する
+    batches = allowance(used, now, tick_seconds=tick_seconds)
+    return due[:batches * YOUTUBE_BATCH_SIZE], videos, states, used, len(due)
+
+def run_once(supabase=None, tick_seconds=None, dry_run=False):
+    """予定時刻を過ぎた動画の再生数を取得して保存し、取得した動画数を返す"""
+    if supabase is None:
+        from supabase import create_client
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+    now = datetime.now(timezone.utc)
+    with instrumentation.stage("poll.plan"):
+        targets, videos, states, used, n_due = plan(supabase, now, tick_seconds)
+    print(f"🗓️ 取得予定 {n_due}件 / 今回 {len(targets)}件 (クォータ {used}/{DAILY_QUOTA})")
+    if dry_run or not targets:
+        for video_id in targets:
+            state = states.get(video_id) or {}
+            print(f"  {video_id}  {videos[video_id]['title']}  間隔 {state.get('interval_hours', '-')}h")
+        return 0
+
+    units = len(list(chunked(targets, YOUTUBE_BATCH_SIZE)))
+    with instrumentation.stage("poll.fetch", videos=len(targets)):
+        items, _, responses = fetch_video_stats(targets)
+    youtube_quota.flush(supabase)
+
+    rows, hourly, new_states = [], [], []
+    snapshot = write_buffer.snapshot_fields(now)
+    hour = now.replace(minute=0, second=0, microsecond=0).isoformat()
+    for video_id in targets:
+        video, state = videos[video_id], states.get(video_id)
+        if video_id not in items:
+            continue
+        try:
+            views = int(items[video_id]["statistics"]["viewCount"])
+        except (KeyError, ValueError) as e:
+            instrumentation.record_error("poll.parse_item", e)
+            continue
+        rows.append({"title": video["title"], "views": views, "video_id": video_id,
+                     "published_at": str(video["published_at"])[:10] if video["published_at"] else None,
+                     **snapshot})
+        hourly.append({"video_id": video_id, "snapshot_hour": hour, "views": views, "created_at": now.isoformat()})
+        new_states.append(next_state(video_id, views, state, video["published_at"], now))
+
+    # youtube_stats は1日1行（その日の最新値）、1日より細かい推移は youtube_stats_hourly に残す
+    buffer = write_buffer.get_buffer()
+    buffer.add("youtube_stats", rows)
+    buffer.add("youtube_stats_hourly", hourly)
+    buffer.add(STATE_TABLE, new_states)
+    # youtube_stats を先に単独で送り、送れた行の集計は他のテーブルの失敗に関係なく更新する
+    errors = []
+    with instrumentation.stage("poll.save"):
+        try:
+            buffer.flush(supabase, ["youtube_stats"])
+            if rows:
+                rollups.update_rollups(supabase, "youtube", rows, now)
+        except write_buffer.WriteError as e:
+            errors.append(e)
+        try:
+            buffer.flush(supabase, ["youtube_stats_hourly", STATE_TABLE])
+        except write_buffer.WriteError as e:
+            errors.append(e)
+    if errors:
+        raise errors[0]
+    for res in responses:
+        http_cache.mark_processed(res)
+
+    fast = sum(1 for s in new_states if s["interval_hours"] <= CADENCE[0][1])
+    print(f"✅ {len(rows)}件を保存 / 状態更新 {len(new_states)}件 (1時間ごと: {fast}件) / {units}ユニット使用")
+    return len(new_states)
+
+def loop(supabase=None, tick_seconds=TICK_SECONDS):
+    """常駐して tick_seconds ごとに run_once を実行する"""
+    if supabase is None:
+        from supabase import create_client
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    print(f"🔁 {tick_seconds}秒ごとに実行します (Ctrl+C で終了)")
+    while True:
+        try:
+            run_once(supabase, tick_seconds=tick_seconds)
+        except Exception as e:
+            instrumentation.record_error("poll", e)
+            print(f"❌ 実行エラー: {e}")
+        time.sleep(tick_seconds)
+
+def main():
+    parser = argparse.ArgumentParser(description="再生ペースに応じた間隔で YouTube の再生数を取得する")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--once', action='store_true', help='1回だけ実行する（cron 用・既定）')
+    mode.add_argument('--loop', action='store_true', help='常駐して一定間隔で実行する')
+    parser.add_argument('--tick', type=int, default=TICK_SECONDS, help='--loop の実行間隔 [秒]')
+    parser.add_argument('--dry-run', action='store_true', help='取得対象を表示するだけで取得しない')
+    args = parser.parse_args()
+
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("❌ SUPABASE設定ミス")
+        raise SystemExit(1)
+    if args.loop:
+        loop(tick_seconds=args.tick)
+    else:
+        run_once(dry_run=args.dry_run)
+
+if __name__ == "__main__":
+    main()
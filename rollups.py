@@ -0,0 +1,162 @@
+import os
+import argparse
+from datetime import datetime, timedelta, timezone
+
+# --- 設定 ---
+SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY") or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+
+JST = timezone(timedelta(hours=9))
+UPSERT_CHUNK_SIZE = 500
+# in フィルタはクエリ文字列に入るため、URL 長の上限を超えないよう分割する
+IN_FILTER_CHUNK_SIZE = 200
+
+# 集計の種類ごとの定義
+ROLLUPS = {
+    "youtube": {
+        "source": "youtube_stats",
+        "key": "video_id",
+        "value": "views",
+        "extra": ["title", "published_at"],
+        "latest": "youtube_latest",
+        "daily": "youtube_daily",
+    },
+    "sns": {
+        "source": "sns_stats",
+        "key": "platform",
+        "value": "follower_count",
+        "extra": [],
+        "latest": "sns_latest",
+        "daily": "sns_daily",
+    },
+}
+
+def stat_date_of(ts=None):
+    """スナップショットの日付（JST）"""
+    return (ts or datetime.now(timezone.utc)).astimezone(JST).date()
+
+def _upsert(supabase, table, rows, on_conflict):
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        supabase.table(table).upsert(rows[i:i + UPSERT_CHUNK_SIZE], on_conflict=on_conflict).execute()
+
+# ==========================================
+# 同期ジョブからの差分更新
+# ==========================================
+
+def update_rollups(supabase, kind, rows, now=None):
+    """今回取得した行で最新値テーブルと日次集計テーブルを更新する"""
+    conf = ROLLUPS[kind]
+    key, value = conf["key"], conf["value"]
+    if not rows:
+        return
+
+    now = now or datetime.now(timezone.utc)
+    today = stat_date_of(now)
+    day_1 = (today - timedelta(days=1)).isoformat()
+    day_7 = (today - timedelta(days=7)).isoformat()
+
+    # 前日・7日前の値をまとめて取得（キーが多い場合のみ分割）
+    keys = [r[key] for r in rows]
+    prev_values = {}
+    for i in range(0, len(keys), IN_FILTER_CHUNK_SIZE):
+        prev = supabase.table(conf["daily"]) \
+            .select(f"{key}, stat_date, {value}") \
+            .in_(key, keys[i:i + IN_FILTER_CHUNK_SIZE]) \
+            .in_("stat_date", [day_1, day_7]) \
+            .execute().data
+        prev_values.update({(p[key], str(p["stat_date"])[:10]): p[value] for p in prev})
+
+    daily_rows, latest_rows = [], []
+    for r in rows:
+        v = r[value]
+        v_1 = prev_values.get((r[key], day_1))
+        v_7 = prev_values.get((r[key], day_7))
+        extra = {c: r.get(c) for c in conf["extra"]}
+        daily_rows.append({
+            key: r[key], "stat_date": today.isoformat(), value: v, **extra,
+            "daily_delta": v - v_1 if v_1 is not None else None,
+            "delta_7d": v - v_7 if v_7 is not None else None,
+        })
+        latest_rows.append({key: r[key], value: v, **extra, "updated_at": now.isoformat()})
+
+    _upsert(supabase, conf["daily"], daily_rows, f"{key},stat_date")
+    _upsert(supabase, conf["latest"], latest_rows, key)
+
+# ==========================================
+# 既存履歴からのバックフィル（初回のみ）
+# ==========================================
+
+def build_rollups(history, kind):
+    """履歴 DataFrame から (日次集計行, 最新値行) を作る"""
+    import pandas as pd
+
+    conf = ROLLUPS[kind]
+    key, value = conf["key"], conf["value"]
+    df = history.copy()
+    df["created_at"] = pd.to_datetime(df["created_at"], utc=True, format="ISO8601")
+    df["stat_date"] = df["created_at"].dt.tz_convert(JST).dt.date
+
+    # 同じ日に複数回取得している場合はその日の最後の値を採用
+    df = df.sort_values("created_at")
+    # JSON に NaN は送れないため欠損値は None にする
+    df = df.astype(object).where(df.notna(), None)
+    latest = df.drop_duplicates(key, keep="last")
+    daily = df.drop_duplicates([key, "stat_date"], keep="last").copy()
+
+    values = daily.set_index([key, "stat_date"])[value]
+    for col, days in (("daily_delta", 1), ("delta_7d", 7)):
+        prev_idx = pd.MultiIndex.from_arrays(
+            [daily[key], daily["stat_date"] - timedelta(days=days)]
+        )
+        prev = pd.to_numeric(values.reindex(prev_idx), errors="coerce").to_numpy()
+        daily[col] = daily[value].to_numpy(dtype="float64") - prev
+
+    daily_rows = [
+        {key: r[key], "stat_date": r["stat_date"].isoformat(), value: int(r[value]),
+         **{c: r[c] for c in conf["extra"]},
+         "daily_delta": None if pd.isna(r["daily_delta"]) else int(r["daily_delta"]),
+         "delta_7d": None if pd.isna(r["delta_7d"]) else int(r["delta_7d"])}
+        for r in daily.to_dict("records")
+    ]
+    latest_rows = [
+        {key: r[key], value: int(r[value]), **{c: r[c] for c in conf["extra"]},
+         "updated_at": r["created_at"].isoformat()}
+        for r in latest.to_dict("records")
+    ]
+    return daily_rows, latest_rows
+
+def backfill(supabase, kinds=None):
+    from data_cache import DeltaTable
+
+    for kind in kinds or ROLLUPS:
+        conf = ROLLUPS[kind]
+        print(f"--- 📚 {conf['source']} の履歴を集計中 ---")
+        table = DeltaTable(supabase, conf["source"], [conf["key"], conf["value"]] + conf["extra"], conf["key"])
+        table.refresh(force=True)
+        if table.frame.empty:
+            print("⚠️ 履歴がありません")
+            continue
+        daily_rows, latest_rows = build_rollups(table.frame, kind)
+        _upsert(supabase, conf["daily"], daily_rows, f"{conf['key']},stat_date")
+        _upsert(supabase, conf["latest"], latest_rows, conf["key"])
+        print(f"✅ {conf['daily']}: {len(daily_rows)}件 / {conf['latest']}: {len(latest_rows)}件")
+
+def main():
+    parser = argparse.ArgumentParser(description="最新値・日次集計テーブルの管理")
+    parser.add_argument('--backfill', action='store_true', help='既存の履歴から集計テーブルを再作成する')
+    parser.add_argument('--kind', choices=list(ROLLUPS), action='append', help='対象（省略時は全て）')
+    args = parser.parse_args()
+
+    if not args.backfill:
+        parser.print_help()
+        return
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("❌ SUPABASE設定ミス")
+        return
+
+    from supabase import create_client
+    backfill(create_client(SUPABASE_URL, SUPABASE_KEY), args.kind)
+    print("--- ✨ バックフィル完了 ---")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import re
+from typing import NamedTuple
+
+from lxml import etree
+from lxml.cssselect import CSSSelector
+
+# --- 解析パターン（モジュール読み込み時に一度だけコンパイル） ---
+DATE_RE = re.compile(r'(\d{4})\.(\d{2})\.(\d{2})')
+CATEGORY_RE = re.compile(r'(TOUR|LIVE|EVENT|RELEASE|TV|RADIO|MAGAZINE|GOODS|TICKET)')
+BRACKET_RE = re.compile(r'\[.*?\]')
+
+CATEGORY_MAP = {
+    "TOUR": "LIVE", "LIVE": "LIVE", "EVENT": "LIVE",
+    "RELEASE": "RELEASE",
+    "TV": "TV", "RADIO": "TV", "MAGAZINE": "TV",
+}
+# タイトルからカテゴリー名を取り除くためのパターン
+CATEGORY_STRIP_RE = {
+    name: re.compile(re.escape(name), re.IGNORECASE)
+    for name in ["TOUR", "LIVE", "EVENT", "RELEASE", "TV", "RADIO", "MAGAZINE", "GOODS", "TICKET", "OTHER"]
+}
+
+# スケジュール一覧の項目（class に schedule / list / item を含む li, dl）
+# CSS の OR 結合は libxml2 側で結果の並べ替えが発生して遅いため、
+# class を持つ li / dl を1回で走査してから class 名を絞り込む
+SCHEDULE_SELECTOR = CSSSelector('li[class], dl[class]')
+SCHEDULE_CLASS_RE = re.compile(r'schedule|list|item')
+# 上記が見つからない場合のフォールバック
+FALLBACK_SELECTOR = CSSSelector('li')
+FIRST_LINK = etree.XPath('descendant::a[1]')
+HTML_PARSER = etree.HTMLParser()
+UTF8_HTML_PARSER = etree.HTMLParser(encoding="utf-8")
+# BeautifulSoup の get_text と同じく、これらのタグ内の文字列は本文として扱わない
+NON_TEXT_TAGS = ("script", "style", "template")
+
+
+class ScheduleEvent(NamedTuple):
+    """公式スケジュールの1件分"""
+    event_date: str          # YYYY-MM-DD
+    category: str            # LIVE / RELEASE / TV / OTHER
+    title: str
+    official_category: str   # サイト上の表記 (TOUR, RADIO など)
+
+    def to_row(self):
+        """calendar_events 用の行データに変換"""
+        return {
+            "event_date": self.event_date,
+            "category": self.category,
+            "title": self.title,
+            "description": f"Official Category: {self.official_category}",
+        }
+
+
+def _text(el):
+    """get_text(" ", strip=True) と同じ結合ルールでテキストを取り出す"""
+    return " ".join(s for s in (t.strip() for t in el.itertext()) if s)
+
+
+def _parse_document(html):
+    # lxml.html の要素クラス割り当てを避け、素の etree で解析する
+    try:
+        return etree.fromstring(html, HTML_PARSER)
+    except ValueError:
+        # XML 宣言付きの文字列は bytes にして渡す
+        return etree.fromstring(html.encode("utf-8"), UTF8_HTML_PARSER)
+    except etree.XMLSyntaxError:
+        return None
+
+
+def parse_item(el):
+    """li / dl 要素1件を ScheduleEvent に変換（日付がなければ None）"""
+    text_full = _text(el)
+    date_match = DATE_RE.search(text_full)
+    if not date_match:
+        return None
+    event_date = f"{date_match.group(1)}-{date_match.group(2)}-{date_match.group(3)}"
+
+    # <a>タグの中にある具体的な情報を優先的に取得
+    links = FIRST_LINK(el)
+    raw_title = _text(links[0]) if links else text_full
+
+    cat_text = "OTHER"
+    cat_match = CATEGORY_RE.search(raw_title.upper())
+    if cat_match:
+        cat_text = cat_match.group(1)
+    category = CATEGORY_MAP.get(cat_text, "OTHER")
+
+    # 日付・曜日 [TUE]・カテゴリー名を削除して整形
+    clean_title = raw_title.replace(date_match.group(0), "")
+    clean_title = BRACKET_RE.sub('', clean_title)
+    if cat_text in clean_title.upper():
+        clean_title = CATEGORY_STRIP_RE[cat_text].sub('', clean_title)
+    clean_title = " ".join(clean_title.split()).strip()
+
+    if not clean_title:
+        clean_title = f"{cat_text} (詳細不明)"
+
+    return ScheduleEvent(event_date, category, clean_title, cat_text)
+
+
+def parse_schedule(html):
+    """スケジュール一覧ページの HTML から ScheduleEvent のリストを返す"""
+    doc = _parse_document(html)
+    if doc is None:
+        return []
+    etree.strip_elements(doc, *NON_TEXT_TAGS, with_tail=False)
+
+    items = [el for el in SCHEDULE_SELECTOR(doc) if SCHEDULE_CLASS_RE.search(el.get('class'))]
+    if not items:
+        items = FALLBACK_SELECTOR(doc)
+
+    events = []
+    for el in items:
+        event = parse_item(el)
+        if event is not None:
+            events.append(event)
+    return events
@@ -1,9 +1,13 @@
 import os
-import requests
+import http_cache
+import http_client
+import instrumentation
+import rollups
+import write_buffer
+import youtube_quota
 import re
 import time
 import argparse
-from supabase import create_client
 
 # --- 設定値 ---
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -23,7 +27,7 @@ def get_tiktok_followers(username):
     try:
         url = f"https://countik.com/user/@{username}"
         headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"}
-        response = requests.get(url, headers=headers, timeout=20)
+        response = http_client.get(url, headers=headers, timeout=20, cache=True)
         if response.status_code == 200:
             match = re.search(r'followerCount\\":(\d+)', response.text)
             if not match:
@@ -36,7 +40,9 @@ def get_tiktok_followers(username):
                     if suffix == 'M': count *= 1000000
                     elif suffix == 'K': count *= 1000
                 return int(count)
-    except Exception: pass
+    except Exception as e:
+        instrumentation.record_error("get_tiktok_followers", e)
+        print(f"⚠️ TikTokフォロワー数の取得に失敗: {type(e).__name__}: {e}")
     return None
 
 def get_instagram_followers(username):
@@ -44,7 +50,7 @@ def get_instagram_followers(username):
     try:
         url = f"https://www.picit.ai/instagram/user/{username}" 
         headers = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"}
-        response = requests.get(url, headers=headers, timeout=20)
+        response = http_client.get(url, headers=headers, timeout=20, cache=True)
         if response.status_code == 200:
             match = re.search(r'([\d,.]+)([MKk]?)\s*Followers', response.text, re.IGNORECASE)
             if match:
@@ -53,58 +59,79 @@ def get_instagram_followers(username):
                 if suffix == 'M': count *= 1000000
                 elif suffix == 'K': count *= 1000
                 return int(count)
-    except Exception: pass
+    except Exception as e:
+        instrumentation.record_error("get_instagram_followers", e)
+        print(f"⚠️ Instagramフォロワー数の取得に失敗: {type(e).__name__}: {e}")
     return None
 
 def get_x_followers(username):
     """Xのフォロワー数"""
     try:
         url = f"https://cdn.syndication.twimg.com/widgets/followbutton/info.json?screen_names={username}"
-        response = requests.get(url, timeout=15)
+        response = http_client.get(url, timeout=15, cache=True)
         if response.status_code == 200:
             data = response.json()
             if data: return data[0].get("followers_count")
-    except Exception: pass
+    except Exception as e:
+        instrumentation.record_error("get_x_followers", e)
+        print(f"⚠️ Xフォロワー数の取得に失敗: {type(e).__name__}: {e}")
     return None
 
 # ==========================================
 # メイン処理（YouTubeのみ実行し、SNSはスキップ）
 # ==========================================
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--target', choices=['official', 'takuya'], help='Target mode')
-    args = parser.parse_args()
-
+def run(target=None, supabase=None):
+    """target ('official' / 'takuya') のジョブを実行し、保存した件数を返す"""
     # TAKUYA∞用ジョブの場合はSNS取得のみが目的だったため、現在は何もしない
-    if args.target == 'takuya':
+    if target == 'takuya':
         print("--- ℹ️ TAKUYA∞モード (SNS自動取得停止中のためスキップ) ---")
-        return
+        return 0
 
     print(f"--- 🚀 YouTubeデータ同期開始 ---")
     if not SUPABASE_URL or not SUPABASE_KEY:
         print("❌ SUPABASE設定ミス")
-        return
-        
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return 0
+
+    if supabase is None:
+        from supabase import create_client
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+    saved = 0
     # YouTube登録者数（公式APIなので安定して動作します）
     try:
         yt_url = "https://www.googleapis.com/youtube/v3/channels"
         yt_params = {"part": "statistics", "id": YOUTUBE_ID, "key": YOUTUBE_API_KEY}
-        res = requests.get(yt_url, params=yt_params).json()
+        response = http_client.get(yt_url, params=yt_params, cache=True)
+        # 登録者数は丸められているため変化しない日も多い。時系列が途切れないよう、変化が無くても毎日保存する
+        res = response.json()
+        if not response.changed:
+            print("♻️ YouTube登録者数は前回から変化なし（キャッシュの内容で保存）")
         if 'items' in res:
             yt_count = int(res['items'][0]['statistics']['subscriberCount'])
             print(f"✅ YouTube登録者数: {yt_count}人")
-            supabase.table("sns_stats").insert({"platform": "youtube", "follower_count": yt_count}).execute()
+            row = {"platform": "youtube", "follower_count": yt_count, **write_buffer.snapshot_fields()}
+            write_buffer.get_buffer().write(supabase, "sns_stats", [row])
+            saved += 1
             print("✅ Supabase保存完了")
+            rollups.update_rollups(supabase, "sns", [row])
+            http_cache.mark_processed(response)
     except Exception as e:
+        instrumentation.record_error("sns.youtube_subscribers", e)
         print(f"❌ YouTube取得エラー: {e}")
+    youtube_quota.flush(supabase)
 
     # SNSの自動取得は、以下のロジックが将来的に安定したサイトを見つけたら再開可能です
     # 現状はエラーによるActionsの停止を防ぐため、呼び出しを行いません。
     print("ℹ️ SNS(X, TikTok, Instagram)の自動取得は現在スキップされています。")
     print("--- ✨ 処理完了 ---")
+    return saved
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--target', choices=['official', 'takuya'], help='Target mode')
+    args = parser.parse_args()
+    run(args.target)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
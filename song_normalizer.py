@@ -0,0 +1,195 @@
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+
+# --- 設定 ---
+# SONG_LIST（MV）以外の曲。アンケートでよく挙がる曲を追加していく
+SUPPLEMENTARY_SONGS = [
+    "THE ONE", "CORE PRIDE", "ace of ace", "LONE WOLF", "LIFE", "Lump of affection", "α-Skill",
+    "病的希求日記", "DISCORD", "扉", "撃破", "此処から", "美影意志", "マダラ蝶", "ai ta心", "心とココロ",
+    "brand new ancient", "WANNA be BRILLIANT", "7日目の決意", "THUG LIFE", "Wizard CLUB",
+    "一億分の一の小説", "23ワード", "BABY BORN & GO", "KINJITO", "奏全域", "在るべき形", "境界", "体温",
+    "君のまま", "白昼夢", "凛句", "神集め", "魑魅魍魎マーチ", "若さ故エンテレケイア", "シャカビーチ",
+    "ハイ!問題作", "心が指す場所と口癖 そして君がついて来る", "いつか必ず死ぬことを忘れるな",
+    "僕に重なってくる今", "畢生皐月プロローグ", "勝者臆病者", "バーレル", "ピグマリオン", "モノクローム",
+    "トキノナミダ", "ハルジオン", "ビタースウィート", "パニックワールド", "スパルタ", "エミュー",
+    "イーティー", "シークレット", "ノーウェアボーイ", "アイ・アムRiri", "world LOST world", "wings ever",
+    "two Lies", "a LOVELY TONE", "closed POKER", "expod-digital", "UNKNOWN ORCHESTRA", "YURA YURA",
+    "Ultimate", "THEORY", "Rush", "SHINE", "SORA", "MINORI", "Nitro", "PRIME", "GROOVY GROOVY GROOVY",
+    "LIVIN' IT UP", "Live everyday as if it were the last day", "MEMORIES of the End", "Timeless",
+    "EMPTY96", "BVCK", "ALL ALONE", "Burst", "IDEAL REALITY", "Fight For Liberty",
+]
+# 正規化しても一致しない別表記 → 正式名
+SONG_ALIASES = {
+    "1億分の1の小説": "一億分の一の小説",
+    "病院希求日記": "病的希求日記",
+    "儚くも永遠のカナシ": "儚くも永久のカナシ",
+    "問題作!": "ハイ!問題作",
+    "ハイ、問題作!": "ハイ!問題作",
+    "ハイ問題作": "ハイ!問題作",
+    "asONE": "AS ONE",
+    "No1": "NO.1",
+}
+
+SONG_DELIMITERS = re.compile(r'[/,、&／＆・\n]+')
+NOTE_RE = re.compile(r'[（(].*?[）)]')           # 補足 (フル) など
+# 「①扉②DISCORD」のような番号付きの列挙。NFKC で数字になる前に区切りとして扱う
+CIRCLED_NUMBER_RE = re.compile(r'[①-⑳]')
+TITLE_IN_BRACKETS_RE = re.compile(r'『(.+?)』')
+NON_WORD_RE = re.compile(r'[\W_]+')
+# カタカナ → ひらがな（表記ゆれを吸収する）
+KATA_TO_HIRA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+# ファジー一致の下限（bigram の Dice 係数）
+MIN_SCORE = 0.6
+# 短い曲名は1文字違いでも別の曲（LIVE / LIFE、PRIDE / PRIME など）なので、
+# FUZZY_MIN_LENGTH 文字未満のキーは完全一致・別表記のみ。それ以上も短いほど下限を上げ、
+# 照合する2つのキーの短い方が FUZZY_FULL_LENGTH 文字以上で MIN_SCORE になる
+FUZZY_MIN_LENGTH = 5
+FUZZY_FULL_LENGTH = 10
+
+
+def normalize_key(text):
+    """照合用のキー: NFKC・小文字化・ひらがな化し、記号と空白を除く"""
+    text = unicodedata.normalize("NFKC", text).lower().translate(KATA_TO_HIRA)
+    return NON_WORD_RE.sub("", text)
+
+
+def _bigrams(key):
+    padded = f"^{key}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def required_score(length, min_score=MIN_SCORE):
+    """照合するキーの短い方の文字数に応じたファジー一致の下限（一致させない長さなら None）"""
+    if length < FUZZY_MIN_LENGTH:
+        return None
+    return min_score + (1 - min_score) * max(FUZZY_FULL_LENGTH - length, 0) / FUZZY_FULL_LENGTH
+
+
+def catalog_titles():
+    """SONG_LIST の表示名から曲名部分（『』の中）を取り出し、補助リストと合わせる"""
+    from uver_to_supabase import SONG_LIST
+
+    titles = []
+    for label in SONG_LIST.values():
+        match = TITLE_IN_BRACKETS_RE.search(label)
+        title = NOTE_RE.sub("", match.group(1) if match else label).strip()
+        # 両A面（KINJITO/BABY BORN ＆ GO）は1曲ずつ登録。99/100騙しの哲 は曲名の一部
+        if "/" in title and not title[0].isdigit():
+            titles.extend(t.strip() for t in title.split("/") if t.strip())
+        else:
+            titles.append(title)
+    # 全角・半角違い（BABY BORN ＆ GO / BABY BORN & GO など）は先に出てきた表記にまとめる
+    unique = {}
+    for title in titles + SUPPLEMENTARY_SONGS:
+        unique.setdefault(normalize_key(title), title)
+    return list(unique.values())
+
+
+class SongNormalizer:
+    """
+    自由記述の曲名回答を正式な曲名のリストに変換する。
+    完全一致は辞書、表記ゆれは bigram の転置インデックスで候補を絞ってから Dice 係数で判定する。
+    """
+
+    def __init__(self, titles=None, aliases=None, min_score=MIN_SCORE, cache_size=200_000):
+        self.titles = list(titles if titles is not None else catalog_titles())
+        self.min_score = min_score
+
+        self._exact = {}
+        # 表記 → 正式名（区切り文字を含む表記の保護にも使う）
+        spellings = {title: title for title in self.titles}
+        spellings.update(aliases if aliases is not None else SONG_ALIASES)
+        for spelling, title in spellings.items():
+            self._exact.setdefault(normalize_key(spelling), title)
+
+        self._keys = list(self._exact)
+        self._key_lengths = [len(key) for key in self._keys]
+        self._gram_sizes = []
+        self._index = defaultdict(list)
+        for i, key in enumerate(self._keys):
+            grams = _bigrams(key)
+            self._gram_sizes.append(len(grams))
+            for gram in grams:
+                self._index[gram].append(i)
+
+        # 区切り文字を含む曲名（99/100騙しの哲 など）は分割前に保護する
+        protected = sorted(
+            {unicodedata.normalize("NFKC", spelling): title
+             for spelling, title in spellings.items() if SONG_DELIMITERS.search(unicodedata.normalize("NFKC", spelling))}.items(),
+            key=lambda kv: len(kv[0]), reverse=True,
+        )
+        self._protect_re = re.compile(
+            "|".join(re.escape(nfkc) for nfkc, _ in protected), re.IGNORECASE
+        ) if protected else None
+        self._protected = {f"\x00{i}\x00": title for i, (_, title) in enumerate(protected)}
+        self._protected_ids = {nfkc.lower(): f"\x00{i}\x00" for i, (nfkc, _) in enumerate(protected)}
+
+        # 同じ回答文字列は何度も出てくるので、生の文字列単位でキャッシュする
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, piece):
+        """1曲分の文字列を正式名に変換する（一致しなければ None）"""
+        key = normalize_key(piece)
+        if not key:
+            return None
+        if key in self._exact:
+            return self._exact[key]
+
+        if len(key) < FUZZY_MIN_LENGTH:
+            return None
+
+        grams = _bigrams(key)
+        shared = defaultdict(int)
+        for gram in grams:
+            for i in self._index.get(gram, ()):
+                shared[i] += 1
+        best, best_score = None, 0.0
+        for i, n in shared.items():
+            required = required_score(min(len(key), self._key_lengths[i]), self.min_score)
+            score = 2 * n / (len(grams) + self._gram_sizes[i])
+            if required is not None and score >= required and score >= best_score:
+                best, best_score = i, score
+        return self._exact[self._keys[best]] if best is not None else None
+
+    def split(self, answer):
+        """回答を1曲ずつに分割し、補足や丸数字を取り除く"""
+        text = unicodedata.normalize("NFKC", CIRCLED_NUMBER_RE.sub("/", answer))
+        if self._protect_re is not None:
+            text = self._protect_re.sub(lambda m: self._protected_ids[m.group(0).lower()], text)
+        pieces = []
+        for piece in SONG_DELIMITERS.split(text):
+            for marker, title in self._protected.items():
+                piece = piece.replace(marker, title)
+            piece = NOTE_RE.sub("", piece).strip()
+            if piece:
+                pieces.append(piece)
+        return pieces
+
+    def _normalize(self, answer):
+        """回答 → 正式名のタプル（一致しない曲は整形後の文字列をそのまま残す）"""
+        if not answer or answer == "未回答":
+            return ()
+        songs = [self.match(piece) or piece for piece in self.split(answer)]
+        return tuple(dict.fromkeys(songs))
+
+    def normalize_series(self, answers):
+        """pandas の Series を一括変換（ユニークな値だけを変換して展開する）"""
+        import pandas as pd
+
+        codes, uniques = pd.factorize(answers)
+        lookup = [list(self.normalize(str(u))) for u in uniques]
+        return pd.Series([lookup[c] if c >= 0 else [] for c in codes], index=answers.index, dtype=object)
+
+
+_default = None
+
+def get_normalizer():
+    """SONG_LIST と補助リストから作ったインスタンスを共有する"""
+    global _default
+    if _default is None:
+        _default = SongNormalizer()
+    return _default
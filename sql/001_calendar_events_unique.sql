@@ -0,0 +1,10 @@
+-- calendar_events: (event_date, title) を一意にして一括 upsert の衝突キーにする
+-- 既存の重複行を先に削除（最も古い id を残す）
+delete from calendar_events a
+using calendar_events b
+where a.event_date = b.event_date
+  and a.title = b.title
+  and a.id > b.id;
+
+alter table calendar_events
+  add constraint calendar_events_event_date_title_key unique (event_date, title);
@@ -0,0 +1,38 @@
+-- 最新値テーブルと日次集計テーブル（同期ジョブが毎回 upsert で更新する）
+-- 既存履歴は `python rollups.py --backfill` で投入する
+
+create table if not exists youtube_latest (
+  video_id     text primary key,
+  title        text,
+  views        bigint not null,
+  published_at date,
+  updated_at   timestamptz not null default now()
+);
+
+create table if not exists youtube_daily (
+  video_id    text not null,
+  stat_date   date not null,
+  title       text,
+  views       bigint not null,
+  daily_delta bigint,
+  delta_7d    bigint,
+  primary key (video_id, stat_date)
+);
+
+create table if not exists sns_latest (
+  platform       text primary key,
+  follower_count bigint not null,
+  updated_at     timestamptz not null default now()
+);
+
+create table if not exists sns_daily (
+  platform       text not null,
+  stat_date      date not null,
+  follower_count bigint not null,
+  daily_delta    bigint,
+  delta_7d       bigint,
+  primary key (platform, stat_date)
+);
+
+create index if not exists youtube_daily_stat_date_idx on youtube_daily (stat_date);
+create index if not exists sns_daily_stat_date_idx on sns_daily (stat_date);
@@ -0,0 +1,15 @@
+-- アンケートのクロス集計（survey_aggregate.py が取り込みごとに更新する）
+-- dimension: total / song / visits / prefecture / age / gender
+create table if not exists survey_aggregates (
+  event_year   text not null,
+  venue_type   text,
+  live_name    text not null,
+  live_date    date not null,
+  dimension    text not null,
+  value        text not null default '',
+  count        integer not null,
+  refreshed_at timestamptz not null default now(),
+  primary key (event_year, live_name, live_date, dimension, value)
+);
+
+create index if not exists survey_aggregates_dimension_idx on survey_aggregates (dimension, event_year);
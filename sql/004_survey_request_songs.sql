@@ -0,0 +1,4 @@
+-- アンケートの曲名回答を正式名のリストに揃えた列（import_survey.py が song_normalizer で作成する）
+alter table survey_responses add column if not exists request_songs text[];
+
+create index if not exists survey_responses_request_songs_idx on survey_responses using gin (request_songs);
@@ -0,0 +1,13 @@
+-- 動画カタログ: 公式チャンネルのアップロード一覧から自動で追加する（video_catalog.py）
+-- タイトル・公開日などの変わらない情報はここに1回だけ保存し、日次の取得は statistics のみにする
+create table if not exists video_catalog (
+  video_id      text primary key,
+  title         text not null,         -- 表示名（『曲名』...）
+  raw_title     text,                  -- YouTube 上のタイトル
+  published_at  date,
+  tracked       boolean not null default true,   -- 再生数を記録する対象か
+  source        text not null default 'playlist', -- seed（SONG_LIST から投入）/ playlist（自動検出）
+  discovered_at timestamptz not null default now()
+);
+
+create index if not exists video_catalog_tracked_idx on video_catalog (tracked);
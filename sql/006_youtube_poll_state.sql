@@ -0,0 +1,18 @@
+-- 再生数の取得間隔を動画ごとに決めるための状態（poll_scheduler.py が更新する）
+create table if not exists youtube_poll_state (
+  video_id        text primary key,
+  last_polled_at  timestamptz not null,
+  last_views      bigint not null,
+  views_per_hour  double precision,      -- 直近の再生ペース（指数移動平均）
+  interval_hours  double precision not null,
+  next_poll_at    timestamptz not null
+);
+
+create index if not exists youtube_poll_state_next_poll_at_idx on youtube_poll_state (next_poll_at);
+
+-- YouTube Data API のクォータ使用量（日付は API のリセット基準である太平洋時間）
+create table if not exists youtube_quota_usage (
+  quota_date date primary key,
+  units      integer not null default 0,
+  updated_at timestamptz not null default now()
+);
@@ -0,0 +1,38 @@
+-- youtube_stats / sns_stats に「取得日 (JST)」を追加し、(キー, 取得日) を一意にする
+-- write_buffer.py はこの組で upsert するため、再実行しても同じ日の行は増えない（最新値で上書き）
+
+alter table youtube_stats add column if not exists snapshot_date date;
+alter table sns_stats add column if not exists snapshot_date date;
+
+update youtube_stats set snapshot_date = (created_at at time zone 'Asia/Tokyo')::date where snapshot_date is null;
+update sns_stats set snapshot_date = (created_at at time zone 'Asia/Tokyo')::date where snapshot_date is null;
+
+-- 既存の重複行を削除（同じ日の最も新しい行を残す）
+delete from youtube_stats a
+using youtube_stats b
+where a.video_id = b.video_id
+  and a.snapshot_date = b.snapshot_date
+  and (a.created_at, a.id) < (b.created_at, b.id);
+
+delete from sns_stats a
+using sns_stats b
+where a.platform = b.platform
+  and a.snapshot_date = b.snapshot_date
+  and (a.created_at, a.id) < (b.created_at, b.id);
+
+alter table youtube_stats alter column snapshot_date set default (now() at time zone 'Asia/Tokyo')::date;
+alter table youtube_stats alter column snapshot_date set not null;
+alter table sns_stats alter column snapshot_date set default (now() at time zone 'Asia/Tokyo')::date;
+alter table sns_stats alter column snapshot_date set not null;
+
+create unique index if not exists youtube_stats_video_snapshot_key on youtube_stats (video_id, snapshot_date);
+create unique index if not exists sns_stats_platform_snapshot_key on sns_stats (platform, snapshot_date);
+
+-- poll_scheduler.py の1日より細かい取得結果（1時間単位で最新値を保持）
+create table if not exists youtube_stats_hourly (
+  video_id      text not null,
+  snapshot_hour timestamptz not null,
+  views         bigint not null,
+  created_at    timestamptz not null default now(),
+  primary key (video_id, snapshot_hour)
+);
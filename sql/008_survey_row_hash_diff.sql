@@ -0,0 +1,66 @@
+-- アンケートの差分取り込み
+-- row_hash: 回答内容（会場タイプ・曲名・回数・都道府県・年齢・性別）の SHA-256。
+--   import_survey.py / SurveyTable.tsx が同じ規則で計算し、既存行との差分だけを送る
+-- apply_survey_diff: 差分（削除する id と追加する行）を1トランザクションで適用する。
+--   途中で失敗してもライブのデータが消えた状態にはならない
+
+alter table survey_responses add column if not exists row_hash text;
+
+update survey_responses
+set row_hash = encode(sha256(convert_to(concat_ws(chr(31),
+  coalesce(venue_type, ''), coalesce(request_song, ''), coalesce(visits, ''),
+  coalesce(prefecture, ''), coalesce(age, ''), coalesce(gender, '')), 'UTF8')), 'hex')
+where row_hash is null;
+
+create index if not exists survey_responses_live_idx on survey_responses (live_name, event_year, created_at);
+
+create or replace function apply_survey_diff(
+  p_live_name      text,
+  p_event_year     text,
+  p_live_date      date,
+  p_expected_count integer,
+  p_delete_ids     bigint[],
+  p_insert         jsonb
+) returns jsonb
+language plpgsql
+as $$
+declare
+  v_current  integer;
+  v_deleted  integer;
+  v_inserted integer;
+begin
+  -- 同じライブへの取り込みを直列化する
+  perform pg_advisory_xact_lock(hashtext(p_live_name || '|' || p_event_year || '|' || p_live_date::text));
+
+  -- 差分を計算したときから行数が変わっていれば、別の取り込みと競合したので中止する
+  select count(*) into v_current
+  from survey_responses
+  where live_name = p_live_name
+    and event_year = p_event_year
+    and (created_at at time zone 'UTC')::date = p_live_date;
+  if v_current <> p_expected_count then
+    raise exception 'survey_responses for % % changed during import (expected %, found %)',
+      p_live_date, p_live_name, p_expected_count, v_current;
+  end if;
+
+  delete from survey_responses
+  where id = any(coalesce(p_delete_ids, '{}'))
+    and live_name = p_live_name
+    and event_year = p_event_year
+    and (created_at at time zone 'UTC')::date = p_live_date;
+  get diagnostics v_deleted = row_count;
+  if v_deleted <> coalesce(array_length(p_delete_ids, 1), 0) then
+    raise exception 'apply_survey_diff: % of % rows to delete were not found',
+      coalesce(array_length(p_delete_ids, 1), 0) - v_deleted, coalesce(array_length(p_delete_ids, 1), 0);
+  end if;
+
+  insert into survey_responses
+    (live_name, venue_type, event_year, request_song, request_songs, visits, prefecture, age, gender, created_at, row_hash)
+  select live_name, venue_type, event_year, request_song, request_songs, visits, prefecture, age, gender,
+         coalesce(created_at, now()), row_hash
+  from jsonb_populate_recordset(null::survey_responses, coalesce(p_insert, '[]'::jsonb));
+  get diagnostics v_inserted = row_count;
+
+  return jsonb_build_object('deleted', v_deleted, 'inserted', v_inserted);
+end;
+$$;
@@ -0,0 +1,13 @@
+-- YouTube Data API のクォータ使用量を加算する（youtube_quota.py が全ジョブの呼び出し回数を記録する）
+-- 読んでから書き戻すと同時に実行されたジョブの加算が失われるため、DB 側で units = units + n とする
+create or replace function add_youtube_quota(p_quota_date date, p_units integer)
+returns integer
+language sql
+as $$
+  insert into youtube_quota_usage (quota_date, units, updated_at)
+  values (p_quota_date, p_units, now())
+  on conflict (quota_date) do update
+    set units = youtube_quota_usage.units + excluded.units,
+        updated_at = now()
+  returning units;
+$$;
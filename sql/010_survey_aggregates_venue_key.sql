@@ -0,0 +1,10 @@
+-- survey_aggregates の主キーに venue_type を含める（survey_aggregate.py の GROUP_KEYS と揃える）
+-- 会場区分が未設定の回答は '' として集計する（主キーの列は null にできないため）
+
+update survey_aggregates set venue_type = '' where venue_type is null;
+
+alter table survey_aggregates alter column venue_type set default '';
+alter table survey_aggregates alter column venue_type set not null;
+
+alter table survey_aggregates drop constraint if exists survey_aggregates_pkey;
+alter table survey_aggregates add primary key (event_year, venue_type, live_name, live_date, dimension, value);
@@ -0,0 +1,214 @@
+import json
+import argparse
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from data_cache import fetch_all
+from song_normalizer import get_normalizer
+
+# --- 設定 ---
+AGGREGATE_TABLE = "survey_aggregates"
+UPSERT_CHUNK_SIZE = 500
+# ライブ単位の集計キー（live_date は created_at の日付部分）。survey_aggregates の主キー (sql/010) と同じ
+GROUP_KEYS = ["event_year", "venue_type", "live_name", "live_date"]
+# 会場区分が未設定の回答の venue_type（主キーの列なので null にしない）
+MISSING_VENUE = ""
+# dimension 名はダッシュボードのタブ ID と揃える。"total" は回答件数
+DIMENSIONS = {
+    "song": "request_song",
+    "visits": "visits",
+    "prefecture": "prefecture",
+    "age": "age",
+    "gender": "gender",
+}
+
+# ==========================================
+# 次元ごとの値の整形（ダッシュボードの集計ルールと同じ）
+# ==========================================
+
+def _song_values(col):
+    """1回答に複数曲が書かれていれば分割し、曲名カタログの正式名に揃える"""
+    songs = get_normalizer().normalize_series(col).explode()
+    # 曲名を含まない回答は空リスト → explode で NaN になる
+    return songs.dropna()
+
+def _visits_values(col):
+    nums = pd.to_numeric(col[col != "未回答"].str.extract(r'([0-9]+)', expand=False), errors="coerce")
+    nums = nums[nums > 0]
+    return nums.astype("int64").astype(str) + "回"
+
+def _age_values(col):
+    nums = pd.to_numeric(col.str.extract(r'([0-9]+)', expand=False), errors="coerce")
+    nums = nums[nums >= 10]
+    decade = (nums.clip(upper=60) // 10 * 10).astype("int64")
+    return decade.map(lambda d: "60代以上" if d >= 60 else f"{d}代")
+
+def _plain_values(col):
+    return col[~col.isin(["回", "未回答", ""])]
+
+VALUE_FUNCS = {
+    "song": _song_values,
+    "visits": _visits_values,
+    "prefecture": _plain_values,
+    "age": _age_values,
+    "gender": _plain_values,
+}
+
+# ==========================================
+# 集計
+# ==========================================
+
+def build_aggregates(responses):
+    """survey_responses の DataFrame から (GROUP_KEYS, dimension, value, count) の DataFrame を作る"""
+    columns = GROUP_KEYS + ["dimension", "value", "count"]
+    if responses.empty:
+        return pd.DataFrame(columns=columns)
+
+    df = responses.reset_index(drop=True)
+    df["event_year"] = df["event_year"].astype(str)
+    # value_counts は null を含む行を数えないので、会場区分が無い回答も集計に残るよう埋める
+    df["venue_type"] = df["venue_type"].fillna(MISSING_VENUE)
+    df["live_date"] = df["created_at"].astype(str).str[:10].str.replace("/", "-")
+    groups = df[GROUP_KEYS]
+
+    frames = [groups.value_counts().rename("count").reset_index().assign(dimension="total", value="")]
+    for dim, column in DIMENSIONS.items():
+        raw = df[column].fillna("未回答").astype(str).str.strip()
+        values = VALUE_FUNCS[dim](raw)
+        if values.empty:
+            continue
+        # explode で増えた行も元の行のインデックスを保っているのでライブ情報を結合できる
+        keyed = groups.loc[values.index].assign(value=values.to_numpy())
+        counts = keyed.value_counts().rename("count").reset_index()
+        frames.append(counts.assign(dimension=dim))
+
+    result = pd.concat(frames, ignore_index=True)[columns]
+    result["count"] = result["count"].astype("int64")
+    return result
+
+def to_artifact(aggregates):
+    """JSON 出力用に {ライブ: {dimension: {value: count}}} の形へ変換"""
+    artifact = []
+    for key, group in aggregates.groupby(GROUP_KEYS, sort=True):
+        entry = dict(zip(GROUP_KEYS, key))
+        for dim, rows in group.groupby("dimension"):
+            if dim == "total":
+                entry["responses"] = int(rows["count"].sum())
+            else:
+                entry[dim] = dict(sorted(zip(rows["value"], rows["count"].astype(int)), key=lambda kv: -kv[1]))
+        artifact.append(entry)
+    return artifact
+
+# ==========================================
+# 保存
+# ==========================================
+
+def save_aggregates(supabase, aggregates, live_filters=None):
+    """
+    集計結果を upsert し、今回の集計に含まれなくなった古い行を削除する。
+    live_filters を渡した場合はそのライブ分だけを置き換える（差分更新）。
+    """
+    refreshed_at = datetime.now(timezone.utc).isoformat()
+    rows = aggregates.assign(refreshed_at=refreshed_at).to_dict("records")
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        supabase.table(AGGREGATE_TABLE).upsert(
+            rows[i:i + UPSERT_CHUNK_SIZE],
+            on_conflict=",".join(GROUP_KEYS + ["dimension", "value"]),
+        ).execute()
+
+    # upsert 後に古い行を消すため、更新途中でも集計が空になることはない
+    stale = supabase.table(AGGREGATE_TABLE).delete().lt("refreshed_at", refreshed_at)
+    for column, value in (live_filters or {}).items():
+        stale = stale.eq(column, value)
+    stale.execute()
+
+def refresh_live(supabase, responses):
+    """取り込み直後のライブ1件分の行から集計を更新する"""
+    aggregates = build_aggregates(responses)
+    if aggregates.empty:
+        return aggregates
+    first = aggregates.iloc[0]
+    save_aggregates(supabase, aggregates, {
+        "event_year": first["event_year"],
+        "live_name": first["live_name"],
+        "live_date": first["live_date"],
+    })
+    return aggregates
+
+def load_responses(supabase):
+    columns = ["id", "created_at"] + GROUP_KEYS[:-1] + list(DIMENSIONS.values())
+    rows = fetch_all(lambda: supabase.table("survey_responses").select(",".join(columns)).order("id"))
+    return pd.DataFrame(rows, columns=columns)
+
+def normalize_pending(supabase=None):
+    """
+    request_songs が未設定の回答（ダッシュボードから取り込んだ分）を曲名カタログで正規化し、
+    そのライブの集計を Python 側のルールで作り直す。更新した回答数を返す。
+    ダッシュボードは取り込み後に同期ジョブ survey としてこれを呼ぶ（--rebuild を手で実行しなくても揃う）。
+    """
+    if supabase is None:
+        from import_survey import get_client
+        supabase = get_client()
+
+    pending = fetch_all(lambda: supabase.table("survey_responses")
+                        .select("id, request_song, live_name, event_year, created_at")
+                        .is_("request_songs", "null").order("id"))
+    if not pending:
+        return 0
+    df = pd.DataFrame(pending)
+    df["request_song"] = df["request_song"].fillna("未回答")
+    # request_songs 列だけを更新する（読んだ行全体を書き戻すと、その間に apply_survey_diff で
+    # 削除・置き換えられた行を古い内容で戻してしまう）。同じ回答の行はまとめて1回で更新する
+    normalizer = get_normalizer()
+    for answer, ids in df.groupby("request_song")["id"]:
+        ids = ids.astype("int64").tolist()
+        for i in range(0, len(ids), UPSERT_CHUNK_SIZE):
+            supabase.table("survey_responses").update({"request_songs": list(normalizer.normalize(answer))}) \
+                .in_("id", ids[i:i + UPSERT_CHUNK_SIZE]) \
+                .is_("request_songs", "null") \
+                .execute()
+    print(f"🎵 曲名を正規化: {len(df)}件")
+
+    lives = df.assign(live_date=df["created_at"].astype(str).str[:10])[["live_name", "event_year", "live_date"]] \
+        .drop_duplicates()
+    for live in lives.itertuples(index=False):
+        responses = pd.DataFrame(fetch_all(lambda: supabase.table("survey_responses").select("*")
+                                           .eq("live_name", live.live_name)
+                                           .eq("event_year", live.event_year)
+                                           .like("created_at", f"{live.live_date}%")
+                                           .order("id")))
+        refresh_live(supabase, responses)
+        print(f"📈 {live.live_date} [{live.live_name}] の集計を更新しました")
+    return len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description="アンケートのクロス集計を作成する")
+    parser.add_argument('--rebuild', action='store_true', help='全ライブ分を再集計して survey_aggregates を置き換える')
+    parser.add_argument('--json', help='集計結果を JSON ファイルにも書き出す')
+    args = parser.parse_args()
+
+    if not args.rebuild and not args.json:
+        parser.print_help()
+        return
+
+    # 接続先はアンケート取り込みと同じプロジェクト
+    from import_survey import get_client
+    supabase = get_client()
+
+    print("--- 📊 アンケート集計開始 ---")
+    responses = load_responses(supabase)
+    aggregates = build_aggregates(responses)
+    print(f"🔎 回答 {len(responses)}件 → 集計 {len(aggregates)}行")
+
+    if args.rebuild:
+        save_aggregates(supabase, aggregates)
+        print(f"✅ {AGGREGATE_TABLE} を更新しました")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(to_artifact(aggregates), f, ensure_ascii=False, indent=1)
+        print(f"💾 {args.json} に書き出しました")
+    print("--- ✨ 処理完了 ---")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import instrumentation
+
+# --- 設定 ---
+SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY") or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+MAX_JOBS = int(os.getenv("SYNC_MAX_JOBS", "4"))
+
+# ジョブ定義: 名前 → (モジュール, 関数, 引数, 依存ジョブ)
+# モジュールは実行時に import する（選ばれなかったジョブの依存ライブラリは読み込まない）
+JOBS = {
+    "sns_official": ("sns_to_supabase", "run", {"target": "official"}, []),
+    "sns_takuya":   ("sns_to_supabase", "run", {"target": "takuya"}, []),
+    "catalog":      ("video_catalog", "refresh", {}, []),
+    "youtube":      ("uver_to_supabase", "fetch_and_save", {}, ["catalog"]),
+    "schedule":     ("sync_all_data", "scrape_uver_schedule", {}, []),
+    # 再生ペースに応じた間隔での取得（cron を1時間ごとに回す場合や poll_scheduler.py --loop の代わり）
+    # youtube と同時に実行すると同じ動画を両方が取得するため、youtube が更新した取得予定を見てから動く
+    "poll":         ("poll_scheduler", "run_once", {}, ["catalog", "youtube"]),
+    "export":       ("local_store", "export_all", {}, ["sns_official", "youtube", "schedule"]),
+    # ダッシュボードから取り込んだアンケートの曲名正規化と集計の作り直し
+    "survey":       ("survey_aggregate", "normalize_pending", {}, []),
+}
+# --only / --skip を指定しない場合に実行するジョブ（export は --export で追加）
+DEFAULT_JOBS = ["sns_official", "sns_takuya", "catalog", "youtube", "schedule", "survey"]
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """全ジョブで共有する Supabase クライアント（初回利用時に作成）"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from supabase import create_client
+            _client = instrumentation.instrument_client(create_client(SUPABASE_URL, SUPABASE_KEY))
+        return _client
+
+# ==========================================
+# ジョブグラフの実行
+# ==========================================
+
+def select_jobs(only=None, skip=None, export=False):
+    """実行するジョブ名を JOBS の定義順で返す"""
+    names = list(only) if only else list(DEFAULT_JOBS) + (["export"] if export else [])
+    unknown = [n for n in list(names) + list(skip or []) if n not in JOBS]
+    if unknown:
+        raise ValueError(f"不明なジョブ: {', '.join(unknown)}")
+    return [n for n in JOBS if n in names and n not in (skip or [])]
+
+def run_job(name):
+    """1ジョブを実行し、(結果, import 秒, 実行秒) を返す"""
+    module_name, func_name, kwargs, _ = JOBS[name]
+    start = time.perf_counter()
+    func = getattr(importlib.import_module(module_name), func_name)
+    imported = time.perf_counter()
+    with instrumentation.stage(f"job.{name}"):
+        result = instrumentation.profile_call(func, supabase=get_client(), **kwargs)
+    return result, imported - start, time.perf_counter() - imported
+
+def run_graph(names, max_jobs=MAX_JOBS, on_update=None):
+    """
+    依存関係を満たしたジョブから並列に実行する。
+    選ばれていない依存ジョブは満たされているものとみなし、失敗したジョブに依存するジョブはスキップする。
+    on_update(ジョブ名, 状態) で running / ok / failed / skipped の変化を通知する（進捗表示用）。
+    戻り値は {ジョブ名: {"status", "result", "import_sec", "run_sec"}}。
+    """
+    notify = on_update or (lambda name, status: None)
+    selected = set(names)
+    pending = {n: [d for d in JOBS[n][3] if d in selected] for n in names}
+    report = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_jobs)) as pool:
+        while pending or running:
+            ready = [n for n, deps in pending.items() if all(d in report for d in deps)]
+            if not ready and not running:
+                raise RuntimeError(f"依存関係が循環しています: {', '.join(pending)}")
+            for name in ready:
+                deps = pending.pop(name)
+                failed = [d for d in deps if report[d]["status"] != "ok"]
+                if failed:
+                    print(f"⏭️ {name}: 依存ジョブ {', '.join(failed)} が失敗したためスキップ")
+                    report[name] = {"status": "skipped", "result": None, "import_sec": 0.0, "run_sec": 0.0}
+                    notify(name, "skipped")
+                    continue
+                print(f"▶️ {name} 開始")
+                notify(name, "running")
+                running[pool.submit(run_job, name)] = name
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result, import_sec, run_sec = future.result()
+                    report[name] = {"status": "ok", "result": result, "import_sec": import_sec, "run_sec": run_sec}
+                except BaseException as e:  # exit(1) などの SystemExit も失敗として扱う
+                    instrumentation.record_error(f"job.{name}", e)
+                    print(f"❌ {name} エラー: {e!r}")
+                    report[name] = {"status": "failed", "result": None, "import_sec": 0.0, "run_sec": 0.0}
+                notify(name, report[name]["status"])
+    return report
+
+def print_report(report, names, total_sec, client_sec):
+    print("\n--- ⏱️ 実行時間の内訳 ---")
+    print(f"{'job':<14}{'status':<9}{'import[s]':>10}{'run[s]':>9}  result")
+    for name in names:
+        r = report[name]
+        print(f"{name:<14}{r['status']:<9}{r['import_sec']:>10.2f}{r['run_sec']:>9.2f}  {r['result']}")
+    print(f"{'(client)':<14}{'':<9}{client_sec:>10.2f}")
+    print(f"{'total':<14}{'':<9}{'':>10}{total_sec:>9.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="データ収集ジョブを1プロセスでまとめて実行する")
+    parser.add_argument('--only', nargs='+', metavar='JOB', help=f"実行するジョブ ({', '.join(JOBS)})")
+    parser.add_argument('--skip', nargs='+', metavar='JOB', default=[], help='除外するジョブ')
+    parser.add_argument('--export', action='store_true', help='収集後にローカルストアへエクスポートする')
+    parser.add_argument('--max-jobs', type=int, default=MAX_JOBS, help='同時に実行するジョブ数')
+    parser.add_argument('--list', action='store_true', help='ジョブ一覧を表示して終了')
+    parser.add_argument('--metrics', help='計測イベントを JSON Lines で追記するファイル（環境変数 METRICS_FILE でも可）')
+    parser.add_argument('--profile', action='store_true', help='cProfile / tracemalloc の結果を表示する')
+    parser.add_argument('--profile-out', help='cProfile の結果を pstats 形式で保存するファイル')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (module_name, func_name, kwargs, deps) in JOBS.items():
+            after = f" (after: {', '.join(deps)})" if deps else ""
+            print(f"{name:<14}{module_name}.{func_name}{after}")
+        return
+
+    try:
+        names = select_jobs(args.only, args.skip, args.export)
+    except ValueError as e:
+        parser.error(str(e))
+    if not names:
+        print("⚠️ 実行するジョブがありません")
+        return
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("❌ SUPABASE設定ミス")
+        sys.exit(1)
+
+    instrumentation.configure(args.metrics)
+    if args.profile or args.profile_out:
+        instrumentation.enable_profiling()
+
+    print(f"--- 🚀 同期開始: {', '.join(names)} ---")
+    start = time.perf_counter()
+    get_client()
+    client_sec = time.perf_counter() - start
+
+    # 前回までに送れなかった行を先に送る
+    import write_buffer
+    write_buffer.replay(get_client())
+
+    report = run_graph(names, args.max_jobs)
+    print_report(report, names, time.perf_counter() - start, client_sec)
+    instrumentation.print_summary()
+    instrumentation.write_summary()
+    if args.profile or args.profile_out:
+        instrumentation.print_profile(dump_path=args.profile_out)
+
+    if any(r["status"] != "ok" for r in report.values()):
+        sys.exit(1)
+    print("--- ✨ 同期完了 ---")
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,20 @@
 import os
-import requests
-from bs4 import BeautifulSoup
-from supabase import create_client
-import re
+import http_cache
+import http_client
+import instrumentation
+from data_cache import fetch_all
+from schedule_parser import parse_schedule
 
 # --- 設定 ---
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+def scrape_uver_schedule(supabase=None):
+    """公式サイトのスケジュールを calendar_events に追加し、新規件数を返す"""
+    if supabase is None:
+        from supabase import create_client
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-def scrape_uver_schedule():
     print("📅 UVERworld公式サイトから詳細スケジュールを同期中...")
     url = "https://www.uverworld.jp/schedule/list/"
     headers = {
@@ -18,76 +22,51 @@ def scrape_uver_schedule():
     }
     
     try:
-        res = requests.get(url, headers=headers, timeout=15)
+        with instrumentation.stage("schedule.fetch"):
+            res = http_client.get(url, headers=headers, timeout=15, cache=True)
+        # 前回取り込んだページと同じ内容なら解析も DB 照会もしない
+        if not res.changed:
+            print("♻️ スケジュールページは前回から変化なし")
+            return 0
         res.encoding = res.apparent_encoding
-        soup = BeautifulSoup(res.text, 'html.parser')
+        with instrumentation.stage("schedule.parse"):
+            parsed = parse_schedule(res.text)
 
-        # スケジュール項目を特定
-        items = soup.find_all(['li', 'dl'], class_=re.compile(r'schedule|list|item'))
-        if not items:
-            items = soup.find_all('li')
-
-        print(f"🔎 詳細解析中... 候補: {len(items)}件")
+        print(f"🔎 詳細解析中... 候補: {len(parsed)}件")
 
         count = 0
-        for item in items:
-            # 1. 日付の抽出 (202X.XX.XX)
-            text_full = item.get_text(" ", strip=True)
-            date_match = re.search(r'(\d{4})\.(\d{2})\.(\d{2})', text_full)
-            if not date_match:
-                continue
-            event_date = f"{date_match.group(1)}-{date_match.group(2)}-{date_match.group(3)}"
-
-            # 2. カテゴリーとタイトルの詳細抽出
-            # <a>タグの中にある具体的な情報を優先的に取得
-            link_el = item.find('a')
-            if link_el:
-                # <a>内の構造をさらに分解
-                # 多くの場合、span(カテゴリ) + p(タイトル) や テキストノード
-                raw_title = link_el.get_text(" ", strip=True)
-            else:
-                raw_title = text_full
-
-            # 3. カテゴリーの特定とクレンジング
-            category = "OTHER"
-            cat_text = "OTHER"
-            cat_match = re.search(r'(TOUR|LIVE|EVENT|RELEASE|TV|RADIO|MAGAZINE|GOODS|TICKET)', raw_title.upper())
-            
-            if cat_match:
-                cat_text = cat_match.group(1)
-                if cat_text in ["TOUR", "LIVE", "EVENT"]: category = "LIVE"
-                elif cat_text == "RELEASE": category = "RELEASE"
-                elif cat_text in ["TV", "RADIO", "MAGAZINE"]: category = "TV"
-            
-            # 4. タイトルの整形 (日付やカテゴリー、曜日などを削除)
-            clean_title = raw_title.replace(date_match.group(0), "")
-            # 曜日 [TUE] などを削除
-            clean_title = re.sub(r'\[.*?\]', '', clean_title)
-            # カテゴリー名 (TOUR等) を削除
-            if cat_text in clean_title.upper():
-                clean_title = re.sub(re.escape(cat_text), '', clean_title, flags=re.IGNORECASE)
-            
-            # 余分な空白や改行を掃除
-            clean_title = " ".join(clean_title.split()).strip()
+        # 同じ (日付, タイトル) はページ内で1件にまとめる
+        events = {(ev.event_date, ev.title): ev.to_row() for ev in parsed}
 
-            if not clean_title: clean_title = f"{cat_text} (詳細不明)"
+        # 5. 重複チェック（日付とタイトルで判定）
+        # ページ内の日付範囲の既存キーを1回で取得し、メモリ上で差分を取る
+        if events:
+            dates = [d for d, _ in events]
+            # 1回の応答は max-rows で打ち切られるため、範囲が広くてもページングで全件取得する
+            existing = fetch_all(lambda: supabase.table("calendar_events")
+                                 .select("event_date, title")
+                                 .gte("event_date", min(dates))
+                                 .lte("event_date", max(dates))
+                                 .order("event_date")
+                                 .order("title"))
+            existing_keys = {(str(r['event_date'])[:10], r['title']) for r in existing}
+            new_rows = [row for key, row in events.items() if key not in existing_keys]
 
-            # 5. 重複チェック（日付とタイトルで判定）
-            existing = supabase.table("calendar_events").select("*").eq("event_date", event_date).eq("title", clean_title).execute()
-            
-            if not existing.data:
-                supabase.table("calendar_events").insert({
-                    "event_date": event_date,
-                    "category": category,
-                    "title": clean_title,
-                    "description": f"Official Category: {cat_text}"
-                }).execute()
-                print(f"🆕 追加 [{category}]: {event_date} - {clean_title}")
-                count += 1
+            # (event_date, title) のユニーク制約で一括 upsert（同時実行でも重複しない）
+            if new_rows:
+                supabase.table("calendar_events") \
+                    .upsert(new_rows, on_conflict="event_date,title", ignore_duplicates=True) \
+                    .execute()
+            for row in new_rows:
+                print(f"🆕 追加 [{row['category']}]: {row['event_date']} - {row['title']}")
+            count = len(new_rows)
 
+        http_cache.mark_processed(res)
         print(f"\n✨ 同期完了！ 新規 {count} 件")
+        return count
 
     except Exception as e:
+        instrumentation.record_error("schedule", e)
         print(f"❌ エラー: {e}")
 
 if __name__ == "__main__":
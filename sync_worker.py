@@ -0,0 +1,279 @@
+import os
+import json
+import uuid
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import sync
+import instrumentation
+import write_buffer
+
+# --- 設定 ---
+# ダッシュボード (route.ts) からのみ呼ばれる想定なので既定はローカルのみで待ち受ける
+WORKER_HOST = os.getenv("SYNC_WORKER_HOST", "127.0.0.1")
+WORKER_PORT = int(os.getenv("SYNC_WORKER_PORT", "8765"))
+# 完了した実行を何件まで保持するか
+HISTORY_LIMIT = 50
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+# ==========================================
+# 実行の管理
+# ==========================================
+
+class SyncRun:
+    """
+    1回の同期リクエスト（複数ジョブ）の状態。
+    attached のジョブは別の実行が処理中のものにまとめ、状態はその実行から読む。
+    """
+
+    def __init__(self, names, attached=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.names = names
+        self.attached = attached or {}
+        self.own = [name for name in names if name not in self.attached]
+        self.status = "queued"
+        self.jobs = {name: {"status": "pending"} for name in self.own}
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        # ジョブのスレッドと状態確認のリクエストが同時に触るため
+        self._lock = threading.Lock()
+        self._finished = {name: threading.Event() for name in self.own}
+
+    def on_update(self, name, status, **fields):
+        with self._lock:
+            job = self.jobs[name]
+            job["status"] = status
+            job["started_at" if status == "running" else "finished_at"] = _now()
+            job.update(fields)
+        if status not in ("pending", "running"):
+            self._finished[name].set()
+
+    def wait(self, name):
+        """ジョブの完了を待って最終状態を返す（まとめたジョブは実行している側を待つ）"""
+        if name in self.attached:
+            return self.attached[name].wait(name)
+        self._finished[name].wait()
+        with self._lock:
+            return self.jobs[name]["status"]
+
+    def job(self, name):
+        if name in self.attached:
+            return {**self.attached[name].job(name), "run_id": self.attached[name].id}
+        with self._lock:
+            return dict(self.jobs[name])
+
+    def to_dict(self):
+        jobs = {name: self.job(name) for name in self.names}
+        done = sum(1 for j in jobs.values() if j["status"] not in ("pending", "running"))
+        return {
+            "id": self.id,
+            "status": self.status,
+            "jobs": jobs,
+            "progress": {"done": done, "total": len(jobs)},
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+class SyncWorker:
+    """同期ジョブを常駐プロセス内のスレッドで実行し、同じジョブの重複実行をまとめる"""
+
+    def __init__(self, max_jobs=sync.MAX_JOBS, history_limit=HISTORY_LIMIT):
+        self.max_jobs = max_jobs
+        self.history_limit = history_limit
+        self._runs = {}
+        # 実行中（待機中を含む）のジョブ名 → そのジョブを実行している SyncRun
+        self._inflight = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def submit(self, only=None, skip=None, export=False):
+        """
+        実行を受け付けて (SyncRun, 既存の実行にまとめたか) を返す。
+        ジョブごとに重複をまとめ、他の実行が処理中のジョブはそちらの完了を待ち、残りだけを新しく実行する。
+        要求したジョブが全て1つの実行に含まれていれば、新しく実行せずその実行を返す。
+        """
+        names = sync.select_jobs(only, skip, export)
+        if not names:
+            raise ValueError("実行するジョブがありません")
+
+        with self._lock:
+            attached = {name: self._inflight[name] for name in names if name in self._inflight}
+            runs = set(attached.values())
+            if len(attached) == len(names) and len(runs) == 1:
+                return runs.pop(), True
+            run = SyncRun(names, attached)
+            for name in run.own:
+                self._inflight[name] = run
+            self._runs[run.id] = run
+            self._trim()
+
+        threading.Thread(target=self._execute, args=(run,), name=f"sync-{run.id}", daemon=True).start()
+        return run, bool(attached)
+
+    def _on_update(self, run, name, status, **fields):
+        run.on_update(name, status, **fields)
+        if status not in ("pending", "running"):
+            self._release(run, [name])
+
+    def _release(self, run, names):
+        with self._lock:
+            for name in names:
+                if self._inflight.get(name) is run:
+                    del self._inflight[name]
+
+    def _skip_blocked(self, run):
+        """
+        まとめた先のジョブに依存するジョブは、その完了を待ってから実行する。
+        待った先が失敗していれば（run_graph と同様に）依存するジョブをスキップし、スキップしたジョブ名を返す。
+        """
+        skipped = set()
+        for name in run.own:
+            deps = sync.JOBS[name][3]
+            failed = [d for d in deps if d in skipped or (d in run.attached and run.wait(d) != "ok")]
+            if failed:
+                print(f"⏭️ {name}: 依存ジョブ {', '.join(failed)} が失敗したためスキップ")
+                self._on_update(run, name, "skipped")
+                skipped.add(name)
+        return skipped
+
+    def _execute(self, run):
+        with self._lock:
+            # 計測の集計は実行が無い間に区切る（並行する実行の途中では消さない）
+            if self._active == 0:
+                instrumentation.reset()
+            self._active += 1
+        run.status = "running"
+        run.started_at = _now()
+        try:
+            # sync.py と同じく、前回までに送れなかった行を先に送る（送れた分は集計まで反映される）
+            write_buffer.replay(sync.get_client())
+            skipped = self._skip_blocked(run)
+            on_update = lambda name, status, **fields: self._on_update(run, name, status, **fields)
+            report = sync.run_graph([n for n in run.own if n not in skipped], self.max_jobs, on_update=on_update)
+            for name, r in report.items():
+                run.on_update(name, r["status"], result=r["result"],
+                              import_sec=round(r["import_sec"], 3), run_sec=round(r["run_sec"], 3))
+            statuses = [run.wait(name) for name in run.names]
+            run.status = "done" if all(status == "ok" for status in statuses) else "failed"
+        except Exception as e:
+            run.status = "failed"
+            run.error = repr(e)
+            # 待っている他の実行が止まらないよう、終わっていないジョブを失敗にする
+            for name in run.own:
+                if run.job(name)["status"] in ("pending", "running"):
+                    run.on_update(name, "failed")
+        finally:
+            self._release(run, run.own)
+            run.finished_at = _now()
+            with self._lock:
+                self._active -= 1
+                if self._active == 0:
+                    instrumentation.write_summary()
+                    instrumentation.reset()
+
+    def _trim(self):
+        """完了した古い実行から削除する（実行中のものは残す）"""
+        finished = [r for r in self._runs.values() if r.status not in ("queued", "running")]
+        for run in finished[:max(0, len(self._runs) - self.history_limit)]:
+            del self._runs[run.id]
+
+    def get(self, run_id):
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def list(self):
+        with self._lock:
+            return [run.to_dict() for run in reversed(list(self._runs.values()))]
+
+# ==========================================
+# HTTP インターフェース
+# ==========================================
+# POST /jobs        {"only": [...], "skip": [...], "export": bool} → 202 {"id", "collapsed", ...}
+# GET  /jobs        実行履歴（新しい順）
+# GET  /jobs/<id>   状態と進捗
+# GET  /health      死活確認
+# collapsed は要求したジョブの一部でも他の実行にまとめた場合に true（jobs の run_id がまとめた先）
+
+def make_handler(worker):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path == "/health":
+                return self._send(200, {"status": "ok"})
+            if path == "/jobs":
+                return self._send(200, {"runs": worker.list()})
+            if path.startswith("/jobs/"):
+                run = worker.get(path[len("/jobs/"):])
+                if run is None:
+                    return self._send(404, {"error": "not found"})
+                return self._send(200, run.to_dict())
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/jobs":
+                return self._send(404, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                run, collapsed = worker.submit(body.get("only"), body.get("skip"), bool(body.get("export")))
+            except (ValueError, TypeError) as e:
+                return self._send(400, {"error": str(e)})
+            self._send(202, {**run.to_dict(), "collapsed": collapsed})
+
+        def log_message(self, format, *args):
+            # ステータス確認のポーリングでログが埋まらないよう POST のみ出力する
+            if self.command == "POST":
+                super().log_message(format, *args)
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="同期ジョブを受け付ける常駐ワーカー")
+    parser.add_argument('--host', default=WORKER_HOST)
+    parser.add_argument('--port', type=int, default=WORKER_PORT)
+    parser.add_argument('--max-jobs', type=int, default=sync.MAX_JOBS, help='同時に実行するジョブ数')
+    parser.add_argument('--metrics', help='計測イベントを JSON Lines で追記するファイル（環境変数 METRICS_FILE でも可）')
+    parser.add_argument('--preload', action='store_true', help='起動時に全ジョブのモジュールと Supabase クライアントを読み込む')
+    args = parser.parse_args()
+
+    if not sync.SUPABASE_URL or not sync.SUPABASE_KEY:
+        print("❌ SUPABASE設定ミス")
+        return
+
+    instrumentation.configure(args.metrics)
+    if args.preload:
+        import importlib
+        for module_name, _, _, _ in sync.JOBS.values():
+            importlib.import_module(module_name)
+        sync.get_client()
+        print("📦 ジョブのモジュールを読み込みました")
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(SyncWorker(args.max_jobs)))
+    print(f"--- 🛰️ 同期ワーカー起動: http://{args.host}:{args.port} ---")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print("--- 👋 同期ワーカー停止 ---")
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,48 @@
 import { NextResponse } from 'next/server';
-import { exec } from 'child_process';
-import { promisify } from 'util';
 
-const execPromise = promisify(exec);
+// 常駐の同期ワーカー（python sync_worker.py）の接続先
+const SYNC_WORKER_URL = process.env.SYNC_WORKER_URL || 'http://127.0.0.1:8765';
 
+// sync.py のジョブ名（実行を許可するものに限定：セキュリティ対策）
+const allowedJobs = ['sns_official', 'sns_takuya', 'catalog', 'youtube', 'schedule', 'poll', 'export', 'survey'];
+// 旧来のスクリプト名での呼び出しは対応するジョブに読み替える
+const legacyScripts: Record<string, string[]> = {
+  'uver_to_supabase.py': ['catalog', 'youtube'],
+  'sns_to_supabase.py': ['sns_official'],
+  'sync_all_data.py': ['schedule'],
+};
+
+async function callWorker(path: string, init?: RequestInit) {
+  try {
+    const res = await fetch(`${SYNC_WORKER_URL}${path}`, { ...init, cache: 'no-store' });
+    return NextResponse.json(await res.json(), { status: res.status });
+  } catch (error: any) {
+    console.error(`Sync worker error: ${error.message}`);
+    return NextResponse.json({ error: 'Sync worker is not running' }, { status: 503 });
+  }
+}
+
+// 同期を受け付けて即座にジョブ ID を返す（実行中の同じジョブがあればその ID）
 export async function POST(request: Request) {
-  const { script } = await request.json();
+  const { script, jobs } = await request.json();
 
-  // 実行を許可するスクリプトを制限（セキュリティ対策）
-  const allowedScripts = ['uver_to_supabase.py', 'sns_to_supabase.py', 'sync_all_data.py'];
-  
-  if (!allowedScripts.includes(script)) {
-    return NextResponse.json({ error: 'Invalid script' }, { status: 400 });
+  const requested: string[] = jobs ? (Array.isArray(jobs) ? jobs : [jobs]) : legacyScripts[script] ?? [];
+  if (requested.length === 0 || !requested.every(job => allowedJobs.includes(job))) {
+    return NextResponse.json({ error: 'Invalid job' }, { status: 400 });
   }
 
-  try {
-    // Pythonスクリプトを実行。パスは環境に合わせて調整してください
-    // 例: python3 scripts/uver_to_supabase.py
-    const { stdout, stderr } = await execPromise(`python3 ${script}`);
-    
-    if (stderr) {
-      console.error(`Script stderr: ${stderr}`);
-    }
+  return callWorker('/jobs', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ only: requested }),
+  });
+}
 
-    return NextResponse.json({ message: `${script} executed successfully`, output: stdout });
-  } catch (error: any) {
-    console.error(`Execution error: ${error.message}`);
-    return NextResponse.json({ error: error.message }, { status: 500 });
+// GET /api/sync?id=<ジョブID> で状態と進捗、id なしで実行履歴を返す
+export async function GET(request: Request) {
+  const id = new URL(request.url).searchParams.get('id');
+  if (id !== null && !/^[0-9a-f]+$/.test(id)) {
+    return NextResponse.json({ error: 'Invalid id' }, { status: 400 });
   }
-}
\ No newline at end of file
+  return callWorker(id ? `/jobs/${id}` : '/jobs');
+}
@@ -99,7 +99,10 @@ export default function SnsStats() {
     const count = parseInt(inputValues[platform]);
     if (isNaN(count)) return alert("数値を入力してください");
     setSaveStatus({ ...saveStatus, [platform]: "SAVING..." });
-    const { error } = await supabase.from("sns_stats").insert([{ platform, follower_count: count }]);
+    // 同じ日の入力は (platform, snapshot_date) の一意制約で上書きする
+    const { error } = await supabase
+      .from("sns_stats")
+      .upsert([{ platform, follower_count: count, created_at: new Date().toISOString() }], { onConflict: "platform,snapshot_date" });
     if (error) {
       setSaveStatus({ ...saveStatus, [platform]: "ERR" });
     } else {
@@ -47,9 +47,153 @@ const normalizeDate = (dateStr: string) => {
   return `${y}-${m}-${d}`;
 };
 
+const AGE_GROUP_ORDER = ["10代", "20代", "30代", "40代", "50代", "60代以上"];
+const AGGREGATE_PAGE_SIZE = 1000;
+const RAW_LIST_LIMIT = 5000;
+
+/**
+ * 回答1件の内容の SHA-256（会場タイプ・曲名・回数・都道府県・年齢・性別を U+001F で連結）。
+ * import_survey.py の row_hashes・sql/008 と同じ規則なので、変更する場合は揃えること。
+ */
+const HASH_COLUMNS = ["venue_type", "request_song", "visits", "prefecture", "age", "gender"];
+const rowHash = async (row: any): Promise<string> => {
+  const text = HASH_COLUMNS.map(key => row[key] ?? "").join("\u001f");
+  const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(text));
+  return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, "0")).join("");
+};
+
+/**
+ * CSV 1行を回答に整形する。欠損値の埋め方は import_survey.py の normalize_survey と同じ
+ * （row_hash が一致するよう、どちらかを変える場合は揃えること）。
+ * 回数は最初の数字だけを残して「回」を付け（無ければ 1回）、年齢は数字から年代にする（60 以上は 60代以上）。
+ */
+const MISSING = "未回答";
+const cellValue = (value: any): string | null =>
+  value === undefined || value === null || value === "" ? null : String(value);
+const ageDisplay = (value: string | null): string => {
+  const digits = value?.match(/\p{Nd}+/u);
+  if (!digits) return MISSING;
+  const age = Number(digits[0].normalize("NFKC"));
+  return age >= 60 ? "60代以上" : `${Math.floor(age / 10) * 10}代`;
+};
+const toResponse = (row: any[]) => {
+  const rawSong = row[0];
+  const song = typeof rawSong === 'number' && rawSong > 0 && rawSong < 1
+    ? (rawSong * 100).toFixed(0) + "%"
+    : cellValue(rawSong)?.trim() ?? MISSING;
+  const visits = cellValue(row[1])?.match(/\p{Nd}+/u)?.[0] ?? "1";
+  return {
+    request_song: song,
+    visits:       `${visits}回`,
+    prefecture:   cellValue(row[2]) ?? MISSING,
+    age:          ageDisplay(cellValue(row[3])),
+    gender:       cellValue(row[4]) ?? MISSING,
+  };
+};
+
+/**
+ * 既存行（id, row_hash）と新しい行を row_hash の多重集合として比べ、
+ * 削除する id と追加する行を返す（同じ内容の回答は件数の差だけ）。
+ */
+const diffRows = (existing: { id: number; row_hash: string | null }[], rows: any[]) => {
+  const pool = new Map<string | null, number[]>();
+  existing.forEach(({ id, row_hash }) => {
+    pool.set(row_hash, [...(pool.get(row_hash) || []), id]);
+  });
+  const insert = rows.filter(row => {
+    const ids = pool.get(row.row_hash);
+    if (!ids || ids.length === 0) return true;
+    ids.pop();
+    return false;
+  });
+  const deleteIds = Array.from(pool.values()).flat();
+  return { deleteIds, insert };
+};
+
+/**
+ * 回答1件の値を集計用の値に変換する（曲名は複数曲に分割）。
+ * survey_aggregate.py と同じルールなので、変更する場合は両方を揃えること。
+ * ただし Python 側は曲名を song_normalizer のカタログで正式名に揃えるため、
+ * ここで取り込んだ分は取り込み後に同期ジョブ survey（survey_aggregate.normalize_pending）が
+ * request_songs を埋めて集計を作り直す。
+ */
+const extractValues = (dimension: string, value: any): string[] => {
+  const rawVal = value ? String(value).trim() : "未回答";
+
+  if (dimension === 'song') {
+    if (rawVal === "未回答") return [];
+    // --- 1. 区切り文字を含む曲名を一時的に置換して保護 ---
+    const processedVal = rawVal
+      .replace(/99\/100騙しの哲/g, "TEMP_TETSU")
+      .replace(/ナノ・セカンド/g, "TEMP_NANO")
+      .replace(/アイ・アムRiri/g, "TEMP_RIRI");
+
+    // --- 2. 区切り文字で分割（①②… の番号付きの列挙も区切りとして扱う。song_normalizer と同じ） ---
+    return processedVal.split(/[/,、&／＆・\n①-⑳]+/).map(song => {
+      // --- 3. 置換していた文字列を元の名前に戻す ---
+      let cleanSong = song
+        .replace(/TEMP_TETSU/g, "99/100騙しの哲")
+        .replace(/TEMP_NANO/g, "ナノ・セカンド")
+        .replace(/TEMP_RIRI/g, "アイ・アムRiri")
+        .replace(/[（(].*?[）)]/g, '') // 補足を削除
+        .replace(/！/g, '!') // 全角感嘆符を半角に
+        .trim();
+
+      // --- 4. 表記ゆれの統一 ---
+      if (["ハイ、問題作！", "ハイ、問題作!", "ハイ問題作", "ハイ!問題作"].includes(cleanSong)) cleanSong = "ハイ!問題作";
+      if (["oxymoron"].includes(cleanSong)) cleanSong = "OXYMORON";
+      return cleanSong;
+    }).filter(Boolean);
+  }
+
+  if (dimension === 'visits') {
+    if (rawVal === "未回答") return [];
+    const numMatch = rawVal.match(/\d+/);
+    const numValue = numMatch ? parseInt(numMatch[0]) : 0;
+    return numValue > 0 ? [`${numValue}回`] : [];
+  }
+
+  if (dimension === 'age') {
+    const numMatch = rawVal.match(/\d+/);
+    if (!numMatch) return [];
+    const val = parseInt(numMatch[0]);
+    if (val < 10) return [];
+    return [val >= 60 ? "60代以上" : `${Math.floor(val / 10) * 10}代`];
+  }
+
+  return (rawVal !== "回" && rawVal !== "未回答" && rawVal !== "") ? [rawVal] : [];
+};
+
+/**
+ * 取り込んだライブ1件分の回答から survey_aggregates の行を作る
+ */
+const buildAggregateRows = (rows: any[], refreshedAt: string) => {
+  if (rows.length === 0) return [];
+  const base = {
+    event_year: String(rows[0].event_year),
+    venue_type: rows[0].venue_type ?? "",
+    live_name: rows[0].live_name,
+    live_date: normalizeDate(rows[0].created_at),
+    refreshed_at: refreshedAt,
+  };
+  const result: any[] = [{ ...base, dimension: 'total', value: '', count: rows.length }];
+  ANALYSIS_TARGETS.filter(t => t.key).forEach(target => {
+    const counts: { [key: string]: number } = {};
+    rows.forEach(row => {
+      extractValues(target.id, row[target.key]).forEach(v => { counts[v] = (counts[v] || 0) + 1; });
+    });
+    Object.entries(counts).forEach(([value, count]) => result.push({ ...base, dimension: target.id, value, count }));
+  });
+  return result;
+};
+
 export default function SurveyTable() {
   const [view, setView] = useState<'analytics' | 'import'>('analytics');
-  const [tableData, setTableData] = useState<any[]>([]);
+  // survey_aggregates（ライブ × 項目 × 値 の件数）
+  const [aggRows, setAggRows] = useState<any[]>([]);
+  // Raw Data タブを開いたときだけ取得する生データ
+  const [rawRows, setRawRows] = useState<any[]>([]);
+  const [rawLoading, setRawLoading] = useState(false);
   const [liveEvents, setLiveEvents] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
   const [uploading, setUploading] = useState(false);
@@ -73,15 +217,24 @@ export default function SurveyTable() {
   const fetchSurveyData = useCallback(async () => {
     setLoading(true);
     try {
-      let query = supabase.from("survey_responses").select("*");
-      if (anaYear !== "All") {
-        query = query.eq("event_year", anaYear);
+      // 集計済みの行だけを取得する（生データは数万行になるため取得しない）
+      const rows: any[] = [];
+      for (let from = 0; ; from += AGGREGATE_PAGE_SIZE) {
+        let query = supabase.from("survey_aggregates")
+          .select("event_year, venue_type, live_name, live_date, dimension, value, count");
+        if (anaYear !== "All") {
+          query = query.eq("event_year", anaYear);
+        }
+        const { data, error } = await query
+          .order('live_date', { ascending: false })
+          .order('dimension')
+          .order('value')
+          .range(from, from + AGGREGATE_PAGE_SIZE - 1);
+        if (error) { console.error("Fetch Error:", error); break; }
+        rows.push(...(data || []));
+        if (!data || data.length < AGGREGATE_PAGE_SIZE) break;
       }
-      const { data: responses, error } = await query
-        .order('created_at', { ascending: false })
-        .limit(50000); 
-      if (error) console.error("Fetch Error:", error);
-      setTableData(responses || []);
+      setAggRows(rows);
     } catch (err) { console.error(err); } finally { setLoading(false); }
   }, [anaYear]);
 
@@ -106,26 +259,26 @@ export default function SurveyTable() {
     };
   }, [activeTab]);
 
+  // ライブごとの回答件数の行（dimension = total）
+  const liveTotals = useMemo(() => aggRows.filter(d => d.dimension === 'total'), [aggRows]);
+
   const registeredSet = useMemo(() => {
-    return new Set(tableData.map(d => {
-      const datePart = normalizeDate(d.created_at);
-      return `${datePart}_${d.live_name}`;
-    }));
-  }, [tableData]);
+    return new Set(liveTotals.map(d => `${normalizeDate(d.live_date)}_${d.live_name}`));
+  }, [liveTotals]);
 
   const registeredLiveOptions = useMemo(() => {
     const map = new Map();
-    tableData.forEach(d => {
+    liveTotals.forEach(d => {
       const matchY = anaYear === "All" || String(d.event_year) === anaYear;
       const matchT = anaType === "All" || d.venue_type === anaType;
       if (matchY && matchT) {
-        const datePart = normalizeDate(d.created_at || "Unknown");
+        const datePart = normalizeDate(d.live_date || "Unknown");
         const key = `${datePart}_${d.live_name}`;
         if (!map.has(key)) map.set(key, { key, date: datePart, name: d.live_name });
       }
     });
     return Array.from(map.values()).sort((a, b) => b.date.localeCompare(a.date));
-  }, [tableData, anaYear, anaType]);
+  }, [liveTotals, anaYear, anaType]);
 
   const processFile = async (file: File) => {
     if (!selectedLiveForImport || !selectedTypeForImport) {
@@ -156,46 +309,73 @@ export default function SurveyTable() {
 
         const currentEventYear = targetDate.split('-')[0];
         const formattedData = rows.slice(1).map((row) => {
-          if (!row[0] && !row[1]) return null;
-          
-          if (String(row[0]).includes("項目")) return null;
-
-          let rawSong = row[0];
-          let songDisplay = "";
-          if (typeof rawSong === 'number' && rawSong > 0 && rawSong < 1) {
-             songDisplay = (rawSong * 100).toFixed(0) + "%";
-          } else {
-             songDisplay = String(rawSong || "").trim();
-          }
-
-          const rawVisits = String(row[1] || "").trim();
-          const visitsDisplay = rawVisits.includes("回") ? rawVisits : `${rawVisits}回`;
-          const rawAge = String(row[3] || "").trim();
-          const ageDisplay = rawAge.includes("代") ? rawAge : `${rawAge}代`;
+          // 空行と途中に入った見出し行は除く（import_survey.py と同じ）
+          if (!row.slice(0, 5).some(value => cellValue(value) !== null)) return null;
+          if (String(row[0] ?? "").includes("項目")) return null;
 
           return {
-            request_song: songDisplay,
-            visits:       visitsDisplay,
-            prefecture:   String(row[2] || "").trim(),
-            age:          ageDisplay,
-            gender:       String(row[4] || "").trim(),
+            ...toResponse(row),
             live_name:    selectedLiveForImport.title,
             venue_type:   selectedTypeForImport,
             event_year:   currentEventYear,
             created_at:   new Date(`${targetDate}T09:00:00Z`).toISOString(), 
           };
-        }).filter(Boolean);
-
-        await supabase.from("survey_responses")
+        }).filter(Boolean) as any[];
+        await Promise.all(formattedData.map(async row => { row.row_hash = await rowHash(row); }));
+
+        // 既存行との差分だけを1トランザクションで適用する（途中で失敗しても既存データは残る）
+        const existing: { id: number; row_hash: string | null }[] = [];
+        for (let from = 0; ; from += AGGREGATE_PAGE_SIZE) {
+          const { data, error } = await supabase.from("survey_responses")
+            .select("id, row_hash")
+            .eq("live_name", selectedLiveForImport.title)
+            .eq("event_year", currentEventYear)
+            .filter("created_at", "gte", `${targetDate}T00:00:00Z`)
+            .filter("created_at", "lte", `${targetDate}T23:59:59Z`)
+            .order("id")
+            .range(from, from + AGGREGATE_PAGE_SIZE - 1);
+          if (error) throw error;
+          existing.push(...(data || []));
+          if (!data || data.length < AGGREGATE_PAGE_SIZE) break;
+        }
+        const { deleteIds, insert } = diffRows(existing, formattedData);
+        if (deleteIds.length === 0 && insert.length === 0) {
+          alert(`変更なし: ${formattedData.length}件は登録済みの内容と同じです`);
+          return;
+        }
+        const { error: diffError } = await supabase.rpc("apply_survey_diff", {
+          p_live_name: selectedLiveForImport.title,
+          p_event_year: currentEventYear,
+          p_live_date: targetDate,
+          p_expected_count: existing.length,
+          p_delete_ids: deleteIds,
+          p_insert: insert,
+        });
+        if (diffError) throw diffError;
+
+        // このライブ分のクロス集計を置き換える（upsert 後に古い行を削除）
+        const refreshedAt = new Date().toISOString();
+        const aggregateRows = buildAggregateRows(formattedData, refreshedAt);
+        const { error: aggError } = await supabase.from("survey_aggregates")
+          .upsert(aggregateRows, { onConflict: "event_year,venue_type,live_name,live_date,dimension,value" });
+        if (aggError) throw aggError;
+        await supabase.from("survey_aggregates")
           .delete()
+          .eq("event_year", currentEventYear)
           .eq("live_name", selectedLiveForImport.title)
-          .filter("created_at", "gte", `${targetDate}T00:00:00Z`)
-          .filter("created_at", "lte", `${targetDate}T23:59:59Z`);
-
-        const { error: insError } = await supabase.from("survey_responses").insert(formattedData);
-        if (insError) throw insError;
+          .eq("live_date", targetDate)
+          .lt("refreshed_at", refreshedAt);
         
-        alert(`成功: ${formattedData.length}件登録しました`);
+        // 曲名の正規化（song_normalizer）と集計の作り直しは同期ワーカーの survey ジョブに任せる。
+        // ワーカーが止まっていても取り込みは完了しており、次回の定期同期で揃う
+        const syncRes = await fetch('/api/sync', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ jobs: ['survey'] }),
+        }).catch(() => null);
+        if (!syncRes?.ok) console.warn("survey ジョブを開始できませんでした（次回の定期同期で反映されます）");
+
+        alert(`成功: ${formattedData.length}件登録しました（追加 ${insert.length}件 / 削除 ${deleteIds.length}件）`);
         await fetchSurveyData();
         setView('analytics');
       } catch (err: any) { 
@@ -216,92 +396,63 @@ export default function SurveyTable() {
     if (files && files.length > 0) processFile(files[0]);
   };
 
-  const filteredData = useMemo(() => {
-    return tableData.filter(d => {
-      const datePart = normalizeDate(d.created_at);
-      const currentKey = `${datePart}_${d.live_name}`;
+  const filteredAgg = useMemo(() => {
+    return aggRows.filter(d => {
+      const currentKey = `${normalizeDate(d.live_date)}_${d.live_name}`;
       const matchY = anaYear === "All" || String(d.event_year) === anaYear;
       const matchT = anaType === "All" || d.venue_type === anaType;
       const matchL = anaLiveKey === "All" || currentKey === anaLiveKey;
       return matchY && matchT && matchL;
     });
-  }, [tableData, anaYear, anaType, anaLiveKey]);
+  }, [aggRows, anaYear, anaType, anaLiveKey]);
+
+  const totalResponses = useMemo(() => {
+    return filteredAgg.filter(d => d.dimension === 'total').reduce((acc, d) => acc + d.count, 0);
+  }, [filteredAgg]);
 
   const chartData = useMemo(() => {
     const target = ANALYSIS_TARGETS.find(t => t.id === activeTab);
-    const key = target?.key;
-    if (!key || filteredData.length === 0) return [];
+    if (!target?.key || filteredAgg.length === 0) return [];
     const counts: { [key: string]: number } = {};
-    
-    filteredData.forEach(item => {
-      let rawVal = item[key] ? String(item[key]).trim() : "未回答";
-      
-      if (activeTab === 'song' && rawVal !== "未回答") {
-        // --- 1. 区切り文字を含む曲名を一時的に置換して保護 ---
-        let processedVal = rawVal
-          .replace(/99\/100騙しの哲/g, "TEMP_TETSU")
-          .replace(/ナノ・セカンド/g, "TEMP_NANO")
-          .replace(/アイ・アムRiri/g, "TEMP_RIRI");
-
-        // --- 2. 区切り文字で分割 ---
-        const splitSongs = processedVal.split(/[/,、&／＆・\n]+/);
-        
-        splitSongs.forEach(song => {
-          // --- 3. 置換していた文字列を元の名前に戻す ---
-          let cleanSong = song
-            .replace(/TEMP_TETSU/g, "99/100騙しの哲")
-            .replace(/TEMP_NANO/g, "ナノ・セカンド")
-            .replace(/TEMP_RIRI/g, "アイ・アムRiri")
-            .replace(/[（(].*?[）)]/g, '') // 補足を削除
-            .replace(/[①②③④⑤⑥⑦⑧⑨⑩]/g, '') // 数字を削除
-            .replace(/！/g, '!') // 全角感嘆符を半角に
-            .trim();
-
-          // --- 4. 表記ゆれの統一 ---
-          if (["ハイ、問題作！", "ハイ、問題作!", "ハイ問題作", "ハイ!問題作"].includes(cleanSong)) cleanSong = "ハイ!問題作";
-          if (["oxymoron"].includes(cleanSong)) cleanSong = "OXYMORON";
-          
-          if (cleanSong) {
-            counts[cleanSong] = (counts[cleanSong] || 0) + 1;
-          }
-        });
-      } else if (activeTab === 'visits' && rawVal !== "未回答") {
-        const numMatch = rawVal.match(/\d+/);
-        if (numMatch) {
-          const numValue = parseInt(numMatch[0]);
-          if (numValue > 0) {
-            const formatted = `${numValue}回`;
-            counts[formatted] = (counts[formatted] || 0) + 1;
-          }
-        }
-      } else if (rawVal !== "回" && rawVal !== "未回答" && rawVal !== "") {
-        counts[rawVal] = (counts[rawVal] || 0) + 1;
-      }
+    filteredAgg.forEach(d => {
+      if (d.dimension === activeTab) counts[d.value] = (counts[d.value] || 0) + d.count;
     });
 
     return Object.entries(counts).map(([name, value]) => ({ name, value }))
       .sort((a, b) => activeTab === 'visits' ? (parseInt(a.name) || 0) - (parseInt(b.name) || 0) : b.value - a.value);
-  }, [filteredData, activeTab]);
+  }, [filteredAgg, activeTab]);
 
   const ageGroupData = useMemo(() => {
     if (activeTab !== 'age') return [];
-    const groupOrder = ["10代", "20代", "30代", "40代", "50代", "60代以上"];
-    const groups: { [key: string]: number } = { "10代": 0, "20代": 0, "30代": 0, "40代": 0, "50代": 0, "60代以上": 0 };
-    filteredData.forEach(item => {
-      const rawAge = String(item.age || "").trim();
-      const numMatch = rawAge.match(/\d+/);
-      if (numMatch) {
-        const val = parseInt(numMatch[0]);
-        if (val >= 10 && val < 20) groups["10代"]++;
-        else if (val >= 20 && val < 30) groups["20代"]++;
-        else if (val >= 30 && val < 40) groups["30代"]++;
-        else if (val >= 40 && val < 50) groups["40代"]++;
-        else if (val >= 50 && val < 60) groups["50代"]++;
-        else if (val >= 60 || val > 1900) groups["60代以上"]++;
+    const groups = new Map<string, number>(chartData.map(d => [d.name, d.value] as [string, number]));
+    return AGE_GROUP_ORDER.map(name => ({ name, value: groups.get(name) || 0 })).filter(item => item.value > 0);
+  }, [chartData, activeTab]);
+
+  // Raw Data タブを開いたときだけ、絞り込み条件に合う生データを取得する
+  useEffect(() => {
+    if (activeTab !== 'list') return;
+    let cancelled = false;
+    const fetchRawRows = async () => {
+      setRawLoading(true);
+      let query = supabase.from("survey_responses")
+        .select("created_at, live_name, request_song, visits, prefecture, age, gender");
+      if (anaYear !== "All") query = query.eq("event_year", anaYear);
+      if (anaType !== "All") query = query.eq("venue_type", anaType);
+      if (anaLiveKey !== "All") {
+        const live = registeredLiveOptions.find(opt => opt.key === anaLiveKey);
+        if (live) {
+          query = query.eq("live_name", live.name)
+            .filter("created_at", "gte", `${live.date}T00:00:00Z`)
+            .filter("created_at", "lte", `${live.date}T23:59:59Z`);
+        }
       }
-    });
-    return groupOrder.map(name => ({ name, value: groups[name] })).filter(item => item.value > 0);
-  }, [filteredData, activeTab]);
+      const { data, error } = await query.order('created_at', { ascending: false }).limit(RAW_LIST_LIMIT);
+      if (error) console.error("Fetch Error:", error);
+      if (!cancelled) { setRawRows(data || []); setRawLoading(false); }
+    };
+    fetchRawRows();
+    return () => { cancelled = true; };
+  }, [activeTab, anaYear, anaType, anaLiveKey, registeredLiveOptions]);
 
   const totalValue = useMemo(() => (activeTab === 'age' ? ageGroupData : chartData).reduce((acc, curr) => acc + curr.value, 0), [chartData, ageGroupData, activeTab]);
 
@@ -465,7 +616,7 @@ export default function SurveyTable() {
               </div>
               <div className="flex flex-col gap-2"><span className="text-zinc-600 font-black text-[8px] uppercase">3. Registered Live</span>
                 <select value={anaLiveKey} onChange={(e) => setAnaLiveKey(e.target.value)} className="bg-zinc-900 border border-zinc-800 p-3 rounded-xl font-bold font-mono text-white outline-none">
-                  <option value="All">All Matches ({filteredData.length} 件)</option>
+                  <option value="All">All Matches ({totalResponses} 件)</option>
                   {registeredLiveOptions.map(opt => <option key={opt.key} value={opt.key}>{opt.date} | {opt.name}</option>)}
                 </select>
               </div>
@@ -477,7 +628,7 @@ export default function SurveyTable() {
               ))}
             </nav>
 
-            {filteredData.length === 0 ? (
+            {totalResponses === 0 ? (
               <div className="h-64 flex flex-col items-center justify-center bg-zinc-950 rounded-[40px] border border-zinc-900 text-zinc-700 font-black tracking-widest uppercase">NO DATA</div>
             ) : activeTab === 'song' ? (
               <div className="bg-zinc-950 p-8 rounded-[40px] border border-zinc-800">
@@ -500,7 +651,10 @@ export default function SurveyTable() {
                     <tr><th className="p-4">Date</th><th className="p-4">Live</th><th className="p-4">Song</th><th className="p-4">Visits</th><th className="p-4">Region</th><th className="p-4">Age</th><th className="p-4">Gender</th></tr>
                   </thead>
                   <tbody className="text-[9px]">
-                    {filteredData.map((row, idx) => (
+                    {rawLoading && (
+                      <tr><td colSpan={7} className="p-4 text-zinc-600 font-mono uppercase tracking-widest">Loading...</td></tr>
+                    )}
+                    {!rawLoading && rawRows.map((row, idx) => (
                       <tr key={idx} className="border-b border-zinc-900">
                         <td className="p-4 text-zinc-600 font-mono">{normalizeDate(row.created_at)}</td>
                         <td className="p-4 text-zinc-500">{row.live_name}</td>
@@ -1,6 +1,11 @@
 import os
-import requests
-from supabase import create_client
+import http_cache
+import http_client
+import instrumentation
+import rollups
+import video_catalog
+import write_buffer
+import youtube_quota
 from datetime import datetime, timedelta, timezone
 
 # --- 1. 設定値の取得 ---
@@ -22,6 +27,7 @@ def check_config():
     return True
 
 # 曲名リスト (video_id: 表示名)
+# 動画カタログ (video_catalog.py) の初期データ。新曲はカタログが自動で追加するため、ここへの追記は不要
 SONG_LIST = {
     'ukyRC_fNEP0': "『THE OVER』", 
     'F4GAkjShwjE': "『Don't Think.Feel』", 
@@ -95,41 +101,136 @@ SONG_LIST = {
     'Ln5aFWmUE3k': "『EVER』(Lyric Video)",
 }
 
-def fetch_and_save():
+# videos API は1リクエストあたり最大50件のIDを受け付ける
+YOUTUBE_BATCH_SIZE = 50
+
+def chunked(items, size):
+    """リストを size 件ずつに分割する"""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _fetch_batch(batch, part="statistics"):
+    """1バッチ分を取得し、(items, 応答) を返す。変化が無い（304）ときはキャッシュの本文から items を作る"""
+    yt_url = "https://www.googleapis.com/youtube/v3/videos"
+    params = {"part": part, "id": ",".join(batch), "key": YOUTUBE_API_KEY}
+    try:
+        res = http_client.get(yt_url, params=params, cache=True)
+        return res.json().get('items', []), res
+    except Exception as e:
+        instrumentation.record_error("youtube.fetch_batch", e)
+        print(f"❌ バッチ取得エラー ({len(batch)}件): {e}")
+        return [], None
+
+def fetch_video_stats(video_ids, part="statistics"):
+    """
+    最大50件ずつまとめて videos API を並列に呼び出し、({video_id: item}, 変化なしの video_id, 応答) を返す。
+    前回保存した応答と同じバッチも items に含める（再生数が止まっていても毎日の行は保存する）。
+    タイトル・公開日はカタログにあるため、通常は statistics のみを取得する。
+    """
+    batches = list(chunked(video_ids, YOUTUBE_BATCH_SIZE))
+    results = http_client.run_parallel([lambda b=b: _fetch_batch(b, part) for b in batches])
+    items = {item['id']: item for batch_items, _ in results for item in batch_items}
+    unchanged = {vid for batch, (_, res) in zip(batches, results)
+                 if res is not None and not res.changed for vid in batch}
+    responses = [res for _, res in results if res is not None]
+    return items, unchanged, responses
+
+def fetch_and_save(supabase=None):
+    """カタログ（無ければ SONG_LIST）の動画の再生数を youtube_stats に保存し、保存件数を返す"""
     if not check_config():
         exit(1)
 
     print("--- 📺 YouTube動画統計データ取得開始 ---")
-    
-    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    
-    for video_id, song_name in SONG_LIST.items():
-        yt_url = f"https://www.googleapis.com/youtube/v3/videos?part=statistics,snippet&id={video_id}&key={YOUTUBE_API_KEY}"
+
+    if supabase is None:
+        from supabase import create_client
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+    # 取得間隔は poll_scheduler と共有する（poll_scheduler がこのモジュールを import するため、ここで読み込む）
+    import poll_scheduler
+
+    now = datetime.now(timezone.utc)
+    videos = video_catalog.tracked_videos(supabase)
+    try:
+        states = poll_scheduler.load_states(supabase)
+    except Exception as e:
+        instrumentation.record_error("youtube.load_poll_state", e)
+        states = {}
+    # poll_scheduler が今日すでに取得した動画は今日の行があるので取得しない
+    polled = poll_scheduler.polled_today(states, now)
+    if polled:
+        print(f"⏭️ 今日すでに取得済み: {len(polled)}件（poll_scheduler）")
+    videos = {vid: video for vid, video in videos.items() if vid not in polled}
+
+    # 公開日がカタログに揃っていなければ snippet も取得する（カタログ未作成時など）
+    part = "statistics" if all(v["published_at"] for v in videos.values()) else "statistics,snippet"
+    with instrumentation.stage("youtube.fetch"):
+        items, unchanged, responses = fetch_video_stats(videos.keys(), part)
+    if unchanged:
+        print(f"♻️ 前回から変化なし: {len(unchanged)}件（キャッシュの内容で今日の行を保存）")
+
+    rows, new_states = [], []
+    snapshot = write_buffer.snapshot_fields(now)
+    for video_id, video in videos.items():
+        song_name = video["title"]
+        item = items.get(video_id)
+        if not item:
+            print(f"⚠️ {song_name}: データが見つかりませんでした (ID: {video_id})")
+            continue
         try:
-            res = requests.get(yt_url).json()
-            
-            if 'items' in res and len(res['items']) > 0:
-                item = res['items'][0]
-                views = int(item['statistics']['viewCount'])
-                published_at_raw = item['snippet']['publishedAt'][:10]
-                
-                data = {
-                    "title": song_name,
-                    "views": views,
-                    "video_id": video_id,
-                    "published_at": published_at_raw  # 動画公開日を保持
-                }
-                
-                # 挿入実行
-                supabase.table("youtube_stats").insert(data).execute()
-                print(f"✅ {song_name}: {views:,} views (公開日: {published_at_raw})")
-            else:
-                print(f"⚠️ {song_name}: データが見つかりませんでした (ID: {video_id})")
-        
+            views = int(item['statistics']['viewCount'])
+            published_at_raw = str(video["published_at"] or item['snippet']['publishedAt'])[:10]
+            rows.append({
+                "title": song_name,
+                "views": views,
+                "video_id": video_id,
+                "published_at": published_at_raw,  # 動画公開日を保持
+                **snapshot,
+            })
+            new_states.append(poll_scheduler.next_state(video_id, views, states.get(video_id), published_at_raw, now))
+            print(f"✅ {song_name}: {views:,} views (公開日: {published_at_raw})")
         except Exception as e:
+            instrumentation.record_error("youtube.parse_item", e)
             print(f"❌ {song_name} 処理エラー: {e}")
 
+    # (video_id, 取得日) で一括 upsert（再実行しても同じ日の行は増えない。失敗時は次回再送）
+    if rows:
+        buffer = write_buffer.get_buffer()
+        try:
+            with instrumentation.stage("youtube.insert"):
+                buffer.add("youtube_stats", rows)
+                buffer.flush(supabase, ["youtube_stats"])
+            print(f"🚀 {len(rows)}件を一括保存しました")
+        except Exception as e:
+            instrumentation.record_error("youtube.insert", e)
+            print(f"❌ 一括保存エラー: {e}")
+            rows = []
+        # 次回の取得予定も更新し、poll_scheduler が同じ動画をすぐに取り直さないようにする。
+        # youtube_stats とは別に送り、こちらが失敗しても保存済みの行の集計は続ける（次回再送）
+        try:
+            buffer.add(poll_scheduler.STATE_TABLE, new_states)
+            buffer.flush(supabase, [poll_scheduler.STATE_TABLE])
+        except Exception as e:
+            instrumentation.record_error("youtube.poll_state", e)
+            print(f"⚠️ 取得予定の保存エラー（次回再送）: {e}")
+
+    # 最新値・日次集計テーブルを更新
+    if rows:
+        try:
+            with instrumentation.stage("youtube.rollups"):
+                rollups.update_rollups(supabase, "youtube", rows)
+            print("📈 集計テーブルを更新しました")
+            # 保存まで終えた応答は、次回同じ内容なら解析・保存を省く
+            for res in responses:
+                http_cache.mark_processed(res)
+        except Exception as e:
+            instrumentation.record_error("youtube.rollups", e)
+            print(f"❌ 集計テーブル更新エラー: {e}")
+
+    youtube_quota.flush(supabase)
     print("--- ✨ 全データの更新が完了しました ---")
+    return len(rows)
 
 if __name__ == "__main__":
     fetch_and_save()
\ No newline at end of file
@@ -0,0 +1,194 @@
+import os
+import re
+import argparse
+
+import http_cache
+import http_client
+import instrumentation
+import youtube_quota
+from data_cache import fetch_all
+
+# --- 設定 ---
+SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+SUPABASE_KEY = os.getenv("SUPABASE_KEY") or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
+CHANNEL_ID = os.getenv("YOUTUBE_CHANNEL_ID", "UCnziFQs4Ihms4UtxmVZP6cg")
+
+CATALOG_TABLE = "video_catalog"
+# playlistItems / videos API の1リクエストあたりの上限
+PAGE_SIZE = 50
+# 再生数を記録する動画: タイトルに『曲名』を含むもの（MV・Short ver.・Lyric Video など）
+TRACK_PATTERN = re.compile(r"『.+?』")
+# ただし告知・ダイジェスト類は除く
+EXCLUDE_PATTERN = re.compile(r"teaser|trailer|digest|spot|ダイジェスト|告知|予告", re.IGNORECASE)
+
+def uploads_playlist_id(channel_id=CHANNEL_ID):
+    """チャンネルの「アップロード動画」プレイリスト ID（UC... → UU...）"""
+    return "UU" + channel_id[2:]
+
+def display_title(raw_title):
+    """YouTube のタイトルから表示名を作る（先頭のアーティスト名を外す）"""
+    return re.sub(r"^\s*UVERworld\s*", "", raw_title).strip() or raw_title
+
+def is_tracked(raw_title):
+    return bool(TRACK_PATTERN.search(raw_title)) and not EXCLUDE_PATTERN.search(raw_title)
+
+# ==========================================
+# カタログの読み込み
+# ==========================================
+
+def load_catalog(supabase, tracked_only=False):
+    """カタログを {video_id: 行} で返す"""
+    def build_query():
+        query = supabase.table(CATALOG_TABLE).select("video_id, title, published_at, tracked, source")
+        if tracked_only:
+            query = query.eq("tracked", True)
+        return query.order("video_id")
+    return {row["video_id"]: row for row in fetch_all(build_query)}
+
+def tracked_videos(supabase):
+    """
+    再生数を記録する動画を {video_id: {"title", "published_at"}} で返す。
+    カタログが空・未作成なら SONG_LIST を返す（published_at は None）。
+    """
+    try:
+        catalog = load_catalog(supabase, tracked_only=True)
+    except Exception as e:
+        instrumentation.record_error("catalog.load", e)
+        print(f"⚠️ カタログを読み込めないため SONG_LIST を使います: {e}")
+        catalog = {}
+    if catalog:
+        return {vid: {"title": row["title"], "published_at": row["published_at"]} for vid, row in catalog.items()}
+    from uver_to_supabase import SONG_LIST
+    return {vid: {"title": title, "published_at": None} for vid, title in SONG_LIST.items()}
+
+# ==========================================
+# アップロード一覧の走査
+# ==========================================
+
+def _playlist_page(playlist_id, page_token=None):
+    """1ページ分を取得する。先頭ページはキャッシュを通し、前回から変化がなければ None を返す"""
+    url = "https://www.googleapis.com/youtube/v3/playlistItems"
+    params = {"part": "snippet,contentDetails", "playlistId": playlist_id,
+              "maxResults": PAGE_SIZE, "key": YOUTUBE_API_KEY}
+    if page_token:
+        params["pageToken"] = page_token
+    res = http_client.get(url, params=params, cache=page_token is None)
+    res.raise_for_status()
+    if not res.changed:
+        return None, res
+    return res.json(), res
+
+def discover(known, playlist_id=None):
+    """
+    アップロード一覧を新しい順にページングし、自動検出済み (source=playlist) の動画に
+    当たったところで止める。戻り値は (新しい動画の行, 先頭ページの応答)。
+    初回（自動検出済みが無い）は全ページを走査する。
+    """
+    playlist_id = playlist_id or uploads_playlist_id()
+    rows, first, page_token = [], None, None
+    while True:
+        page, res = _playlist_page(playlist_id, page_token)
+        first = first or res
+        if page is None:
+            print("♻️ アップロード一覧は前回から変化なし")
+            return rows, first
+        for item in page.get("items", []):
+            video_id = item["contentDetails"]["videoId"]
+            existing = known.get(video_id)
+            if existing and existing["source"] == "playlist":
+                return rows, first
+            raw_title = item["snippet"]["title"]
+            published = item["contentDetails"].get("videoPublishedAt") or item["snippet"].get("publishedAt")
+            rows.append({
+                "video_id": video_id,
+                # SONG_LIST から投入した動画は手で付けた表示名・対象設定を残す
+                "title": existing["title"] if existing else display_title(raw_title),
+                "raw_title": raw_title,
+                "published_at": published[:10] if published else None,
+                "tracked": existing["tracked"] if existing else is_tracked(raw_title),
+                "source": "playlist",
+            })
+        page_token = page.get("nextPageToken")
+        if not page_token:
+            return rows, first
+
+def fill_published_at(supabase, catalog):
+    """公開日が無い対象動画（別チャンネルの動画など）だけ snippet を1回取得して埋める"""
+    missing = [vid for vid, row in catalog.items() if row["tracked"] and not row["published_at"]]
+    if not missing:
+        return 0
+    url = "https://www.googleapis.com/youtube/v3/videos"
+    rows = []
+    for i in range(0, len(missing), PAGE_SIZE):
+        batch = missing[i:i + PAGE_SIZE]
+        res = http_client.get(url, params={"part": "snippet", "id": ",".join(batch), "key": YOUTUBE_API_KEY})
+        res.raise_for_status()
+        for item in res.json().get("items", []):
+            rows.append({**catalog[item["id"]], "published_at": item["snippet"]["publishedAt"][:10]})
+    if rows:
+        supabase.table(CATALOG_TABLE).upsert(rows, on_conflict="video_id").execute()
+    return len(rows)
+
+def seed(supabase):
+    """カタログが空なら SONG_LIST を投入する（表示名は SONG_LIST のものを使い続ける）"""
+    from uver_to_supabase import SONG_LIST
+    rows = [{"video_id": vid, "title": title, "tracked": True, "source": "seed"} for vid, title in SONG_LIST.items()]
+    supabase.table(CATALOG_TABLE).upsert(rows, on_conflict="video_id", ignore_duplicates=True).execute()
+    print(f"🌱 SONG_LIST から {len(rows)}件を投入しました")
+    return {row["video_id"]: {**row, "published_at": None} for row in rows}
+
+# ==========================================
+# メイン処理
+# ==========================================
+
+def refresh(supabase=None):
+    """アップロード一覧から新しい動画をカタログに追加し、追加件数を返す"""
+    if supabase is None:
+        from supabase import create_client
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+
+    print("--- 📚 動画カタログ更新 ---")
+    try:
+        with instrumentation.stage("catalog.load"):
+            known = load_catalog(supabase) or seed(supabase)
+        with instrumentation.stage("catalog.discover"):
+            rows, first = discover(known)
+        new = [row for row in rows if row["video_id"] not in known]
+        if rows:
+            with instrumentation.stage("catalog.upsert"):
+                supabase.table(CATALOG_TABLE).upsert(rows, on_conflict="video_id").execute()
+            for row in new:
+                print(f"🆕 {'追加' if row['tracked'] else '対象外'}: {row['published_at']} {row['title']}")
+            known.update({row["video_id"]: row for row in rows})
+        http_cache.mark_processed(first)
+
+        filled = fill_published_at(supabase, known)
+        if filled:
+            print(f"🗓️ 公開日を補完: {filled}件")
+
+        added = sum(1 for row in new if row["tracked"])
+        print(f"✨ カタログ: 対象 {sum(1 for r in known.values() if r['tracked'])}件 / 新規 {added}件")
+        return added
+    except Exception as e:
+        instrumentation.record_error("catalog", e)
+        print(f"❌ カタログ更新エラー: {e}")
+        return 0
+    finally:
+        youtube_quota.flush(supabase)
+
+def main():
+    parser = argparse.ArgumentParser(description="公式チャンネルのアップロード一覧から動画カタログを更新する")
+    parser.add_argument('--list', action='store_true', help='再生数を記録する動画を表示する')
+    args = parser.parse_args()
+
+    from supabase import create_client
+    supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+    if args.list:
+        for vid, row in sorted(tracked_videos(supabase).items(), key=lambda x: str(x[1]["published_at"])):
+            print(f"{row['published_at'] or '----------'}  {vid}  {row['title']}")
+        return
+    refresh(supabase)
+
+if __name__ == "__main__":
+    main()
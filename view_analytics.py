@@ -0,0 +1,239 @@
+import argparse
+from datetime import timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+# --- 設定 ---
+JST = timezone(timedelta(hours=9))
+# 節目の再生数（到達予測の対象）
+MILESTONES = np.array([1e6, 5e6, 10e6, 20e6, 30e6, 50e6, 100e6, 200e6, 300e6, 500e6, 1e9])
+# 再生ペースを平均する日数
+VELOCITY_WINDOW = 7
+# これより先の到達予測は意味をなさないので出さない（ペースがほぼ止まった動画で数百年後になる）
+MAX_ETA_DAYS = 3650
+# 急増判定: 直前 BASELINE_WINDOW 日の平均 + ANOMALY_Z × 標準偏差を超え、
+# かつ平均の SPIKE_RATIO 倍以上・MIN_SPIKE 回以上の増加（ペースが一定の動画の小さな揺れを拾わない）
+BASELINE_WINDOW = 28
+ANOMALY_Z = 3.0
+SPIKE_RATIO = 1.5
+MIN_SPIKE = 1000
+# イベント日の前後何日までを「イベント付近」とみなすか
+EVENT_WINDOW_DAYS = 3
+
+
+class ViewMatrix:
+    """
+    views[i, j] = 動画 video_ids[i] の days[j] 時点の再生数（JST の日ごとの最終値）。
+    取得しなかった日は前後の取得値から線形補間し、最初の取得より前・最後の取得より後は NaN。
+    """
+
+    def __init__(self, video_ids, titles, days, views, observed):
+        self.video_ids = video_ids
+        self.titles = titles
+        self.days = days
+        self.views = views
+        self.observed = observed
+
+    def frame(self, video_ids=None, last_days=None):
+        """グラフ表示用に (日 × 動画名) の DataFrame を返す"""
+        rows = np.arange(len(self.video_ids)) if video_ids is None else \
+            np.flatnonzero(np.isin(self.video_ids, list(video_ids)))
+        cols = slice(-last_days, None) if last_days else slice(None)
+        return pd.DataFrame(self.views[rows, cols].T, index=pd.DatetimeIndex(self.days[cols]),
+                            columns=self.titles[rows])
+
+
+class Analytics:
+    def __init__(self, matrix, deltas, velocity, summary, anomalies):
+        self.matrix = matrix
+        self.deltas = deltas
+        self.velocity = velocity
+        self.summary = summary
+        self.anomalies = anomalies
+
+# ==========================================
+# 行列化
+# ==========================================
+
+def build_matrix(history):
+    """履歴（video_id, title, views, created_at）を1回のソートと代入で行列にする"""
+    if history.empty:
+        return ViewMatrix(np.array([], dtype=object), np.array([], dtype=object),
+                          np.array([], dtype="datetime64[D]"), np.empty((0, 0)), np.empty((0, 0), dtype=bool))
+
+    # タイムゾーン付きのまま to_numpy すると Timestamp の object 配列になり遅いので、JST の naive datetime64 にする
+    created = pd.to_datetime(history["created_at"], utc=True, format="ISO8601") \
+        .dt.tz_convert(JST).dt.tz_localize(None).to_numpy()
+    order = np.argsort(created, kind="stable")
+    hist = history.iloc[order]
+    day = created[order].astype("datetime64[D]")
+
+    codes, video_ids = pd.factorize(hist["video_id"])
+    start = day.min()
+    days = np.arange(start, day.max() + 1)
+    col = (day - start).astype(int)
+
+    views = np.full((len(video_ids), len(days)), np.nan)
+    observed = np.zeros_like(views, dtype=bool)
+    # 時刻順に並べてあるので、同じ (動画, 日) は最後の値が残るよう重複を後ろから除く
+    flat = codes * len(days) + col
+    _, last = np.unique(flat[::-1], return_index=True)
+    keep = len(flat) - 1 - last
+    views[codes[keep], col[keep]] = hist["views"].to_numpy(dtype=float)[keep]
+    observed[codes[keep], col[keep]] = True
+
+    titles = hist.groupby(codes, sort=True)["title"].last().to_numpy(dtype=object)
+    return ViewMatrix(np.asarray(video_ids, dtype=object), titles, days, _interpolate(views, observed), observed)
+
+def _interpolate(views, observed):
+    """各行の取得日の間を線形補間する（行ごとのループなし）"""
+    n = views.shape[1]
+    idx = np.broadcast_to(np.arange(n), views.shape)
+    prev = np.maximum.accumulate(np.where(observed, idx, -1), axis=1)
+    nxt = np.minimum.accumulate(np.where(observed, idx, n)[:, ::-1], axis=1)[:, ::-1]
+    inside = (prev >= 0) & (nxt < n)
+    rows = np.broadcast_to(np.arange(views.shape[0])[:, None], views.shape)
+    p, q = np.where(inside, prev, 0), np.where(inside, nxt, 0)
+    v_prev, v_next = views[rows, p], views[rows, q]
+    span = np.where(q > p, q - p, 1)
+    filled = v_prev + (v_next - v_prev) * (idx - p) / span
+    return np.where(inside, filled, np.nan)
+
+# ==========================================
+# 指標
+# ==========================================
+
+def daily_deltas(views):
+    """前日比（初日は NaN）"""
+    return np.diff(views, axis=1, prepend=np.nan)
+
+def _window_sums(values, window):
+    """NaN を除いた直近 window 日の (合計, 二乗和, 件数)。累積和の差で全行をまとめて計算する"""
+    valid = ~np.isnan(values)
+    x = np.where(valid, values, 0.0)
+    def rolled(a):
+        c = np.cumsum(a, axis=1)
+        out = c.copy()
+        out[:, window:] = c[:, window:] - c[:, :-window]
+        return out
+    return rolled(x), rolled(x * x), rolled(valid.astype(float))
+
+def rolling_velocity(deltas, window=VELOCITY_WINDOW):
+    """直近 window 日の1日あたり平均増加数（半分以上の日が欠けていれば NaN）"""
+    total, _, count = _window_sums(deltas, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count >= (window + 1) // 2, total / count, np.nan)
+
+def _last_valid(values):
+    """各行の最後の非 NaN の値と、その列番号（無ければ -1）"""
+    valid = ~np.isnan(values)
+    n = values.shape[1]
+    if n == 0:
+        return np.full(values.shape[0], np.nan), np.full(values.shape[0], -1)
+    last = np.where(valid.any(axis=1), n - 1 - np.argmax(valid[:, ::-1], axis=1), -1)
+    picked = values[np.arange(values.shape[0]), np.maximum(last, 0)]
+    return np.where(last >= 0, picked, np.nan), last
+
+def milestone_etas(current, velocity, milestones=MILESTONES, max_days=MAX_ETA_DAYS):
+    """次の節目と、今のペースで到達するまでの日数（ペースが 0 以下、または max_days を超えるなら NaN）"""
+    nxt = np.searchsorted(milestones, np.nan_to_num(current), side="right")
+    target = np.where(nxt < len(milestones), milestones[np.minimum(nxt, len(milestones) - 1)], np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        days = np.where(velocity > 0, np.ceil((target - current) / velocity), np.nan)
+    return target, np.where(days <= max_days, days, np.nan)
+
+def detect_anomalies(deltas, window=BASELINE_WINDOW, z=ANOMALY_Z, ratio=SPIKE_RATIO, min_spike=MIN_SPIKE):
+    """
+    前日比が直前 window 日の平均 + z × 標準偏差を超えた (動画, 日) を True にする。
+    当日を基準に含めないよう1日ずらした集計と比べる。戻り値は (判定, zスコア)。
+    """
+    total, squares, count = _window_sums(deltas, window)
+    shift = lambda a: np.concatenate([np.zeros((a.shape[0], 1)), a[:, :-1]], axis=1)
+    total, squares, count = shift(total), shift(squares), shift(count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean ** 2, 0))
+        score = (deltas - mean) / np.where(std > 0, std, np.nan)
+        big = (deltas >= min_spike) & (deltas >= mean * ratio)
+    enough = count >= window // 2
+    flags = enough & big & ((score > z) | (std == 0))
+    return flags, score
+
+def event_proximity(days, events, window=EVENT_WINDOW_DAYS):
+    """
+    各日について、前後 window 日以内にあるイベントのタイトル（複数は ' / ' 区切り、無ければ空文字）。
+    イベント数 × 日数の比較1回で求める。
+    """
+    if events is None or events.empty or len(days) == 0:
+        return np.full(len(days), "", dtype=object)
+    event_days = pd.to_datetime(events["event_date"]).to_numpy().astype("datetime64[D]")
+    near = np.abs((days[None, :] - event_days[:, None]).astype(int)) <= window
+    titles = events["title"].astype(str).to_numpy()
+    return np.array([" / ".join(titles[near[:, j]]) for j in range(len(days))], dtype=object)
+
+# ==========================================
+# まとめ
+# ==========================================
+
+def analyze(history, events=None, velocity_window=VELOCITY_WINDOW):
+    """
+    youtube_stats の履歴（video_id, title, views, created_at）と calendar_events から Analytics を作る。
+    summary は動画ごとの最新値・前日比・ペース・次の節目と到達予測日、anomalies は急増した (動画, 日)。
+    動画ごとのループはせず、全動画を行列演算でまとめて計算する。
+    """
+    m = build_matrix(history)
+    deltas = daily_deltas(m.views)
+    velocity = rolling_velocity(deltas, velocity_window)
+
+    current, last_col = _last_valid(m.views)
+    last_delta, _ = _last_valid(deltas)
+    last_velocity, _ = _last_valid(velocity)
+    target, eta_days = milestone_etas(current, last_velocity)
+    last_day = m.days[np.maximum(last_col, 0)] if len(m.days) else np.array([], dtype="datetime64[D]")
+    eta_date = last_day + np.where(np.isnan(eta_days), 0, eta_days).astype("timedelta64[D]")
+
+    summary = pd.DataFrame({
+        "video_id": m.video_ids,
+        "title": m.titles,
+        "views": current,
+        "delta_1d": last_delta,
+        "velocity": last_velocity,
+        "next_milestone": target,
+        "eta_days": eta_days,
+        "eta_date": pd.to_datetime(np.where(np.isnan(eta_days), np.datetime64("NaT"), eta_date)),
+    }).sort_values("velocity", ascending=False, na_position="last").reset_index(drop=True)
+
+    flags, score = detect_anomalies(deltas)
+    rows, cols = np.nonzero(flags)
+    near = event_proximity(m.days, events)
+    anomalies = pd.DataFrame({
+        "date": pd.to_datetime(m.days[cols]),
+        "video_id": m.video_ids[rows],
+        "title": m.titles[rows],
+        "delta": deltas[rows, cols],
+        "z": score[rows, cols],
+        "event": near[cols],
+    }).sort_values(["date", "delta"], ascending=[False, False]).reset_index(drop=True)
+
+    return Analytics(m, deltas, velocity, summary, anomalies)
+
+def main():
+    """ローカルストア（local_store.py でエクスポートした Parquet）から集計結果を表示する"""
+    import local_store
+
+    parser = argparse.ArgumentParser(description="再生数の伸び・節目到達予測・急増を集計する")
+    parser.add_argument('--top', type=int, default=15, help='表示件数')
+    args = parser.parse_args()
+
+    history = local_store.read_table("youtube_stats")
+    events = local_store.read_table("calendar_events")
+    result = analyze(history, events)
+    with pd.option_context("display.width", 200, "display.max_columns", 20):
+        print(f"--- 📈 ペース上位 {args.top} ({len(result.matrix.video_ids)}動画 × {len(result.matrix.days)}日) ---")
+        print(result.summary.head(args.top).to_string(index=False))
+        print(f"\n--- ⚡ 急増 (直近 {args.top}件) ---")
+        print(result.anomalies.head(args.top).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
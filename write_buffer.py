@@ -0,0 +1,216 @@
+import os
+import json
+import uuid
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import instrumentation
+import rollups
+
+# --- 設定 ---
+# 未送信の行を保存するファイル。次回の実行時に先に送信する
+JOURNAL_FILE = os.getenv("WRITE_JOURNAL", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "write_journal.jsonl"))
+# 1リクエストで送る最大行数と、同時に送るリクエスト数
+FLUSH_SIZE = int(os.getenv("WRITE_FLUSH_SIZE", "500"))
+MAX_WORKERS = int(os.getenv("WRITE_MAX_WORKERS", "4"))
+
+# テーブルごとの自然キー（upsert の衝突キー）。同じキーの行は最新値で上書きされる
+NATURAL_KEYS = {
+    "youtube_stats": "video_id,snapshot_date",
+    "sns_stats": "platform,snapshot_date",
+    "youtube_stats_hourly": "video_id,snapshot_hour",
+    "youtube_poll_state": "video_id",
+}
+
+# ジャーナルから再送したときに最新値・日次集計（rollups.py）も更新するテーブル
+ROLLUP_KINDS = {conf["source"]: kind for kind, conf in rollups.ROLLUPS.items()}
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+class WriteError(Exception):
+    """送信に失敗した行はジャーナルに残り、次回の flush で再送される"""
+
+
+def snapshot_fields(now=None):
+    """スナップショット行に付ける取得時刻と取得日（JST）"""
+    now = now or datetime.now(timezone.utc)
+    return {"created_at": now.isoformat(), "snapshot_date": rollups.stat_date_of(now).isoformat()}
+
+
+class WriteBuffer:
+    """
+    Supabase への書き込みをまとめて upsert する。
+    add() した行はまずジャーナル（JSON Lines）に追記し、送信に成功したものだけを消す。
+    送信前にプロセスが落ちたりネットワークが切れたりしても、次回の flush で再送される。
+    自然キーで upsert するため、同じ行を何度送っても重複しない。
+    """
+
+    def __init__(self, journal_path=JOURNAL_FILE, flush_size=FLUSH_SIZE, max_workers=MAX_WORKERS):
+        self.journal_path = journal_path
+        self.flush_size = flush_size
+        self.max_workers = max_workers
+        self._entries = self._load()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    # --- ジャーナル ---
+
+    def _load(self):
+        if not os.path.exists(self.journal_path):
+            return []
+        entries = []
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # 書き込み途中で落ちた最終行は捨てる
+                    continue
+        return entries
+
+    def _append(self, entry):
+        os.makedirs(os.path.dirname(self.journal_path) or ".", exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite(self):
+        if not self._entries:
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            return
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in self._entries:
+                f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        os.replace(tmp, self.journal_path)
+
+    # --- 書き込み ---
+
+    def entries(self, tables=None):
+        """未送信のエントリ（コピー）"""
+        with self._lock:
+            return [dict(e) for e in self._entries if tables is None or e["table"] in tables]
+
+    def pending(self, table=None):
+        """未送信の行数"""
+        with self._lock:
+            return sum(len(e["rows"]) for e in self._entries if table is None or e["table"] == table)
+
+    def add(self, table, rows, on_conflict=None):
+        """行をジャーナルに追記する（送信は flush で行う）"""
+        rows = [rows] if isinstance(rows, dict) else list(rows)
+        if not rows:
+            return
+        entry = {"id": uuid.uuid4().hex, "table": table,
+                 "on_conflict": on_conflict or NATURAL_KEYS.get(table), "rows": rows}
+        with self._lock:
+            self._append(entry)
+            self._entries.append(entry)
+
+    def _send(self, supabase, table, on_conflict, rows):
+        query = supabase.table(table)
+        query = query.upsert(rows, on_conflict=on_conflict) if on_conflict else query.insert(rows)
+        query.execute()
+
+    def flush(self, supabase, tables=None):
+        """
+        未送信の行をテーブル・衝突キーごとにまとめ、flush_size 行ずつ並列に送る。
+        同じ自然キーの行は後から追加したものだけを送る。戻り値は {テーブル: 送信行数}。
+        失敗したテーブルの行はジャーナルに残したまま WriteError を送出する。
+        """
+        with self._flush_lock:
+            with self._lock:
+                entries = [e for e in self._entries if tables is None or e["table"] in tables]
+            if not entries:
+                return {}
+
+            groups = defaultdict(list)
+            for entry in entries:
+                groups[(entry["table"], entry["on_conflict"])].append(entry)
+
+            calls = []
+            for (table, on_conflict), group in groups.items():
+                rows = [row for entry in group for row in entry["rows"]]
+                if on_conflict:
+                    keys = on_conflict.split(",")
+                    rows = list({tuple(str(row.get(k)) for k in keys): row for row in rows}.values())
+                for i in range(0, len(rows), self.flush_size):
+                    calls.append((table, on_conflict, rows[i:i + self.flush_size]))
+
+            with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(calls)))) as pool:
+                futures = [(call, pool.submit(self._send, supabase, *call)) for call in calls]
+            written, errors = defaultdict(int), {}
+            for (table, on_conflict, rows), future in futures:
+                try:
+                    future.result()
+                    written[table] += len(rows)
+                except Exception as e:
+                    instrumentation.record_error(f"write_buffer.{table}", e)
+                    errors[(table, on_conflict)] = e
+
+            sent = {e["id"] for key, group in groups.items() if key not in errors for e in group}
+            with self._lock:
+                self._entries = [e for e in self._entries if e["id"] not in sent]
+                self._rewrite()
+
+            if errors:
+                failed = ", ".join(sorted({table for table, _ in errors}))
+                raise WriteError(f"{failed} への書き込みに失敗しました（次回再送）: {next(iter(errors.values()))}")
+            return dict(written)
+
+    def write(self, supabase, table, rows, on_conflict=None):
+        """add してすぐにそのテーブルを flush する（以前に失敗した同じテーブルの行も一緒に再送する）"""
+        self.add(table, rows, on_conflict)
+        return self.flush(supabase, [table]).get(table, 0)
+
+
+def get_buffer():
+    """プロセス内で共有する WriteBuffer（ジャーナルを複数のインスタンスで触らないようにする）"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBuffer(JOURNAL_FILE)
+        return _buffer
+
+
+def _update_rollups(supabase, entries):
+    """再送できた行で最新値・日次集計を更新する。取得時刻ごとに古い順に反映する"""
+    runs = defaultdict(list)
+    for entry in entries:
+        kind = ROLLUP_KINDS.get(entry["table"])
+        if kind:
+            for row in entry["rows"]:
+                runs[(row["created_at"], kind)].append(row)
+    for (created_at, kind), rows in sorted(runs.items()):
+        try:
+            rollups.update_rollups(supabase, kind, rows, datetime.fromisoformat(created_at))
+        except Exception as e:
+            instrumentation.record_error(f"write_buffer.rollups.{kind}", e)
+            print(f"⚠️ 再送分の集計更新に失敗しました ({kind}): {e}")
+
+
+def replay(supabase):
+    """
+    前回までに送れなかった行を送り、送れた行の分の集計テーブルも更新する。送信した行数を返す。
+    一部のテーブルだけ失敗した場合も、送れた分は集計まで反映する。
+    """
+    buffer = get_buffer()
+    pending = buffer.pending()
+    if not pending:
+        return 0
+    print(f"📮 未送信の {pending}行を再送します")
+    before = buffer.entries()
+    try:
+        buffer.flush(supabase)
+    except WriteError as e:
+        print(f"⚠️ {e}")
+    remaining = {e["id"] for e in buffer.entries()}
+    sent = [e for e in before if e["id"] not in remaining]
+    _update_rollups(supabase, sent)
+    return sum(len(e["rows"]) for e in sent)
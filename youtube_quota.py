@@ -0,0 +1,68 @@
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import instrumentation
+
+# --- 設定 ---
+# このプレフィックスへのリクエストを YouTube Data API の呼び出しとして数える
+API_PREFIX = "https://www.googleapis.com/youtube/v3/"
+# list 系の呼び出し（videos / channels / playlistItems）は 304 でも1回 1ユニット
+UNITS_PER_CALL = 1
+# クォータは太平洋時間の 0 時にリセットされる
+QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+QUOTA_TABLE = "youtube_quota_usage"
+
+_pending = Counter()
+_lock = threading.Lock()
+
+
+def quota_date(now=None):
+    return (now or datetime.now(timezone.utc)).astimezone(QUOTA_TZ).date().isoformat()
+
+
+def count(url, units=UNITS_PER_CALL):
+    """
+    http_client が実際に送ったリクエスト1回ごとに呼ぶ（キャッシュから返した分は呼ばれない）。
+    Data API 以外の URL は数えない。DB への反映は flush で行う。
+    """
+    if not url.startswith(API_PREFIX):
+        return
+    with _lock:
+        _pending[quota_date()] += units
+
+
+def pending():
+    with _lock:
+        return sum(_pending.values())
+
+
+def flush(supabase):
+    """
+    まだ記録していない使用量を add_youtube_quota (sql/009) で加算する。
+    同時に実行される他のジョブ・プロセスと加算が衝突しないよう、DB 側で units = units + n とする。
+    失敗した分は手元に戻し、次回の flush で再送する。記録したユニット数を返す。
+    """
+    with _lock:
+        batch = dict(_pending)
+        _pending.clear()
+    recorded = 0
+    for date, units in sorted(batch.items()):
+        try:
+            supabase.rpc("add_youtube_quota", {"p_quota_date": date, "p_units": units}).execute()
+            recorded += units
+        except Exception as e:
+            instrumentation.record_error("youtube_quota.flush", e)
+            print(f"⚠️ クォータ使用量を記録できませんでした（次回再送）: {e}")
+            with _lock:
+                _pending[date] += units
+    return recorded
+
+
+def used(supabase, now=None):
+    """今日（太平洋時間）の使用量。まだ記録していない分も含める"""
+    rows = supabase.table(QUOTA_TABLE).select("units").eq("quota_date", quota_date(now)).execute().data
+    with _lock:
+        unrecorded = _pending.get(quota_date(now), 0)
+    return (rows[0]["units"] if rows else 0) + unrecorded